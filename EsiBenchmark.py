@@ -0,0 +1,204 @@
+# benchmark parsing and code generation on synthetic ESI files of
+# increasing size, optionally comparing against a stored baseline
+
+__version__ = '0.2.0'
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from esi_file import ObjectDictionary
+from esi_xml import available_backends
+from esi_synth import add_generator_arguments, generate_esi, generator_options
+from esi_csv import write_csv
+from esi_cpp_header import write_cpp_header
+from esi_sdo_list import write_sdo_list
+from esi_dynamic_slave import write_dynamic_slave
+from esi_enum_table import write_enum_table
+
+RESULTS_FORMAT = 1
+
+# modules put into the slots of a modular device by the configure case
+STATION_MODULES = 4
+
+emitters = [
+    ('emit.csv', write_csv),
+    ('emit.hpp', write_cpp_header),
+    ('emit.sdo_list', write_sdo_list),
+    ('emit.dynamic_slave', write_dynamic_slave),
+    ('emit.dynamic_slave_dedup', lambda obj_dict, f: write_dynamic_slave(obj_dict, f, dedup=True)),
+]
+
+def measure(function, repeat):
+    ''' best wall time of repeat calls, then the peak traced memory of one
+    more call. Timing runs without tracemalloc, which slows Python down. '''
+    best = None
+    for i in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    gc.collect()
+    tracemalloc.start()
+    function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def parse_cases(filename, text):
+    ''' the plain case names use the stdlib parser so results stay
+    comparable with older runs, other backends get their name inserted,
+    e.g. parse.lxml.from_file '''
+    cases = []
+    for backend in sorted(available_backends(), key=lambda backend: 'etree' != backend):
+        prefix = 'parse.' if 'etree' == backend else f'parse.{backend}.'
+        cases.extend([
+            (prefix + 'from_file', lambda backend=backend: ObjectDictionary.from_file(filename, backend=backend)),
+            (prefix + 'from_file_tree', lambda backend=backend: ObjectDictionary.from_file(filename, streaming=False, backend=backend)),
+            (prefix + 'from_string', lambda backend=backend: ObjectDictionary.from_string(text, backend=backend)),
+        ])
+    return cases
+
+def emit_cases(obj_dict):
+    return [(name, lambda writer=writer: writer(obj_dict, io.StringIO())) for name, writer in emitters]
+
+def configure_station(filename):
+    ''' load filename and configure its first modular device with its
+    first modules, which are all that gets parsed of them '''
+    obj_dict = ObjectDictionary.from_file(filename)
+    device = next(device for device in obj_dict.device_descriptions if device['Slots'])
+    return obj_dict.configure(device, list(obj_dict.modules)[:STATION_MODULES])
+
+def configure_cases(filename, obj_dict):
+    if not obj_dict.modules:
+        return []
+    return [('configure.station', lambda: configure_station(filename))]
+
+def _device_outputs(obj_dict):
+    outputs = dict()
+    for name, writer in emitters + [('emit.enum_table', write_enum_table)]:
+        f = io.StringIO()
+        writer(obj_dict, f)
+        outputs[name] = f.getvalue()
+    return outputs
+
+def check_configure(filename):
+    ''' the emitters whose output for the device dictionary of filename
+    changes once modules are configured, which it must not: modules keep
+    their DataTypes apart from the device's '''
+    obj_dict = ObjectDictionary.from_file(filename)
+    if not obj_dict.modules:
+        return []
+    before = _device_outputs(obj_dict)
+    for device in obj_dict.device_descriptions:
+        if device['Slots']:
+            obj_dict.configure(device, list(obj_dict.modules)[:STATION_MODULES])
+    after = _device_outputs(obj_dict)
+    return [name for name in before if before[name] != after[name]]
+
+def run_size(options, objects, repeat, directory, selected):
+    ''' results for one generated file with the given objects per device '''
+    options = dict(options, objects=objects)
+    text = generate_esi(**options)
+    filename = os.path.join(directory, f'synthetic_{objects}.xml')
+    with open(filename, 'w', encoding='UTF-8') as f:
+        f.write(text)
+    file_bytes = os.path.getsize(filename)
+    obj_dict = ObjectDictionary.from_file(filename)
+    results = []
+    for case, function in parse_cases(filename, text) + emit_cases(obj_dict) + configure_cases(filename, obj_dict):
+        if selected and not any(case.startswith(prefix) for prefix in selected):
+            continue
+        seconds, peak = measure(function, repeat)
+        results.append({
+            'case': case,
+            'devices': options['devices'],
+            'revisions': options['revisions'],
+            'objects': objects,
+            'dictionary_entries': len(obj_dict.objects_dict),
+            'file_bytes': file_bytes,
+            'seconds': seconds,
+            'peak_bytes': peak,
+        })
+        print(f'{case:26} {options["devices"]:4} x {objects:7} objects {file_bytes // 1024:8} KiB {seconds:9.4f} s {peak // 1024:9} KiB peak', file=sys.stderr)
+    changed = check_configure(filename)
+    if changed:
+        raise ValueError(f'configuring modules changed the device outputs {", ".join(changed)}')
+    return results
+
+def compare(results, baseline, tolerance):
+    ''' list of regression messages for results slower or bigger than the
+    matching baseline result by more than tolerance '''
+    def key(result):
+        return (result['case'], result['devices'], result['objects'])
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        for field in ('seconds', 'peak_bytes'):
+            if before[field] > 0 and result[field] > before[field] * (1 + tolerance):
+                regressions.append(f'{result["case"]} with {result["devices"]} x {result["objects"]} objects: '
+                    f'{field} {before[field]:.4g} -> {result[field]:.4g} ({result[field] / before[field]:.2f}x)')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ESI parsing and code generation on synthetic files')
+    parser.add_argument(
+        '-v', '--version',
+        action='version',
+        version='%(prog)s ' + __version__
+    )
+    add_generator_arguments(parser)
+    parser.add_argument('--sizes', default='100,1000,10000',
+        help='comma separated objects per device to benchmark (default 100,1000,10000), overrides --objects')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per case, the best is kept (default 3)')
+    parser.add_argument('--only', action='append', default=[], help='only run cases starting with this, e.g. parse or emit.hpp (repeatable)')
+    parser.add_argument('-o', '--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown or growth against the baseline (default 0.25)')
+    args = parser.parse_args()
+
+    options = generator_options(args)
+    del options['objects'] # replaced by each of the sizes
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for objects in sizes:
+            results.extend(run_size(options, objects, args.repeat, directory, args.only))
+
+    report = {
+        'format': RESULTS_FORMAT,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'generator': options,
+        'sizes': sizes,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='UTF-8') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding='UTF-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
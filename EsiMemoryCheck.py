@@ -0,0 +1,47 @@
+# report how much memory loading an ESI file takes, to check that the
+# streaming loader's transient overhead stays roughly constant as files grow
+
+__version__ = '0.1.0'
+
+import argparse
+import os
+import time
+import tracemalloc
+from esi_file import ObjectDictionary
+
+def measure(filename, streaming):
+    ''' returns (seconds, peak bytes, retained bytes) for one load '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj_dict = ObjectDictionary.from_file(filename, streaming=streaming)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj_dict
+    return elapsed, peak, retained
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure time and peak memory of loading EtherCAT ESI files')
+    parser.add_argument(
+        '-v', '--version',
+        action='version',
+        version='%(prog)s ' + __version__
+    )
+    parser.add_argument('--tree', action='store_true', help='also measure the non-streaming (ET.parse) loader for comparison')
+    parser.add_argument('input_filenames', nargs='+', help='paths of ESI files, ideally of increasing size')
+    args = parser.parse_args()
+
+    loaders = [('stream', True)]
+    if args.tree:
+        loaders.append(('tree', False))
+    # transient is the memory needed during the load beyond the result itself,
+    # this is the number that should not grow with the file size
+    print(f'{"loader":6} {"file KiB":>10} {"time s":>8} {"peak KiB":>10} {"kept KiB":>10} {"transient KiB":>13}  file')
+    for filename in args.input_filenames:
+        size = os.path.getsize(filename)
+        for loader, streaming in loaders:
+            elapsed, peak, retained = measure(filename, streaming)
+            print(f'{loader:6} {size // 1024:10} {elapsed:8.3f} {peak // 1024:10} {retained // 1024:10} {(peak - retained) // 1024:13}  {filename}')
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,42 @@
 # dump the object directory from an EtherCAT ESI file to a CSV table
 
-__version__ = '0.1.0'
-
 import argparse
-from esi_file import ObjectDictionary
-
-parser = argparse.ArgumentParser(description='Extract object directory from EtherCAT ESI file as table in CSV format')
-parser.add_argument(
-    '-v', '--version', 
-    action='version', 
-    version='%(prog)s ' + __version__
-)
-parser.add_argument('input_filename', help='path of ESI file')
-parser.add_argument('output_filename', help='path of CSV file')
-args = parser.parse_args()
-
-obj_dict = ObjectDictionary.from_file(args.input_filename)
-
-print(len(obj_dict.subitemtypes_dict), 'SubItems')
-print(len(obj_dict.enumtypes_dict), 'Enums')
-print(len(obj_dict.objects_dict), 'Objects and sub-Objects')
-
-def write_enum(name, enum, csv_file):
-    print('', file=csv_file)
-    basetype = enum['BaseType']
-    print(f'enum {name} {basetype}', file=csv_file)
-    print('value, name, comment', file=csv_file)
-    enum_writer = DictWriter(csv_file, fieldnames = ['Value', 'Text', 'Comment'])
-    for value in enum['Values'].values():
-        enum_writer.writerow(value)
-
-from csv import DictWriter
-with open(args.output_filename, 'wt', encoding='UTF-8') as csv_file:
-    writer = DictWriter(csv_file, fieldnames = obj_dict.object_fieldnames)
-    writer.writeheader()
-    for object in obj_dict.objects_dict.values():
-        writer.writerow(object)
-    for name, enum in obj_dict.enumtypes_dict.items():
-        write_enum(name, enum, csv_file)
-    ''' need a better rendering here, this is ugly
-    for name, subitem in obj_dict.subitemtypes_dict.items():
-        print(f'{name}: {subitem}')
-    '''
-    # identify source and device(s)
-    print(file=csv_file)
-    print(f'"from file {obj_dict.filename}"', file=csv_file)
-    print(f'"for vendor {obj_dict.vendor}"', file=csv_file)
-    print(f'"for device(s) {obj_dict.devices}"', file=csv_file)
+from esi_cache import add_cache_argument, load_object_dictionary
+from esi_incremental import Output, add_manifest_argument, update
+from esi_profile import add_profile_argument, profile_from_args
+from esi_csv import __version__, write_csv_file
+
+def load(filename, cache_dir):
+    obj_dict = load_object_dictionary(filename, cache_dir)
+
+    print(len(obj_dict.subitemtypes_dict), 'SubItems')
+    print(len(obj_dict.enumtypes_dict), 'Enums')
+    print(len(obj_dict.objects_dict), 'Objects and sub-Objects')
+    return obj_dict
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract object directory from EtherCAT ESI file as table in CSV format')
+    parser.add_argument(
+        '-v', '--version', 
+        action='version', 
+        version='%(prog)s ' + __version__
+    )
+    parser.add_argument('input_filename', help='path of ESI file')
+    parser.add_argument('output_filename', help='path of CSV file')
+    add_cache_argument(parser)
+    add_manifest_argument(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with profile_from_args(args):
+        if args.manifest:
+            output = Output(args.output_filename, 'csv', __version__, {}, write_csv_file)
+            update(args.manifest, args.input_filename, [output], lambda filename: load(filename, args.cache_dir))
+            return
+
+        obj_dict = load(args.input_filename, args.cache_dir)
+
+        write_csv_file(obj_dict, args.output_filename)
+
+if __name__ == '__main__':
+    main()
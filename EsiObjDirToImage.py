@@ -0,0 +1,33 @@
+# dump the object directory from an EtherCAT ESI file to a binary image
+# that can be memory mapped, see esi_od_image
+
+import argparse
+from esi_cache import add_cache_argument, load_object_dictionary
+from esi_incremental import Output, add_manifest_argument, update
+from esi_profile import add_profile_argument, profile_from_args
+from esi_od_image import __version__, write_od_image_file
+
+def main():
+    parser = argparse.ArgumentParser(description='Write object directory from EtherCAT ESI file as a memory mappable binary image')
+    parser.add_argument(
+        '-v', '--version', 
+        action='version', 
+        version='%(prog)s ' + __version__
+    )
+    parser.add_argument('input_filename', help='path of ESI file')
+    parser.add_argument('output_filename', help='path of image file')
+    add_cache_argument(parser)
+    add_manifest_argument(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with profile_from_args(args):
+        if args.manifest:
+            output = Output(args.output_filename, 'image', __version__, {}, write_od_image_file)
+            update(args.manifest, args.input_filename, [output], lambda filename: load_object_dictionary(filename, args.cache_dir))
+            return
+
+        write_od_image_file(load_object_dictionary(args.input_filename, args.cache_dir), args.output_filename)
+
+if __name__ == '__main__':
+    main()
@@ -1,197 +1,77 @@
 # Code generator for EtherCAT master.
 # From ESI file, generate structured text code to initialize a slave.
 
-__version__ = '0.1.0'
-
-import io
-import re
-
-stTypesToPrefix = {
-    'BOOL' : 'x',
-    'SINT' : 'si',
-    'INT' : 'i',
-    'DINT' : 'di',
-    'LINT' : 'li',
-    'USINT' : 'usi',
-    'BYTE' : 'by',
-    'UINT' : 'ui',
-    'WORD' : 'w',
-    'UDINT' : 'udi',
-    'DWORD' : 'dw',
-    'ULINT' : 'uli',
-    'LWORD' : 'lw',
-    'REAL' : 'r',
-    'LREAL' : 'lr',
-}
-
-def stTypeToPrefix(dataType):
-    if 'ARRAY ' == dataType[0:6]:
-        # prefix is 'a' followed by the prefix of the array element
-        return 'a' + stTypesToPrefix[dataType[dataType.rfind(' ') + 1:]]
-    else:
-        return stTypesToPrefix[dataType]
-
-def dataTypeSize(dataType):
-    return 0 # STUB
-
-# hex constants in ESI files look like #x0123. Remove the 0x and replace with ST's 16# prefix. 
-def numstring(xmltext):
-    if '#x' == xmltext[0:2]:
-        return '16#' + xmltext[2:]
-    else:
-        return xmltext # it's decimal
-
-def syncManagerType(xmltext):
-    if "MBoxOut" == xmltext:
-        return 3
-    elif "MBoxIn" == xmltext:
-        return 2
-    elif "Outputs" == xmltext:
-        return 1
-    elif "Inputs" == xmltext:
-        return 0
-    else:
-        raise ValueError("unknown sync manager type " + xmltext)
-
-def xmlbool(xmltext):
-    if "1" == xmltext:
-        return "TRUE"
-    elif "0" == xmltext:
-        return "FALSE"
-    else:
-        return ValueError("unrecognized bool value " + xmltext)
-
-def cleanName(name):
-    noDashesOrSpaces = re.sub(r'[ -]', '_', name)
-    onlyAlphaNumUnder = re.sub(r'[^A-Za-z0-9_]+', '', noDashesOrSpaces)
-    return onlyAlphaNumUnder
-
-def makeSymbol(text, dataType):
-    # strip spaces and add hungarian prefix
-    return stTypeToPrefix(dataType) + re.sub(r'[ ]', '', text)
-
-def pdoToStruct(device_xml, deviceName, which_direction, output_file):
-    ''' which_direction is TxPdo or RxPdo, can be multiple '''
-    all = []
-    for xml in device_xml.iter(which_direction):
-        index = numstring(xml.find('Index').text)
-        name = xml.find('Name').text
-        structName = 'ST_' + cleanName(deviceName) + '_' + cleanName(name)
-        print(f"// {index} {name}", file=output_file)
-        print("{attribute 'pack_mode' := '1'}", file=output_file)
-        print(f"TYPE {structName} :", file=output_file)
-        print("STRUCT", file=output_file)
-        # now enumerate members
-        size = 0
-        for entry in xml.iter('Entry'):
-            dataType = entry.find('DataType').text
-            size = size + dataTypeSize(dataType)
-            member = makeSymbol(entry.find('Name').text, dataType)
-            indexEntry = numstring(entry.find('Index').text)
-            subindexEntry = numstring(entry.find('SubIndex').text)
-            if '0' == subindexEntry:
-                subindexEntry = ''
-            else:
-                subindexEntry = ':' + subindexEntry
-            print(f'\t{member} : {dataType}; // {indexEntry}{subindexEntry}', file=output_file)
-        print("END_STRUCT", file=output_file)
-        print("END_TYPE\n", file=output_file) # extra newline between structs!
-        all.append([structName, size])
-    return all
-
 import argparse
-parser = argparse.ArgumentParser(description='Code generator for EtherCAT master. From ESI file, generate structured text code to initialize a slave.')
-parser.add_argument(
-    '-v', '--version', 
-    action='version', 
-    version='%(prog)s ' + __version__
-)
-parser.add_argument('input_filename', help='path of ESI file')
-parser.add_argument('output_filename', help='path of ST file')
-args = parser.parse_args()
-
-# Step 1: Read and parse the XML file
-import xml.etree.ElementTree as ET
-tree = ET.parse(args.input_filename)
-root = tree.getroot()
-
-# Step 2: Extract the required information
-
-vendor = root.find('Vendor')
-id = numstring(vendor.find('Id').text)
-vendor_name = vendor.find('Name').text
-
-structsString = io.StringIO() # to store struct declarations for the end
-
-stFile = open(args.output_filename, 'w')
-
-# identify source
-print(f'// from file {args.input_filename}\n', file=stFile)
-
-print('CASE readeeprom.dwVendorID OF', file=stFile)
-print(f'\t{id}: // {vendor_name}', file=stFile)
-print('\t\tCASE readeeprom.dwProductID OF', file=stFile)
-
-devices = root.find('Descriptions').find('Devices')
-for device in devices.iter('Device'):
-    deviceType = device.find('Type')
-    productCode = numstring(deviceType.get('ProductCode'))
-    name = device.find('Name').text
-    print(f'\t\t\t{productCode}: // {name}', file=stFile)
-    syncManagers = {} # so we can look up SM properties to invoke AddFMMU properly
-
-    # this produces lists of each PDO direction, element is [name, size]
-    # gather the text output in a string for output after the main
-    # device type switch
-    rx_pdos = pdoToStruct(device, name, 'RxPdo', structsString)
-    tx_pdos = pdoToStruct(device, name, 'TxPdo', structsString)
-
-    for sm in device.iter('Sm'):
-        syncManager = {}
-        startAddress = numstring(sm.get('StartAddress'))
-        syncManager['StartAddress'] = startAddress
-        smText = sm.text
-        smType = syncManagerType(smText)
-        if 'DefaultSize' in sm.attrib:
-            defaultSize = numstring(sm.get('DefaultSize'))
-            '''
-        else:
-            if 'Outputs' == smText:
-                defaultSize = txPdoSize
-            elif 'Inputs' == smText:
-                defaultSize = rxPdoSize
-            else:
-                raise ValueError("no default size for sync manager")
-            '''
-        syncManager['DefaultSize'] = defaultSize
-        if 'DefaultSize' in sm.attrib:
-            enable = xmlbool(sm.get('Enable'))
+import sys
+from esi_cache import add_cache_argument, load_object_dictionary
+from esi_incremental import FragmentStore, Output, add_manifest_argument, fragment_store_path, update
+from esi_library import parse_id
+from esi_profile import add_profile_argument, profile_from_args
+from esi_dynamic_slave import __version__, fragment_version, incremental_output, write_dynamic_slave_file, write_dynamic_slave_parallel_file
+import esi_pdo_map
+from esi_pdo_map import write_pdo_map_file
+
+def main():
+    parser = argparse.ArgumentParser(description='Code generator for EtherCAT master. From ESI file, generate structured text code to initialize a slave.')
+    parser.add_argument(
+        '-v', '--version', 
+        action='version', 
+        version='%(prog)s ' + __version__
+    )
+    parser.add_argument('input_filename', help='path of ESI file')
+    parser.add_argument('output_filename', help='path of ST file')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+        help='split the ESI file at its devices and process them in this many worker processes, 0 for one per CPU (the cache is not used)')
+    parser.add_argument('--dedup-pdos', action='store_true',
+        help='declare each distinct PDO layout once, PDOs repeating it become aliases of its struct')
+    parser.add_argument('--pdo-map', metavar='FILE',
+        help='also write an ST GVL file with the bit offset and length of every PDO and PDO entry in the process image')
+    parser.add_argument('--modules', metavar='IDENT,...',
+        help='configure modular devices with the modules of these ModuleIdents in their slots, in order, 0 leaving a slot empty')
+    add_cache_argument(parser)
+    add_manifest_argument(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    modules = None
+    if args.modules is not None:
+        if args.jobs is not None:
+            parser.error('--modules can not be used with --jobs')
+        try:
+            modules = [parse_id(ident.strip()) or 0 for ident in args.modules.split(',')]
+        except ValueError as e:
+            parser.error(f'--modules: {e}')
+
+    with profile_from_args(args):
+        if args.manifest:
+            store = None
+            fragments = None
+            if args.jobs is not None:
+                # devices unchanged since the last run are not parsed again
+                store = FragmentStore(fragment_store_path(args.manifest, args.input_filename), fragment_version)
+                fragments = store.fragments
+            # serial unless -j asks for workers
+            jobs = 1 if args.jobs is None else args.jobs
+            output = incremental_output(args.input_filename, args.output_filename, args.dedup_pdos, jobs, fragments, modules)
+            outputs = [output]
+            if args.pdo_map:
+                outputs.append(Output(args.pdo_map, 'pdo_map', esi_pdo_map.__version__, {} if modules is None else {'modules': modules},
+                    lambda obj_dict, filename: write_pdo_map_file(obj_dict, filename, modules)))
+            update(args.manifest, args.input_filename, outputs, lambda filename: load_object_dictionary(filename, args.cache_dir))
+            if store is not None:
+                store.save()
+            layouts = output.result
+        elif args.jobs is not None:
+            layouts = write_dynamic_slave_parallel_file(args.input_filename, args.output_filename, args.jobs, args.dedup_pdos)
+            if args.pdo_map:
+                write_pdo_map_file(load_object_dictionary(args.input_filename, args.cache_dir), args.pdo_map)
         else:
-            enable = '1'
-        controlByte = numstring(sm.get("ControlByte"))
-        syncManager['ControlByte'] = controlByte
-        syncManagers[smText] = syncManager
-        print(f'\t\t\t\tpSlave^.AddSyncManager(wStartAddress := {startAddress}, wLength := {defaultSize}, usiMode := {controlByte}, xEnable := {enable}, usiType := {smType});', file=stFile)
-        
-    for fmmu in device.iter('Fmmu'):
-        if 'MBoxState' == fmmu.text:
-            print('\t\t\t\tpSlave^.AddFMMU(0, 1, 0, 0, 16#80D, 0, 1, 1);', file=stFile)
-            print('\t\t\t\tpSlave^.AlignFMMU();', file=stFile)
-        else:
-            syncManager = syncManagers[fmmu.text]
-            lengthBytes = syncManager['DefaultSize']
-            startAddress = syncManager['StartAddress']
-            if 'Inputs' == fmmu.text:
-                access = '1' # read
-            else:
-                access = '2' # write
-            print(f'\t\t\t\tpSlave^.AddFMMU(dwGlobalStartAddress := 0, wLength := {lengthBytes}, usiStartBit := 0, usiEndBit := 7, wPhysStartAddress := {startAddress}, usiPhysStartBit := 0, usiAccess := {access}, dwFlags := 1);', file=stFile)
-
-    print('\t\t\t\txKnown := TRUE;' , file=stFile)
-
+            obj_dict = load_object_dictionary(args.input_filename, args.cache_dir)
 
-print('\t\tEND_CASE', file=stFile)
-print('END_CASE', file=stFile)
-print('\n', file=stFile)
+            layouts = write_dynamic_slave_file(obj_dict, args.output_filename, args.dedup_pdos, modules)
+            if args.pdo_map:
+                write_pdo_map_file(obj_dict, args.pdo_map, modules)
+    if layouts is not None:
+        print(layouts.summary(), file=sys.stderr)
 
-print(structsString.getvalue(), file=stFile)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# persistent on-disk cache of parsed object dictionaries
+
+__version__ = '0.1.0'
+
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import esi_file
+from esi_file import ObjectDictionary
+from esi_profile import phase
+
+# bump when the pickled state of ObjectDictionary changes shape
+CACHE_FORMAT = 4
+
+DEFAULT_MAX_ENTRIES = 64
+
+ENTRY_SUFFIX = '.odc'
+
+def default_cache_dir():
+    ''' the cache is only used when this or --cache-dir names a directory '''
+    return os.environ.get('ESIUTILS_CACHE_DIR')
+
+def add_cache_argument(parser):
+    parser.add_argument('--cache-dir', default=default_cache_dir(),
+        help='directory for cached parsed ESI files (default $ESIUTILS_CACHE_DIR, no caching if unset)')
+
+def load_object_dictionary(filename, cache_dir=None):
+    if not cache_dir:
+        return ObjectDictionary.from_file(filename)
+    return ObjectDictionaryCache(cache_dir).load(filename)
+
+class ObjectDictionaryCache:
+    ''' entries are keyed by the SHA-256 of the ESI file contents. Each
+    entry records the cache format and esi_file version that wrote it,
+    entries from another version are discarded when read. The least
+    recently used entries are evicted once there are more than
+    max_entries. '''
+
+    def __init__(self, cache_dir, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def version_tag():
+        return f'{CACHE_FORMAT}:{esi_file.__version__}'
+
+    def entry_path(self, digest):
+        return os.path.join(self.cache_dir, digest + ENTRY_SUFFIX)
+
+    def load(self, filename):
+        with phase('cache_lookup'):
+            with open(filename, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            path = self.entry_path(digest)
+            obj_dict = self._read(path, filename)
+        if obj_dict is not None:
+            self.hits = self.hits + 1
+            return obj_dict
+        self.misses = self.misses + 1
+        obj_dict = ObjectDictionary.from_file(io.BytesIO(data))
+        obj_dict.filename = filename
+        with phase('cache_store'):
+            self._write(path, obj_dict)
+            self.evict()
+        return obj_dict
+
+    def _read(self, path, filename):
+        try:
+            with open(path, 'rb') as f:
+                tag, state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or otherwise unreadable, start over
+            self._remove(path)
+            return None
+        if tag != self.version_tag():
+            self._remove(path)
+            return None
+        # touch the entry so eviction is least recently used
+        os.utime(path)
+        return ObjectDictionary._from_state(state, filename)
+
+    def _write(self, path, obj_dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file and rename so concurrent runs never
+        # see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((self.version_tag(), obj_dict._to_state()), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+    def entries(self):
+        ''' cache entry paths, oldest use first '''
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return []
+        paths = []
+        for name in names:
+            if name.endswith(ENTRY_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    paths.append((os.stat(path).st_mtime, path))
+                except FileNotFoundError:
+                    pass # evicted by someone else
+        paths.sort()
+        return [path for mtime, path in paths]
+
+    def evict(self):
+        paths = self.entries()
+        for path in paths[:max(0, len(paths) - self.max_entries)]:
+            self._remove(path)
+
+    def clear(self):
+        for path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,618 @@
+# dump the object directory from an EtherCAT ESI file to a C++ header file,
+# or to a declarations header and a .cpp file with the definitions
+
+__version__ = '0.8.2'
+
+import os
+import re
+from esi_emit import Emitter, Template
+from esi_file import ObjectIndex, sorted_enum_values
+from esi_profile import phase
+from esi_strings import StringPool
+from esi_symbols import SymbolTable, cpp_identifier
+
+header1 = '''#pragma once
+
+// generated by EsiObjDirToCPPHeader
+'''
+
+header2 = '''
+#include <cstddef>
+#include <cstdint>
+#include <array>
+
+namespace CANopen {
+
+enum class Type
+{
+   UNKNOWN,
+   STRING, // length in comment
+   ARRAY, // range and type in comment
+   STRUCT, // size in bits comment
+   BOOL,
+   SINT,
+   INT,
+   DINT,
+   LINT,
+   USINT,
+   BYTE,
+   UINT,
+   WORD,
+   UDINT,
+   DWORD,
+   ULINT,
+   LWORD,
+   REAL,
+   LREAL
+};
+
+'''
+
+# written ahead of the enum DataTypes, if there are any
+enum_value_members = '''
+// a value of an enumerated DataType with its text and comment
+struct EnumValue
+{
+   std::int64_t value;
+   const char* text;
+   const char* comment;
+};
+
+// the text of value in values, which are sorted by value, nullptr if
+// there is none, in O(log n)
+template <std::size_t N>
+constexpr const char* enumText(const std::array<EnumValue, N>& values, std::int64_t value)
+{
+   std::size_t first = 0;
+   std::size_t count = N;
+   while (count > 0)
+   {
+      const std::size_t step = count / 2;
+      if (values[first + step].value < value)
+      {
+         first = first + step + 1;
+         count = count - step - 1;
+      }
+      else
+      {
+         count = step;
+      }
+   }
+   if ((first < N) && (values[first].value == value))
+      return values[first].text;
+   return nullptr;
+}
+
+'''
+
+object_address_members = '''
+struct ObjectAddress
+{
+   std::uint16_t index;
+   std::uint8_t subindex;
+   Type type;
+   unsigned byteCount;
+   const char* indexName;
+   const char* subindexName;
+   const char* description;
+   constexpr ObjectAddress(std::uint16_t index_ = 0,
+                           std::uint8_t subindex_ = 0,
+                           Type type_ = Type::UNKNOWN,
+                           unsigned byteCount_ = 0,
+                           const char* indexName_ = "",
+                           const char* subindexName_ = "",
+                           const char* description_ = "") :
+       index(index_),
+       subindex(subindex_),
+       type(type_),
+       byteCount(byteCount_),
+       indexName(indexName_),
+       subindexName(subindexName_),
+       description(description_)
+   {}
+'''
+
+# with the strings in objectStrings, defined in the .cpp file
+pooled_object_address_members = Template('''
+// every string of the objects once, each NUL terminated, at the offsets
+// the objects hold
+using StringOffset = std::{offset_type};
+extern const char objectStrings[];
+
+struct ObjectAddress
+{{
+   std::uint16_t index;
+   std::uint8_t subindex;
+   Type type;
+   unsigned byteCount;
+   StringOffset indexNameOffset;
+   StringOffset subindexNameOffset;
+   StringOffset descriptionOffset;
+   constexpr ObjectAddress(std::uint16_t index_ = 0,
+                           std::uint8_t subindex_ = 0,
+                           Type type_ = Type::UNKNOWN,
+                           unsigned byteCount_ = 0,
+                           StringOffset indexNameOffset_ = 0,
+                           StringOffset subindexNameOffset_ = 0,
+                           StringOffset descriptionOffset_ = 0) :
+       index(index_),
+       subindex(subindex_),
+       type(type_),
+       byteCount(byteCount_),
+       indexNameOffset(indexNameOffset_),
+       subindexNameOffset(subindexNameOffset_),
+       descriptionOffset(descriptionOffset_)
+   {{}}
+   const char* indexName() const {{ return objectStrings + indexNameOffset; }}
+   const char* subindexName() const {{ return objectStrings + subindexNameOffset; }}
+   const char* description() const {{ return objectStrings + descriptionOffset; }}
+''')
+
+object_address_compare = '''   // "spaceship operator" returns -1, 0, 1
+   // for sorting addresses by index::subindex
+   // only index and subindex are relevant to comparison
+   constexpr int compare(const ObjectAddress& other) const
+   {
+      if (index < other.index) return -1;
+      if (index > other.index) return 1;
+      if (subindex < other.subindex) return -1;
+      if (subindex > other.subindex) return 1;
+      return 0;
+   }
+};
+
+inline bool operator<  (const ObjectAddress& o1, const ObjectAddress& o2) { return o1.compare(o2) <  0; }
+inline bool operator<= (const ObjectAddress& o1, const ObjectAddress& o2) { return o1.compare(o2) <= 0; }
+inline bool operator== (const ObjectAddress& o1, const ObjectAddress& o2) { return o1.compare(o2) == 0; }
+inline bool operator>  (const ObjectAddress& o1, const ObjectAddress& o2) { return o1.compare(o2) >  0; }
+inline bool operator>= (const ObjectAddress& o1, const ObjectAddress& o2) { return o1.compare(o2) >= 0; }
+inline bool operator!= (const ObjectAddress& o1, const ObjectAddress& o2) { return o1.compare(o2) != 0; }
+
+'''
+
+header3 = object_address_members + object_address_compare
+
+lookup_sorted = '''
+// objectAddresses is sorted by compare(), so lookups can bisect it
+constexpr bool objectAddressesSorted()
+{
+   for (std::size_t i = 1; i < objectAddresses.size(); ++i)
+      if (objectAddresses[i - 1].compare(objectAddresses[i]) > 0) return false;
+   return true;
+}
+static_assert(objectAddressesSorted(), "objectAddresses must be sorted by index and subindex");
+'''
+
+# specifier is constexpr in a header, empty in a .cpp file
+lookup_find = Template('''
+// the entry for index:subindex, nullptr if there is none, in O(log n)
+{specifier}const ObjectAddress* findObjectAddress(std::uint16_t index, std::uint8_t subindex)
+{{
+   const ObjectAddress key(index, subindex);
+   std::size_t first = 0;
+   std::size_t count = objectAddresses.size();
+   while (count > 0)
+   {{
+      const std::size_t step = count / 2;
+      if (objectAddresses[first + step].compare(key) < 0)
+      {{
+         first = first + step + 1;
+         count = count - step - 1;
+      }}
+      else
+      {{
+         count = step;
+      }}
+   }}
+   if ((first < objectAddresses.size()) && (objectAddresses[first].compare(key) == 0))
+      return &objectAddresses[first];
+   return nullptr;
+}}
+''')
+
+hashed_lookup_begin = '''
+// perfect hash over (index << 8) | subindex: the seed for a key's bucket
+// leads to a slot holding its position in objectAddresses, or none
+constexpr std::uint32_t objectKeyHash(std::uint32_t key, std::uint32_t seed)
+{
+   std::uint32_t h = (key ^ seed) * 0x9E3779B1u;
+   h ^= h >> 15;
+   h *= 0x85EBCA77u;
+   h ^= h >> 13;
+   return h;
+}
+'''
+
+hashed_lookup_end = Template('''
+// the entry for index:subindex, nullptr if there is none, in O(1)
+{specifier}const ObjectAddress* findObjectAddressHashed(std::uint16_t index, std::uint8_t subindex)
+{{
+   const std::uint32_t key = (std::uint32_t(index) << 8) | subindex;
+   const std::uint32_t seed = objectHashSeeds[objectKeyHash(key, 0) % objectHashSeeds.size()];
+   const std::size_t slot = objectHashSlots[objectKeyHash(key, seed) % objectHashSlots.size()];
+   if ((slot < objectAddresses.size()) && (objectAddresses[slot].index == index) && (objectAddresses[slot].subindex == subindex))
+      return &objectAddresses[slot];
+   return nullptr;
+}}
+''')
+
+uint_array = Template('''constexpr std::array<std::{type}, {count}> {name}{{{{
+   {values}
+}}}};
+''')
+
+footer = '''
+} // namespace CANopen
+'''
+
+# what the header declares and the .cpp file defines
+declarations = Template('''
+extern const std::array<ObjectAddress, {count}> objectAddresses;
+
+// the entry for index:subindex, nullptr if there is none, in O(log n)
+const ObjectAddress* findObjectAddress(std::uint16_t index, std::uint8_t subindex);
+''')
+
+hashed_declaration = '''
+// the entry for index:subindex, nullptr if there is none, in O(1)
+const ObjectAddress* findObjectAddressHashed(std::uint16_t index, std::uint8_t subindex);
+'''
+
+definitions_header = Template('''// generated by EsiObjDirToCPPHeader
+{source}
+#include "{include}"
+
+namespace CANopen {{
+
+const char objectStrings[] =
+   {strings};
+''')
+
+# gives up on a bucket of the perfect hash after this many seeds
+MAX_HASH_SEED = 1 << 20
+
+source_comment = Template('// from file {filename}\n// for vendor {vendor}\n// for device(s) {devices}\n')
+namespace_begin = Template('namespace {namespace} {{\n{indent}constexpr std::uint16_t Index = {index};\n')
+namespace_end = Template('}} // {namespace}\n')
+pooled_object_address = Template('{indent}constexpr ObjectAddress {sub_name} {{ {index}, {subindex}, {type}, {byteCount}, {index_name}, {subindex_name}, {description} }};\n')
+object_address = Template('{indent}constexpr ObjectAddress {sub_name} {{ {index}, {subindex}, {type}, {byteCount}, "{namespace}", "{sub_name}", "{comment}" }};\n')
+type_alias = Template('constexpr Type {name} = Type::{type};\n')
+enum_values = Template('''constexpr std::array<EnumValue, {count}> {name}Values{{{{
+   {values}
+}}}};
+''')
+enum_value = Template('{{ {value}, "{text}", "{comment}" }}')
+enum_sorted_lookup = Template('''// the text of a {name} value, nullptr if it has none
+constexpr const char* {name}ToString(std::int64_t value) {{ return enumText({name}Values, value); }}
+''')
+enum_dense_lookup = Template('''constexpr std::array<const char*, {count}> {name}Texts{{{{
+   {texts}
+}}}};
+// the text of a {name} value, nullptr if it has none
+constexpr const char* {name}ToString(std::int64_t value)
+{{
+   return ((value >= {first}) && (value <= {last})) ? {name}Texts[{position}] : nullptr;
+}}
+''')
+
+# enum values spanning at most this many times their count are looked up
+# in an array indexed by value, holes holding nullptr
+DENSE_ENUM_SPAN = 2
+
+def pool_offset_type(strings):
+    ''' the integer type of the offsets into StringPool strings '''
+    return 'uint16_t' if strings.size <= 0x10000 else 'uint32_t'
+
+def pool_literals(strings):
+    ''' C++ string literals spelling StringPool strings, one per string '''
+    return [f'"{cpp_string_escape(s)}\\0"' for s in strings.offsets]
+
+# what the header declares in namespace CANopen besides the objects
+header_symbols = ('Type', 'EnumValue', 'enumText', 'ObjectAddress', 'objectAddresses',
+    'objectAddressesSorted', 'findObjectAddress', 'objectKeyHash', 'objectHashSeeds',
+    'objectHashSlots', 'findObjectAddressHashed', 'objectStrings')
+
+def type_symbols(obj_dict):
+    ''' what write_types declares for the DataTypes of obj_dict '''
+    symbols = list(obj_dict.subitemtypes_dict)
+    for name in obj_dict.enumtypes_dict:
+        symbols.extend([name, name + 'Values', name + 'ToString', name + 'Texts'])
+    return symbols
+
+class Scope:
+    ''' the namespace the objects written so far have left open, with
+    the symbols taken in it and in the outer namespace '''
+    __slots__ = ('namespace', 'indent', 'reserved', 'outer', 'inner')
+
+    def __init__(self, reserved=()):
+        self.namespace = ''
+        self.indent = ''
+        self.reserved = header_symbols + tuple(reserved)
+        self.outer = SymbolTable.cpp(self.reserved)
+        self.inner = None
+
+    def symbols(self):
+        return self.outer if '' == self.namespace else self.inner
+
+def object_name_to_cpp_symbol(name):
+    ''' the section and subsection of name, before and after its first
+    /, as C++ identifiers. These may still collide, see SymbolTable. '''
+    if '/' in name:
+        section, subsection = name.split('/', 1)
+    else:
+        section = ''
+        subsection = name
+    return cpp_identifier(section), cpp_identifier(subsection)
+
+def object_index_to_cpp_hex(index):
+    return index.replace('#', '0')
+
+def object_subindex_to_cpp_number(subindex):
+    if '' == subindex:
+        return 0
+    else:
+        return int(subindex)
+
+def translateType(raw_type):
+    # if type is a string or enum, provide a proxy
+    if '(' in raw_type:
+        # for strings, remove the size, will be added as byteCount member
+        return 'Type::' + re.sub(r'\(([0-9]+)\)', '', raw_type)
+    # create aliases (below, in write_enum and write_subitemtype) so we can use original enum name here
+    if raw_type.startswith('DT'):
+        return raw_type
+    if raw_type.startswith('ARRAY'):
+        # append the details of the array as a comment
+        details = ' '.join(raw_type.split(' ')[1:]);
+        return 'Type::ARRAY /* ' + details + ' */'
+    return 'Type::' + raw_type
+
+def enter_namespace(section_name, key, index, h_file, scope):
+    scope.namespace = scope.outer.symbol(section_name, ('namespace', key), section_name)
+    # names declared outside are visible in the namespace too
+    scope.inner = SymbolTable.cpp(('Index',) + scope.reserved)
+    scope.indent = '   '
+    h_file.write(namespace_begin.render(namespace=scope.namespace, indent=scope.indent, index=index))
+
+def escape_quotes(s):
+    return s.replace('"', '\\"')
+
+def cpp_string_escape(s):
+    ''' s as the inside of a C++ string literal, control characters as
+    octal escapes and ?? escaped so it can't start a trigraph '''
+    s = s.replace('\\', '\\\\').replace('"', '\\"').replace('??', '?\\?')
+    return re.sub(r'[\x00-\x1f\x7f]', lambda match: f'\\{ord(match.group(0)):03o}', s)
+
+def object_to_cpp(key, object, h_file, scope, strings=None):
+    ''' key is the objects_dict key of object, its symbol is keyed by it
+    as the objects of several devices can share an address. With
+    strings, a StringPool, the names and comment are written as their
+    offsets in the pool. Returns the namespace and the symbol of the
+    object, None for the SubIndex0 of a section, which isn't written. '''
+    section_name, sub_name = object_name_to_cpp_symbol(object['Name'])
+    index = object_index_to_cpp_hex(object['Index'])
+    subindex = object_subindex_to_cpp_number(object['SubIdx'])
+    if ('SubIndex0' == sub_name) or ('' == object['SubIdx']) :
+        if '' != scope.namespace:
+            h_file.write(namespace_end.render(namespace=scope.namespace))
+            if '' == object['SubIdx'] :
+                scope.namespace = '' # back in the outer (CANopen) namespace
+                scope.indent = ''
+            else:
+                # entering a new namespace (section)
+                enter_namespace(section_name, key, index, h_file, scope)
+        else:
+            # currently in outer namespace and possibly entering one
+            if '' != object['SubIdx']:
+                # entering a new namespace (section)
+                enter_namespace(section_name, key, index, h_file, scope)
+    if 'SubIndex0' == sub_name:
+        return scope.namespace, None
+    sub_name = scope.symbols().symbol(sub_name, key, sub_name)
+    comment = ''
+    if 'Comment' in object:
+        comment = object['Comment']
+    type = translateType(object['Type'])
+    byteCount = (int(object['BitSize']) + 7) // 8
+    if strings is None:
+        h_file.write(object_address.render(indent=scope.indent, sub_name=sub_name, index=index, subindex=subindex,
+            type=type, byteCount=byteCount, namespace=scope.namespace, comment=escape_quotes(comment)))
+    else:
+        h_file.write(pooled_object_address.render(indent=scope.indent, sub_name=sub_name, index=index, subindex=subindex,
+            type=type, byteCount=byteCount, index_name=strings.add(scope.namespace),
+            subindex_name=strings.add(sub_name), description=strings.add(comment)))
+    return scope.namespace, sub_name
+
+def object_cpp_name(namespace, sub_name):
+    if '' == namespace:
+        return sub_name
+    else:
+        return f'{namespace}::{sub_name}';
+    
+def is_dense(values):
+    ''' whether sorted_enum_values values are close enough together to
+    be looked up by indexing. An enum without values isn't, its table
+    is empty and the sorted lookup finds nothing in it. '''
+    return bool(values) and values[-1][0] - values[0][0] + 1 <= DENSE_ENUM_SPAN * len(values)
+
+def write_enum(name, enum, h_file):
+    # typedef the name to its base type
+    h_file.write(type_alias.render(name=name, type=enum['BaseType']))
+    # then the values sorted, and the lookup of their texts
+    values = sorted_enum_values(enum)
+    h_file.write(enum_values.render(name=name, count=len(values), values=',\n   '.join(
+        enum_value.render(value=value, text=cpp_string_escape(text), comment=cpp_string_escape(comment))
+        for value, text, comment in values)))
+    if not is_dense(values):
+        h_file.write(enum_sorted_lookup.render(name=name))
+        return
+    first = values[0][0]
+    last = values[-1][0]
+    texts = dict((value, f'"{cpp_string_escape(text)}"') for value, text, comment in values)
+    position = 'value' if 0 == first else (f'value - {first}' if first > 0 else f'value + {-first}')
+    h_file.write(enum_dense_lookup.render(name=name, count=last - first + 1, first=first, last=last, position=position,
+        texts=', '.join(texts.get(value, 'nullptr') for value in range(first, last + 1))))
+
+def write_subitemtype(name, subitemtype, h_file):
+    # typedef the name to STRUCT or ARRAY
+    if 'ArrayInfo' in subitemtype:
+        type = 'ARRAY'
+    else:
+        type = 'STRUCT'
+    h_file.write(type_alias.render(name=name, type=type))
+
+def object_key_hash(key, seed):
+    ''' objectKeyHash of the generated header '''
+    h = ((key ^ seed) * 0x9E3779B1) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x85EBCA77) & 0xFFFFFFFF
+    h ^= h >> 13
+    return h
+
+def perfect_hash(keys):
+    ''' (seeds, slots) for a hash and displace perfect hash over the
+    distinct keys: the key at position i of keys is found at
+        slots[object_key_hash(key, seeds[object_key_hash(key, 0) % len(seeds)]) % len(slots)] == i
+    Unused slots are None. A repeated key maps to its first position. '''
+    positions = dict()
+    for i, key in enumerate(keys):
+        positions.setdefault(key, i)
+    buckets = [[] for i in range(max(1, len(positions) // 4))]
+    for key in positions:
+        buckets[object_key_hash(key, 0) % len(buckets)].append(key)
+    seeds = [0] * len(buckets)
+    slots = [None] * (len(positions) + len(positions) // 4 + 1)
+    # the biggest buckets are placed first, while most slots are free
+    for b in sorted(range(len(buckets)), key=lambda b: (-len(buckets[b]), b)):
+        bucket = buckets[b]
+        if not bucket:
+            continue
+        for seed in range(1, MAX_HASH_SEED):
+            candidates = [object_key_hash(key, seed) % len(slots) for key in bucket]
+            if len(set(candidates)) == len(candidates) and all(slots[c] is None for c in candidates):
+                break
+        else:
+            raise ValueError(f'no perfect hash seed found for a bucket of {len(bucket)} keys')
+        seeds[b] = seed
+        for c, key in zip(candidates, bucket):
+            slots[c] = positions[key]
+    return seeds, slots
+
+def write_uint_array(name, values, out):
+    ''' a constexpr std::array of the smallest unsigned type holding values '''
+    type = 'uint16_t' if max(values, default=0) <= 0xFFFF else 'uint32_t'
+    lines = []
+    for i in range(0, len(values), 16):
+        lines.append(', '.join(str(value) for value in values[i:i + 16]))
+    out.emit(uint_array, type=type, count=len(values), name=name, values=',\n   '.join(lines))
+
+def write_hashed_lookup(keys, out, specifier='constexpr '):
+    seeds, slots = perfect_hash(keys)
+    empty = 0xFFFF if len(keys) < 0xFFFF else 0xFFFFFFFF
+    out.write(hashed_lookup_begin)
+    write_uint_array('objectHashSeeds', seeds, out)
+    write_uint_array('objectHashSlots', [empty if slot is None else slot for slot in slots], out)
+    out.emit(hashed_lookup_end, specifier=specifier)
+
+def write_types(obj_dict, out):
+    ''' everything up to the objects '''
+    out.write(header1)
+    # identify source and device(s)
+    out.emit(source_comment, filename=obj_dict.filename, vendor=obj_dict.vendor, devices=obj_dict.devices)
+    out.write(header2)
+    if obj_dict.enumtypes_dict:
+        out.write(enum_value_members)
+    for name, enum in obj_dict.enumtypes_dict.items():
+        write_enum(name, enum, out)
+    for name, subitemtype in obj_dict.subitemtypes_dict.items():
+        write_subitemtype(name, subitemtype, out)
+
+def write_objects(obj_dict, out, strings=None):
+    ''' the objects, returning (key, C++ name) of each in the order
+    compare() sorts them. Names that collide with each other or with
+    the declarations of the header get the suffixes of SymbolTable. '''
+    scope = Scope(type_symbols(obj_dict))
+    object_names = []
+    for key, object in obj_dict.objects_dict.items():
+        namespace, sub_name = object_to_cpp(key, object, out, scope, strings)
+        if sub_name is not None:
+            object_names.append((ObjectIndex.key_of(object), object_cpp_name(namespace, sub_name)))
+    object_names.sort(key=lambda entry: entry[0]) # stable, as compare() orders them
+    return object_names
+
+def write_object_addresses(object_names, out):
+    out.write(f'\nconstexpr std::array<ObjectAddress, {len(object_names)}> objectAddresses{{\n   ');
+    out.write(',\n   '.join(name for key, name in object_names))
+    out.write('\n};\n');
+
+def write_cpp_header(obj_dict, h_file, perfect_hash=False):
+    ''' objectAddresses is written in index:subindex order with a binary
+    search lookup, with perfect_hash also with a constant time one '''
+    with phase('emit_hpp') as p, Emitter(h_file) as out:
+        write_types(obj_dict, out)
+        out.write(header3)
+        object_names = write_objects(obj_dict, out)
+        write_object_addresses(object_names, out)
+        out.write(lookup_sorted)
+        out.emit(lookup_find, specifier='constexpr ')
+        if perfect_hash:
+            write_hashed_lookup([key for key, name in object_names], out)
+        out.write(footer)
+        p.add_items(len(object_names))
+
+def write_cpp_header_file(obj_dict, filename, perfect_hash=False):
+    with open(filename, 'wt', encoding='UTF-8') as h_file:
+        write_cpp_header(obj_dict, h_file, perfect_hash)
+
+def write_cpp_split(obj_dict, h_file, cpp_file, include, perfect_hash=False):
+    ''' the declarations to h_file and the definitions to cpp_file, which
+    includes the header as include. The names and comments of the objects
+    go into one string pool in the .cpp file, each distinct string once,
+    so including the header costs the compiler little and the strings
+    take their flash only once. Either file may be None to skip it. '''
+    with phase('emit_hpp') as p:
+        # the objects first, the size of the pool decides the offset type
+        strings = StringPool()
+        objects = Emitter(None)
+        object_names = write_objects(obj_dict, objects, strings)
+        if h_file is not None:
+            with Emitter(h_file) as out:
+                write_types(obj_dict, out)
+                out.emit(pooled_object_address_members, offset_type=pool_offset_type(strings))
+                out.write(object_address_compare)
+                out.write(objects.getvalue())
+                out.emit(declarations, count=len(object_names))
+                if perfect_hash:
+                    out.write(hashed_declaration)
+                out.write(footer)
+        if cpp_file is not None:
+            with Emitter(cpp_file) as out:
+                source = source_comment.render(filename=obj_dict.filename, vendor=obj_dict.vendor, devices=obj_dict.devices)
+                out.emit(definitions_header, source=source.rstrip('\n'), include=include,
+                    strings='\n   '.join(pool_literals(strings)))
+                write_object_addresses(object_names, out)
+                out.write(lookup_sorted)
+                out.emit(lookup_find, specifier='')
+                if perfect_hash:
+                    write_hashed_lookup([key for key, name in object_names], out, specifier='')
+                out.write(footer)
+        p.add_items(len(object_names))
+
+def cpp_include_name(h_filename, cpp_filename):
+    ''' how the .cpp file includes the header, relative to its directory '''
+    relative = os.path.relpath(os.path.abspath(h_filename), os.path.dirname(os.path.abspath(cpp_filename)))
+    return relative.replace(os.sep, '/')
+
+def write_cpp_split_files(obj_dict, h_filename, cpp_filename, perfect_hash=False, include=None):
+    ''' write_cpp_split to files, either name may be None to skip it;
+    include defaults to the header's path relative to the .cpp file '''
+    if include is None:
+        include = cpp_include_name(h_filename, cpp_filename)
+    h_file = open(h_filename, 'wt', encoding='UTF-8') if h_filename is not None else None
+    cpp_file = open(cpp_filename, 'wt', encoding='UTF-8') if cpp_filename is not None else None
+    try:
+        write_cpp_split(obj_dict, h_file, cpp_file, include, perfect_hash)
+    finally:
+        for f in (h_file, cpp_file):
+            if f is not None:
+                f.close()
@@ -0,0 +1,35 @@
+# dump the object directory from an EtherCAT ESI file to a CSV table
+
+__version__ = '0.1.0'
+
+from csv import DictWriter
+from esi_emit import Emitter, Template
+from esi_profile import phase
+
+enum_header = Template('\nenum {name} {basetype}\nvalue, name, comment\n')
+
+footer = Template('\n"from file {filename}"\n"for vendor {vendor}"\n"for device(s) {devices}"\n')
+
+def write_enum(name, enum, out):
+    out.emit(enum_header, name=name, basetype=enum['BaseType'])
+    enum_writer = DictWriter(out, fieldnames = ['Value', 'Text', 'Comment'])
+    enum_writer.writerows(enum['Values'].values())
+
+def write_csv(obj_dict, csv_file):
+    with phase('emit_csv') as p, Emitter(csv_file) as out:
+        writer = DictWriter(out, fieldnames = obj_dict.object_fieldnames)
+        writer.writeheader()
+        writer.writerows(obj_dict.objects_dict.values())
+        for name, enum in obj_dict.enumtypes_dict.items():
+            write_enum(name, enum, out)
+        ''' need a better rendering here, this is ugly
+        for name, subitem in obj_dict.subitemtypes_dict.items():
+            print(f'{name}: {subitem}')
+        '''
+        # identify source and device(s)
+        out.emit(footer, filename=obj_dict.filename, vendor=obj_dict.vendor, devices=obj_dict.devices)
+        p.add_items(len(obj_dict.objects_dict))
+
+def write_csv_file(obj_dict, filename):
+    with open(filename, 'wt', encoding='UTF-8') as csv_file:
+        write_csv(obj_dict, csv_file)
@@ -0,0 +1,76 @@
+# compare the object dictionaries of two ESI files, e.g. two revisions
+# from a vendor, object by object and field by field
+
+__version__ = '0.1.0'
+
+from esi_profile import phase
+
+# bump when the layout of the change set changes
+CHANGESET_FORMAT = 1
+
+# the fields objects are matched on rather than compared
+_key_fields = frozenset(['Index', 'SubIdx'])
+
+def object_summary(key, object):
+    return {'index': key >> 8, 'subindex': key & 0xFF, 'name': object.get('Name')}
+
+def changed_fields(old, new, ignore=()):
+    ''' {field: [old value, new value]} for the fields that differ, None
+    for a field an object doesn't have '''
+    fields = {}
+    for field in list(old) + [field for field in new if field not in old]:
+        if field in _key_fields or field in ignore:
+            continue
+        old_value = old.get(field)
+        new_value = new.get(field)
+        if old_value != new_value:
+            fields[field] = [old_value, new_value]
+    return fields
+
+def diff_objects(old_index, new_index, ignore=()):
+    ''' (added, removed, changed) between two esi_file.ObjectIndex, in one
+    pass over their sorted keys. Objects sharing a key are paired in
+    dictionary order. '''
+    added = []
+    removed = []
+    changed = []
+    old_items = list(old_index.items())
+    new_items = list(new_index.items())
+    i = 0
+    j = 0
+    while i < len(old_items) or j < len(new_items):
+        if j == len(new_items) or (i < len(old_items) and old_items[i][0] < new_items[j][0]):
+            removed.append(object_summary(*old_items[i]))
+            i = i + 1
+        elif i == len(old_items) or new_items[j][0] < old_items[i][0]:
+            added.append(object_summary(*new_items[j]))
+            j = j + 1
+        else:
+            key, new = new_items[j]
+            old = old_items[i][1]
+            fields = changed_fields(old, new, ignore) if old != new else None
+            if fields:
+                change = object_summary(key, new)
+                change['fields'] = fields
+                changed.append(change)
+            i = i + 1
+            j = j + 1
+    return added, removed, changed
+
+def diff_dictionaries(old, new, ignore=()):
+    ''' the change set from ObjectDictionary old to new, ignoring the
+    fields in ignore, e.g. Comment '''
+    with phase('diff') as p:
+        added, removed, changed = diff_objects(old.object_index, new.object_index, ignore)
+        p.add_items(len(old.objects_dict) + len(new.objects_dict))
+    return {'old': old.filename, 'new': new.filename,
+        'added': added, 'removed': removed, 'changed': changed}
+
+def has_changes(diff):
+    return bool(diff['added'] or diff['removed'] or diff['changed'])
+
+def changeset(files, added_files=(), removed_files=()):
+    ''' the machine-readable document for the diffs of a set of file
+    pairs, plus the files only one side has '''
+    return {'format': CHANGESET_FORMAT, 'files': files,
+        'added_files': list(added_files), 'removed_files': list(removed_files)}
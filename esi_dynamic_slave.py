@@ -0,0 +1,418 @@
+# Code generator for EtherCAT master.
+# From ESI file, generate structured text code to initialize a slave.
+
+__version__ = '0.4.0'
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from esi_emit import Emitter, Template
+from esi_file import ObjectDictionary, __version__ as esi_file_version
+from esi_incremental import Output
+from esi_pdo_map import data_type_size, entry_bits, is_padding, process_image_bits
+from esi_profile import phase
+from esi_split import DeviceSplit, read_spans
+from esi_symbols import SymbolTable, st_identifier, st_member
+from esi_xml import get_backend
+
+struct_begin = Template("// {index} {name}\n{{attribute 'pack_mode' := '1'}}\nTYPE {structName} :\nSTRUCT\n")
+struct_member = Template('\t{member} : {dataType}; // {indexEntry}{subindexEntry}\n')
+struct_end = 'END_STRUCT\nEND_TYPE\n\n' # extra newline between structs!
+struct_alias = Template('// {index} {name}\nTYPE {structName} : {target};\nEND_TYPE\n\n')
+
+vendor_case = Template('// from file {filename}\n\nCASE readeeprom.dwVendorID OF\n\t{id}: // {vendor_name}\n\t\tCASE readeeprom.dwProductID OF\n')
+product_case = Template('\t\t\t{productCode}: // {name}\n')
+add_sync_manager = Template('\t\t\t\tpSlave^.AddSyncManager(wStartAddress := {startAddress}, wLength := {defaultSize}, usiMode := {controlByte}, xEnable := {enable}, usiType := {smType});\n')
+add_mailbox_fmmu = '\t\t\t\tpSlave^.AddFMMU(0, 1, 0, 0, 16#80D, 0, 1, 1);\n\t\t\t\tpSlave^.AlignFMMU();\n'
+add_fmmu = Template('\t\t\t\tpSlave^.AddFMMU(dwGlobalStartAddress := 0, wLength := {lengthBytes}, usiStartBit := 0, usiEndBit := 7, wPhysStartAddress := {startAddress}, usiPhysStartBit := 0, usiAccess := {access}, dwFlags := 1);\n')
+known = '\t\t\t\txKnown := TRUE;\n'
+cases_end = '\t\tEND_CASE\nEND_CASE\n\n\n'
+
+# the per-device results write_dynamic_slave_parallel takes as fragments
+# depend on this and esi_file
+fragment_version = f'{__version__}/{esi_file_version}'
+
+stTypesToPrefix = {
+    'BOOL' : 'x',
+    'SINT' : 'si',
+    'INT' : 'i',
+    'DINT' : 'di',
+    'LINT' : 'li',
+    'USINT' : 'usi',
+    'BYTE' : 'by',
+    'UINT' : 'ui',
+    'WORD' : 'w',
+    'UDINT' : 'udi',
+    'DWORD' : 'dw',
+    'ULINT' : 'uli',
+    'LWORD' : 'lw',
+    'REAL' : 'r',
+    'LREAL' : 'lr',
+}
+
+def stTypeToPrefix(dataType):
+    if 'ARRAY ' == dataType[0:6]:
+        # prefix is 'a' followed by the prefix of the array element
+        return 'a' + stTypesToPrefix[dataType[dataType.rfind(' ') + 1:]]
+    else:
+        return stTypesToPrefix[dataType]
+
+def dataTypeSize(dataType):
+    ''' bits of dataType, 0 if it isn't known '''
+    return data_type_size(dataType) or 0
+
+# hex constants in ESI files look like #x0123. Remove the 0x and replace with ST's 16# prefix. 
+def numstring(xmltext):
+    if '#x' == xmltext[0:2]:
+        return '16#' + xmltext[2:]
+    else:
+        return xmltext # it's decimal
+
+def syncManagerType(xmltext):
+    if "MBoxOut" == xmltext:
+        return 3
+    elif "MBoxIn" == xmltext:
+        return 2
+    elif "Outputs" == xmltext:
+        return 1
+    elif "Inputs" == xmltext:
+        return 0
+    else:
+        raise ValueError("unknown sync manager type " + xmltext)
+
+def xmlbool(xmltext):
+    if "1" == xmltext:
+        return "TRUE"
+    elif "0" == xmltext:
+        return "FALSE"
+    else:
+        return ValueError("unrecognized bool value " + xmltext)
+
+def cleanName(name):
+    return st_identifier(name)
+
+def makeSymbol(text, dataType):
+    # strip spaces and add hungarian prefix
+    return st_member(text, stTypeToPrefix(dataType))
+
+class PdoLayouts:
+    ''' the PDO struct layouts declared so far, so a PDO repeating one
+    is declared as an alias of the first struct with it, and counts of
+    what that saved '''
+
+    def __init__(self):
+        self.structs = {} # member lines -> name of the struct declaring them
+        self.names = {} # struct name -> member lines
+        self.pdos = 0
+        self.aliases = 0
+        self.repeats = 0 # same name and layout as an earlier PDO, dropped
+        self.members_saved = 0
+
+    def declared(self, structName, members):
+        ''' None if a struct with these member lines has to be declared,
+        else the name of the struct declaring them already '''
+        self.pdos = self.pdos + 1
+        target = self.structs.get(members)
+        if target is None:
+            self.structs[members] = structName
+            self.names.setdefault(structName, members)
+            return None
+        self.members_saved = self.members_saved + len(members)
+        if self.names.get(structName) == members:
+            self.repeats = self.repeats + 1
+        else:
+            self.names.setdefault(structName, members)
+            self.aliases = self.aliases + 1
+        return target
+
+    def summary(self):
+        return (f'{self.pdos} PDO structs, {len(self.structs)} distinct layouts, '
+            f'{self.aliases} aliases, {self.repeats} repeats dropped, '
+            f'{self.members_saved} member declarations saved')
+
+def pdo_structs(pdos, deviceName):
+    ''' (index, name, struct name, member lines, size in bits) for each
+    of pdos, the device's TxPdo or RxPdo list. Members are unique within
+    their struct; the struct names are as sanitized, declare_structs
+    resolves their collisions. '''
+    structs = []
+    for pdo in pdos:
+        index = numstring(pdo['Index'])
+        name = pdo['Name']
+        structName = 'ST_' + cleanName(deviceName) + '_' + cleanName(name)
+        # now enumerate members, size in bits
+        size = 0
+        members = []
+        symbols = SymbolTable.st()
+        for position, entry in enumerate(pdo['Entries']):
+            size = size + (entry_bits(entry) or 0)
+            if is_padding(entry):
+                continue # a gap, no member
+            dataType = entry['DataType']
+            member = symbols.symbol(entry['Name'], position, makeSymbol(entry['Name'], dataType))
+            indexEntry = numstring(entry['Index'])
+            subindexEntry = numstring(entry['SubIndex'])
+            if '0' == subindexEntry:
+                subindexEntry = ''
+            else:
+                subindexEntry = ':' + subindexEntry
+            members.append(struct_member.render(member=member, dataType=dataType,
+                indexEntry=indexEntry, subindexEntry=subindexEntry))
+        structs.append((index, name, structName, tuple(members), size))
+    return structs
+
+def declare_structs(structs, output_file, symbols, layouts=None):
+    ''' declare structs, results of pdo_structs, with the names symbols,
+    the SymbolTable of the types, gives them: the same name and members
+    get the same name and are declared once, a name taken by other
+    members gets a suffix. With layouts, a PdoLayouts, repeated layouts
+    become aliases. Returns [name, size in bits] per struct. '''
+    all = []
+    for index, name, structName, members, size in structs:
+        key = (structName, members)
+        repeat = key in symbols
+        structName = symbols.symbol(structName, key, structName)
+        target = layouts.declared(structName, members) if layouts is not None else None
+        if repeat:
+            pass # declared already
+        elif target is None:
+            output_file.write(struct_begin.render(index=index, name=name, structName=structName))
+            output_file.write(''.join(members))
+            output_file.write(struct_end)
+        elif target != structName:
+            output_file.write(struct_alias.render(index=index, name=name, structName=structName, target=target))
+        all.append([structName, size])
+    return all
+
+def pdoToStruct(pdos, deviceName, output_file, layouts=None, symbols=None):
+    ''' pdos are the device's TxPdo or RxPdo list, can be multiple.
+    With layouts, a PdoLayouts, repeated layouts become aliases. symbols
+    is the SymbolTable of the struct names declared so far. '''
+    if symbols is None:
+        symbols = SymbolTable.st()
+    return declare_structs(pdo_structs(pdos, deviceName), output_file, symbols, layouts)
+
+def device_to_st(device, out, structs, defaultSize=None, layouts=None, symbols=None):
+    ''' write the CASE branch for one device description to out and its
+    PDO structs to structs, unless that is None. defaultSize is the sync
+    manager size carried over from the previous device, the one to carry
+    on is returned. layouts and symbols are passed on to pdoToStruct. '''
+    productCode = numstring(device['ProductCode'])
+    name = device['Name']
+    out.emit(product_case, productCode=productCode, name=name)
+    syncManagers = {} # so we can look up SM properties to invoke AddFMMU properly
+
+    # this produces lists of each PDO direction, element is [name, size]
+    # gather the text output in a string for output after the main
+    # device type switch
+    if structs is not None:
+        rx_pdos = pdoToStruct(device['RxPdo'], name, structs, layouts, symbols)
+        tx_pdos = pdoToStruct(device['TxPdo'], name, structs, layouts, symbols)
+
+    for smNumber, sm in enumerate(device['Sm']):
+        syncManager = {}
+        startAddress = numstring(sm['StartAddress'])
+        syncManager['StartAddress'] = startAddress
+        smText = sm['Text']
+        smType = syncManagerType(smText)
+        if 'DefaultSize' in sm:
+            defaultSize = numstring(sm['DefaultSize'])
+        else:
+            # process data is as big as the PDOs assigned to it, else
+            # the size is carried over
+            bits = process_image_bits(device, smNumber) if smText in ('Outputs', 'Inputs') else 0
+            if bits > 0:
+                defaultSize = str((bits + 7) // 8)
+            elif defaultSize is None:
+                raise ValueError("no default size for sync manager")
+        syncManager['DefaultSize'] = defaultSize
+        if 'DefaultSize' in sm:
+            enable = xmlbool(sm.get('Enable'))
+        else:
+            enable = '1'
+        controlByte = numstring(sm.get("ControlByte"))
+        syncManager['ControlByte'] = controlByte
+        syncManagers[smText] = syncManager
+        out.emit(add_sync_manager, startAddress=startAddress, defaultSize=defaultSize,
+            controlByte=controlByte, enable=enable, smType=smType)
+
+    for fmmu in device['Fmmu']:
+        if 'MBoxState' == fmmu:
+            out.write(add_mailbox_fmmu)
+        else:
+            syncManager = syncManagers[fmmu]
+            lengthBytes = syncManager['DefaultSize']
+            startAddress = syncManager['StartAddress']
+            if 'Inputs' == fmmu:
+                access = '1' # read
+            else:
+                access = '2' # write
+            out.emit(add_fmmu, lengthBytes=lengthBytes, startAddress=startAddress, access=access)
+
+    out.write(known)
+    return defaultSize
+
+def write_dynamic_slave(obj_dict, stFile, dedup=False, modules=None):
+    ''' with dedup, PDOs repeating the layout of an earlier one are
+    declared as aliases of its struct. Returns the PdoLayouts then. With
+    modules, a list of module idents, modular devices are written as
+    holding these modules in their slots, see ObjectDictionary.configure. '''
+    layouts = PdoLayouts() if dedup else None
+    symbols = SymbolTable.st()
+    devices = obj_dict.device_descriptions if modules is None else obj_dict.station_descriptions(modules)
+    with phase('emit_dynamic_slave') as p, Emitter(stFile) as out:
+        id = numstring(obj_dict.vendor_id)
+        vendor_name = obj_dict.vendor
+
+        structsString = Emitter(None) # to store struct declarations for the end
+
+        # identify source
+        out.emit(vendor_case, filename=obj_dict.filename, id=id, vendor_name=vendor_name)
+
+        defaultSize = None
+        for device in devices:
+            defaultSize = device_to_st(device, out, structsString, defaultSize, layouts, symbols)
+
+        out.write(cases_end)
+
+        out.write(structsString.getvalue())
+        out.write('\n')
+        p.add_items(len(devices))
+    return layouts
+
+def _uses_carried_size(device):
+    ''' whether device_to_st needs the size carried over from the device
+    before, because its first sync manager has no DefaultSize '''
+    return bool(device['Sm']) and 'DefaultSize' not in device['Sm'][0]
+
+def _devices_to_st(filename, split, spans, backend):
+    ''' worker for write_dynamic_slave_parallel: parse and render the
+    devices at spans. Returns (description, CASE text, PDO structs, size
+    to carry on) per device, the structs as from pdo_structs, for the
+    caller to declare, as struct names and layouts are shared by all
+    devices. If the device needs the carried size, only its description
+    is returned, for the caller to render. '''
+    xml = get_backend(backend)
+    results = []
+    for data in read_spans(filename, spans):
+        root = xml.fromstring(split.fragment(data))
+        device = ObjectDictionary.describe_device(root[0])
+        if _uses_carried_size(device):
+            results.append((device, None, None, None))
+            continue
+        case = Emitter(None)
+        defaultSize = device_to_st(device, case, None)
+        structs = pdo_structs(device['RxPdo'], device['Name']) + pdo_structs(device['TxPdo'], device['Name'])
+        results.append((None, case.getvalue(), structs, defaultSize))
+    return results
+
+def _fragment_key(split, data):
+    ''' identifies a device's worker result by everything it depends on '''
+    key = hashlib.sha256()
+    key.update(split.prolog)
+    key.update(split.root_start)
+    key.update(data)
+    return key.digest()
+
+def _merge_fragments(keys, fragments, computed):
+    ''' the result for each device key in order, from fragments unless
+    it was missing there and is next in computed. Leaves fragments with
+    the results for keys only. '''
+    current = {}
+    for key in keys:
+        result = fragments.get(key)
+        if result is None:
+            result = next(computed)
+        current[key] = result
+        yield result
+    fragments.clear()
+    fragments.update(current)
+
+def write_dynamic_slave_parallel(filename, stFile, jobs=None, backend=None, dedup=False, fragments=None):
+    ''' write_dynamic_slave for the ESI file filename, with its devices
+    parsed and rendered in jobs worker processes (default: one per CPU).
+    The output is the same as write_dynamic_slave's.
+    fragments, if given, is a dict of the per-device results of an
+    earlier run: devices whose bytes haven't changed since are taken from
+    it instead of being parsed again, and it is updated for the next run. '''
+    layouts = PdoLayouts() if dedup else None
+    symbols = SymbolTable.st()
+    with phase('split_devices') as p:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        split = DeviceSplit(data)
+        # vendor information shared by all devices
+        root = get_backend(backend).fromstring(split.remainder(data))
+        keys = None
+        spans = split.spans
+        if fragments is not None:
+            keys = [_fragment_key(split, data[start:end]) for start, end in split.spans]
+            spans = [span for span, key in zip(split.spans, keys) if key not in fragments]
+        del data
+        p.add_items(len(spans))
+    jobs = jobs or os.cpu_count()
+    # a few chunks per worker keeps them busy without a task per device
+    chunk_size = max(1, -(-len(spans) // (jobs * 4)))
+    chunks = [spans[i:i + chunk_size] for i in range(0, len(spans), chunk_size)]
+    with phase('emit_dynamic_slave') as p, Emitter(stFile) as out:
+        id = numstring(root.find('Vendor/Id').text)
+        vendor_name = root.find('Vendor/Name').text
+
+        structsString = Emitter(None) # to store struct declarations for the end
+
+        # identify source
+        out.emit(vendor_case, filename=filename, id=id, vendor_name=vendor_name)
+
+        if 1 == jobs or len(chunks) < 2:
+            results = (_devices_to_st(filename, split, chunk, backend) for chunk in chunks)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(_devices_to_st, repeat(filename), repeat(split), chunks, repeat(backend))
+        try:
+            devices = (result for chunk in results for result in chunk)
+            if fragments is not None:
+                devices = _merge_fragments(keys, fragments, devices)
+            defaultSize = None
+            for device, case, structs, carry in devices:
+                if case is None:
+                    defaultSize = device_to_st(device, out, structsString, defaultSize, layouts, symbols)
+                    continue
+                out.write(case)
+                declare_structs(structs, structsString, symbols, layouts)
+                if carry is not None:
+                    defaultSize = carry
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        out.write(cases_end)
+
+        out.write(structsString.getvalue())
+        out.write('\n')
+        p.add_items(len(split.spans))
+    return layouts
+
+def write_dynamic_slave_file(obj_dict, filename, dedup=False, modules=None):
+    with open(filename, 'w') as stFile:
+        return write_dynamic_slave(obj_dict, stFile, dedup, modules)
+
+def write_dynamic_slave_parallel_file(input_filename, filename, jobs=None, dedup=False, fragments=None):
+    with open(filename, 'w') as stFile:
+        return write_dynamic_slave_parallel(input_filename, stFile, jobs, dedup=dedup, fragments=fragments)
+
+def incremental_output(input_filename, filename, dedup=False, jobs=None, fragments=None, modules=None):
+    ''' esi_incremental.Output for the dynamic slave file of input_filename.
+    With fragments it is written by write_dynamic_slave_parallel, which
+    only parses the devices missing from them, not the whole dictionary,
+    and modules can't be given. '''
+    options = {'dedup_pdos': dedup}
+    if modules is not None:
+        options['modules'] = modules
+    if fragments is None:
+        return Output(filename, 'dynamic_slave', __version__, options,
+            lambda obj_dict, filename: write_dynamic_slave_file(obj_dict, filename, dedup, modules))
+    return Output(filename, 'dynamic_slave', __version__, options,
+        lambda obj_dict, filename: write_dynamic_slave_parallel_file(input_filename, filename, jobs, dedup, fragments),
+        needs_dictionary=False)
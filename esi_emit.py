@@ -0,0 +1,91 @@
+# shared output engine for the code generators: templates compiled once
+# to Python functions, rendered into a buffer that is written in bulk
+
+__version__ = '0.1.0'
+
+from string import Formatter
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+class Template:
+    ''' a str.format style template with named fields, e.g.
+        member = Template('\\t{name} : {type};\\n')
+        member(name='uiStatus', type='UINT')
+    The template is turned into a function building an f-string when it
+    is created, rather than being parsed again on every call. '''
+
+    def __init__(self, text):
+        self.text = text
+        fields = []
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if literal:
+                parts.append(repr(literal))
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise ValueError(f'template field {field!r} must be a plain name')
+            if field not in fields:
+                fields.append(field)
+            conversion = '!' + conversion if conversion else ''
+            spec = ':' + spec if spec else ''
+            parts.append('f' + repr('{' + field + conversion + spec + '}'))
+        self.fields = tuple(fields)
+        arguments = f'*, {", ".join(fields)}' if fields else ''
+        source = f'def render({arguments}):\n    return ' + (' '.join(parts) or "''") + '\n'
+        namespace = {}
+        exec(compile(source, f'<template {text[:40]!r}>', 'exec'), namespace)
+        self.render = namespace['render']
+
+    def __call__(self, **fields):
+        return self.render(**fields)
+
+    def __repr__(self):
+        return f'Template({self.text!r})'
+
+class Emitter:
+    ''' collects output text and writes it to f in chunks of about
+    chunk_size characters, so large outputs stream to the file without
+    being assembled in memory and without a write call per line. With f
+    None everything is kept, see getvalue(). '''
+
+    def __init__(self, f, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._size = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._size = self._size + len(text)
+        if self._size >= self.chunk_size and self.f is not None:
+            self.flush()
+        return len(text)
+
+    def line(self, text=''):
+        self.write(text + '\n')
+
+    def emit(self, template, **fields):
+        self.write(template.render(**fields))
+
+    def extend(self, texts):
+        ''' write many strings at once, e.g. from a generator of rendered templates '''
+        for text in texts:
+            self.write(text)
+
+    def getvalue(self):
+        return ''.join(self._chunks)
+
+    def flush(self):
+        if self.f is not None and self._chunks:
+            self.f.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.flush()
+        return False
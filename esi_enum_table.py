@@ -0,0 +1,70 @@
+# From ESI file, generate structured text tables of the values of the
+# enumerated DataTypes with their texts, so PLC code can decode enum
+# values for diagnostics without handwritten CASE statements.
+
+__version__ = '0.1.0'
+
+import re
+from esi_emit import Emitter, Template
+from esi_file import sorted_enum_values
+from esi_profile import phase
+
+header = Template('''// Automatically generated by esiutils
+// from {filename}
+// for vendor {vendor}
+// for device(s) {devices}
+VAR_GLOBAL CONSTANT
+\tMAX_ENUM_TYPES : INT := {count};
+\taEnumTypes : ARRAY[1..MAX_ENUM_TYPES] OF STRUCT_ENUM_TYPE := [
+''')
+
+type_decl = Template("\t\t(sName := {name}, diFirstValue := {firstValue}, iFirst := {first}, iCount := {count}, xDense := {dense}){comma}\n")
+
+values_header = Template('''\t];
+\tMAX_ENUM_VALUES : INT := {count};
+\taEnumValues : ARRAY[1..MAX_ENUM_VALUES] OF STRUCT_ENUM_VALUE := [
+''')
+
+value_decl = Template('\t\t(diValue := {value}, sText := {text}, sComment := {comment}){comma}\n')
+
+footer = '''\t];
+END_VAR
+'''
+
+def st_string(s):
+    ''' s as an ST string literal, quotes, dollars and control
+    characters written as $ escapes '''
+    s = s.replace('$', '$$').replace("'", "$'")
+    return "'" + re.sub(r'[\x00-\x1f\x7f]', lambda match: f'${ord(match.group(0)):02X}', s) + "'"
+
+def write_enum_table(obj_dict, f):
+    ''' aEnumTypes gives the run of each enum's values in aEnumValues,
+    sorted by value so they can be binary searched. An enum whose values
+    are consecutive is marked dense: value v is at position
+    iFirst + v - diFirstValue. An enum without values has an empty run,
+    iCount 0. '''
+    with phase('emit_enum_table') as p, Emitter(f) as out:
+        enums = [(name, sorted_enum_values(enum)) for name, enum in obj_dict.enumtypes_dict.items()]
+        out.emit(header, filename=obj_dict.filename, vendor=obj_dict.vendor,
+            devices=obj_dict.devices, count=len(enums))
+        first = 1
+        for i, (name, values) in enumerate(enums, 1):
+            first_value = values[0][0] if values else 0
+            dense = bool(values) and values[-1][0] - first_value + 1 == len(values)
+            out.emit(type_decl, name=st_string(name), firstValue=first_value, first=first,
+                count=len(values), dense='TRUE' if dense else 'FALSE',
+                comma='' if i == len(enums) else ',')
+            first = first + len(values)
+        out.emit(values_header, count=first - 1)
+        i = 0
+        for name, values in enums:
+            for value, text, comment in values:
+                i = i + 1
+                out.emit(value_decl, value=value, text=st_string(text), comment=st_string(comment),
+                    comma='' if i == first - 1 else ',')
+        out.write(footer)
+        p.add_items(first - 1)
+
+def write_enum_table_file(obj_dict, filename):
+    with open(filename, 'w', encoding='utf-8') as f:
+        write_enum_table(obj_dict, f)
@@ -1,32 +1,727 @@
 # module with common ESI handling
 
-__version__ = '0.1.0'
+__version__ = '0.2.1'
 
-import xml.etree.ElementTree as ET
-import re
-import copy # need deepcopy of subitemtypes since they get reused
+import io
+import mmap
+import os
+import sys
+from operator import attrgetter
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, MutableMapping
+from esi_profile import phase
+from esi_split import ModuleSplit, describe_span, read_spans
+import esi_xml
+
+class _Missing:
+    ''' marks an unset core field of an ObjectRecord '''
+    def __repr__(self):
+        return '_MISSING'
+    def __reduce__(self):
+        return '_MISSING' # pickles as a reference to the singleton
+
+_MISSING = _Missing()
+
+class ObjectRecord(MutableMapping):
+    ''' one object or subitem, used like the dict of field name to XML
+    text it replaces. The fields most objects have are kept in slots,
+    rarer ones (Comment, DefaultValue, Properties...) in a side dict.
+    Records expanded from a DataType subitem share that side dict with
+    the subitem until one of them writes to it. '''
+
+    _core = ('Index', 'SubIdx', 'Name', 'Type', 'BitSize', 'BitOffs', 'Access', 'PdoMapping')
+    _core_set = frozenset(_core)
+    _core_values = attrgetter(*_core)
+
+    __slots__ = _core + ('_extra', '_shared')
+
+    def __init__(self):
+        self.Index = self.SubIdx = self.Name = self.Type = _MISSING
+        self.BitSize = self.BitOffs = self.Access = self.PdoMapping = _MISSING
+        self._extra = None
+        self._shared = False
+
+    def derive(self, index, name):
+        ''' copy for a use of a DataType subitem by an object '''
+        other = ObjectRecord.__new__(ObjectRecord)
+        other.Index = index
+        other.SubIdx = self.SubIdx
+        other.Name = name
+        other.Type = self.Type
+        other.BitSize = self.BitSize
+        other.BitOffs = self.BitOffs
+        other.Access = self.Access
+        other.PdoMapping = self.PdoMapping
+        other._extra = self._extra
+        other._shared = self._extra is not None
+        self._shared = other._shared
+        return other
+
+    def __getitem__(self, key):
+        if key in ObjectRecord._core_set:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if key in ObjectRecord._core_set:
+            return getattr(self, key) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __setitem__(self, key, value):
+        if key in ObjectRecord._core_set:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {sys.intern(key): value}
+        else:
+            if self._shared:
+                self._extra = dict(self._extra)
+                self._shared = False
+            self._extra[sys.intern(key)] = value
+
+    def __delitem__(self, key):
+        if key in ObjectRecord._core_set:
+            if getattr(self, key) is _MISSING:
+                raise KeyError(key)
+            setattr(self, key, _MISSING)
+        else:
+            if self._extra is None:
+                raise KeyError(key)
+            if self._shared:
+                self._extra = dict(self._extra)
+                self._shared = False
+            del self._extra[key]
+
+    def __iter__(self):
+        for key in ObjectRecord._core:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        n = sum(1 for key in ObjectRecord._core if getattr(self, key) is not _MISSING)
+        if self._extra is not None:
+            n = n + len(self._extra)
+        return n
+
+    def __eq__(self, other):
+        if not isinstance(other, ObjectRecord):
+            return super().__eq__(other)
+        # slot by slot rather than field by field as mappings
+        if ObjectRecord._core_values(self) != ObjectRecord._core_values(other):
+            return False
+        return (self._extra or None) == (other._extra or None)
+
+    def __repr__(self):
+        return f'ObjectRecord({dict(self.items())!r})'
+
+    def __reduce__(self):
+        # compact pickles for esi_cache, shared side dicts stay shared
+        return (ObjectRecord._restore,
+            (tuple(getattr(self, key) for key in ObjectRecord._core), self._extra))
+
+    @staticmethod
+    def _restore(core, extra):
+        self = ObjectRecord.__new__(ObjectRecord)
+        (self.Index, self.SubIdx, self.Name, self.Type,
+         self.BitSize, self.BitOffs, self.Access, self.PdoMapping) = core
+        self._extra = extra
+        # after unpickling we can't tell which side dicts are shared
+        self._shared = extra is not None
+        return self
+
+def parse_hexdec(text):
+    ''' ESI numbers are decimal or hex written like #x1A00 '''
+    if text.startswith('#x'):
+        return int(text[2:], 16)
+    return int(text)
+
+def sorted_enum_values(enum):
+    ''' (value, text, comment) of each value of a parsed enum DataType in
+    numeric order, the first definition of a repeated value kept. A
+    missing text or comment is empty. '''
+    values = dict()
+    for info in enum['Values'].values():
+        values.setdefault(parse_hexdec(info['Value'].strip()), (info['Text'] or '', info.get('Comment') or ''))
+    return [(value, text, comment) for value, (text, comment) in sorted(values.items())]
+
+class ObjectIndex:
+    ''' objects in numeric order, keyed by (index << 8) | subindex. An
+    object without a SubIdx gets subindex 0. Secondary indexes on other
+    fields are built the first time they are queried. '''
+
+    def __init__(self, objects):
+        entries = [(ObjectIndex.key_of(object), object) for object in objects]
+        entries.sort(key=lambda entry: entry[0]) # stable, keeps dictionary order on ties
+        self.keys = [key for key, object in entries]
+        self.objects = [object for key, object in entries]
+        self._secondary = dict()
+
+    @staticmethod
+    def make_key(index, subindex=0):
+        return (index << 8) | subindex
+
+    @staticmethod
+    def key_of(object):
+        subidx = object['SubIdx']
+        return (parse_hexdec(object['Index']) << 8) | (int(subidx) if subidx else 0)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def items(self):
+        return zip(self.keys, self.objects)
+
+    def _span(self, first_key, last_key):
+        return bisect_left(self.keys, first_key), bisect_right(self.keys, last_key)
+
+    def get(self, index, subindex=0, default=None):
+        key = ObjectIndex.make_key(index, subindex)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.objects[i]
+        return default
+
+    def subindices(self, index):
+        ''' all entries of one index, in subindex order '''
+        return self.range(index, index)
+
+    def range(self, first_index, last_index):
+        ''' all entries with first_index <= index <= last_index '''
+        lo, hi = self._span(first_index << 8, (last_index << 8) | 0xFF)
+        return self.objects[lo:hi]
+
+    def where(self, field, value, first_index=0, last_index=0xFFFF):
+        ''' entries whose field equals value, e.g. where('PdoMapping', 'T'),
+        optionally limited to a range of indices '''
+        positions = self._positions(field).get(value, [])
+        lo, hi = self._span(first_index << 8, (last_index << 8) | 0xFF)
+        start = bisect_left(positions, lo)
+        stop = bisect_left(positions, hi)
+        return [self.objects[i] for i in positions[start:stop]]
+
+    def distinct(self, field):
+        ''' the values a field takes, None for objects without it '''
+        return list(self._positions(field))
+
+    def _positions(self, field):
+        positions = self._secondary.get(field)
+        if positions is None:
+            positions = dict()
+            for i, object in enumerate(self.objects):
+                value = object.get(field)
+                if value in positions:
+                    positions[value].append(i)
+                else:
+                    positions[value] = [i]
+            self._secondary[field] = positions
+        return positions
+
+class DataTypeTable(Mapping):
+    ''' DataType name to parsed DataType. The XML of each DataType is kept
+    as it is loaded and only parsed, once, when the type is looked up.
+    A table with a fallback, another DataTypeTable, holds the types added
+    to it on top of the fallback's, which it leaves unchanged. '''
+
+    def __init__(self, parse, parsed=None, fallback=None):
+        ''' parsed, if given, maps names to types parsed already '''
+        self._parse = parse # called with name and element
+        self._names = dict.fromkeys(parsed or ()) # definition order, values unused
+        self._raw = dict()
+        self._parsed = dict(parsed or ())
+        self._resolving = set()
+        self._fallback = fallback
+
+    def own(self):
+        ''' the types added to this table, not to its fallback, parsed '''
+        return {name: self[name] for name in self._names}
+
+    def add(self, name, element):
+        # a later definition replaces an earlier one, like dict assignment
+        self._names[name] = None
+        self._raw[name] = element
+        self._parsed.pop(name, None)
+
+    def is_resolved(self, name):
+        if self._fallback is not None and name not in self._names:
+            return self._fallback.is_resolved(name)
+        return name in self._parsed
+
+    def __getitem__(self, name):
+        try:
+            return self._parsed[name]
+        except KeyError:
+            pass
+        if self._fallback is not None and name not in self._names:
+            return self._fallback[name]
+        if name in self._resolving:
+            raise ValueError(f'DataType {name} contains itself')
+        element = self._raw[name]
+        self._resolving.add(name)
+        try:
+            value = self._parse(name, element)
+        finally:
+            self._resolving.discard(name)
+        del self._raw[name]
+        self._parsed[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self._names or (self._fallback is not None and name in self._fallback)
+
+    def __iter__(self):
+        if self._fallback is None:
+            return iter(self._names)
+        return iter(dict.fromkeys(list(self._fallback) + list(self._names)))
+
+    def __len__(self):
+        if self._fallback is None:
+            return len(self._names)
+        return len(self._fallback) + sum(1 for name in self._names if name not in self._fallback)
+
+def _is_true(text):
+    ''' an xs:boolean attribute or element text '''
+    return text in ('1', 'true')
+
+def _hex_index(number):
+    return f'#x{number:04X}'
+
+class ModuleCatalog(Mapping):
+    ''' the Modules of a modular ESI file by module ident, a number. The
+    catalog only indexes the modules, by their ident, Type and Name; a
+    module is parsed when it is first looked up, into an ObjectDictionary
+    of its own with one device description, the module's PDOs. Modules
+    share one pool of DataTypes, which falls back to the DataTypes of the
+    dictionary they belong to and leaves those unchanged: a module's
+    DataTypes are added to the pool unless a type of that name is there
+    already, so a type repeated by many modules is parsed once. '''
+
+    def __init__(self, owner):
+        self._owner = owner # the ObjectDictionary the modules belong to
+        self._pool = None # ObjectDictionary holding the modules' DataTypes
+        self._index = dict() # ident -> (Type text, Name, ModuleClass), file order
+        self._sources = dict() # ident -> Module element, byte span or document
+        self._parsed = dict()
+        self._file = None # (filename, ModuleSplit, mtime_ns, size) for spans
+
+    @classmethod
+    def from_elements(cls, owner, elements):
+        ''' the catalog of Module elements parsed already '''
+        self = cls(owner)
+        for element in elements:
+            type = element.find('Type')
+            name = element.find('Name')
+            self._add(type.text if type is not None else None, {} if type is None else type.attrib,
+                name.text if name is not None else None, element)
+        return self
+
+    @classmethod
+    def from_split(cls, owner, filename, split, data, stat=None, backend=None):
+        ''' the catalog of the Module spans of split in data, reading only
+        the Type and Name of each module. With the stat of filename, data
+        being its bytes, modules are read from the file when parsed,
+        otherwise each keeps its bytes, as a standalone document. '''
+        self = cls(owner)
+        if stat is not None:
+            self._file = (filename, split, stat.st_mtime_ns, stat.st_size)
+        xml = esi_xml.get_backend(backend)
+        for start, end in split.spans:
+            fragment = split.fragment(data[start:end])
+            type, attributes, name = describe_span(xml, fragment)
+            self._add(type, attributes, name, (start, end) if stat is not None else fragment)
+        return self
+
+    def _add(self, type, attributes, name, source):
+        ident = attributes.get('ModuleIdent')
+        if ident is None:
+            print(f'Module {name} has no ModuleIdent, skipping')
+            return
+        ident = parse_hexdec(ident)
+        if ident in self._index:
+            return # the first definition counts
+        self._index[ident] = (type, name, attributes.get('ModuleClass'))
+        self._sources[ident] = source
+
+    def describe(self, ident):
+        ''' (Type text, Name, ModuleClass) of a module, without parsing it '''
+        return self._index[ident]
+
+    def is_parsed(self, ident):
+        return ident in self._parsed
+
+    def pool(self):
+        ''' the dictionary whose DataTypes the modules share '''
+        if self._pool is None:
+            self._pool = ObjectDictionary._module_pool(self._owner)
+        return self._pool
+
+    def _element(self, ident):
+        source = self._sources[ident]
+        if isinstance(source, bytes):
+            return esi_xml.get_backend().fromstring(source)[0]
+        if self._file is None:
+            return source
+        filename, split, mtime_ns, size = self._file
+        stat = os.stat(filename)
+        if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+            raise ValueError(f'{filename} changed since its modules were indexed, load it again')
+        data, = read_spans(filename, [source])
+        return esi_xml.get_backend().fromstring(split.fragment(data))[0]
+
+    def __getitem__(self, ident):
+        module = self._parsed.get(ident)
+        if module is None:
+            with phase('parse_module') as p:
+                module = ObjectDictionary._from_module(self._owner, self.pool(), self._element(ident))
+                p.add_items(len(module.objects_dict))
+            self._parsed[ident] = module
+        return module
+
+    def __contains__(self, ident):
+        return ident in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _to_state(self):
+        ''' plain data: the index and the spans to parse modules from later,
+        or for modules read from elements, the modules and their DataTypes
+        parsed '''
+        if self._file is not None:
+            return ('spans', self._file, self._index, self._sources)
+        if all(isinstance(source, bytes) for source in self._sources.values()):
+            return ('documents', self._index, self._sources)
+        modules = {ident: self[ident]._module_state() for ident in self._index}
+        pool = self.pool()
+        return ('parsed', self._index, modules, pool.enumtypes_dict.own(), pool.subitemtypes_dict.own())
+
+    @classmethod
+    def _from_state(cls, owner, state):
+        self = cls(owner)
+        if 'spans' == state[0]:
+            self._file, self._index, self._sources = state[1:]
+        elif 'documents' == state[0]:
+            self._index, self._sources = state[1:]
+        else:
+            self._index = state[1]
+            self._pool = ObjectDictionary._module_pool(owner, state[3], state[4])
+            for ident, module_state in state[2].items():
+                self._parsed[ident] = ObjectDictionary._from_module_state(owner, self._pool, module_state)
+        return self
 
 class ObjectDictionary:
 
     @classmethod
-    def from_string(cls, s):
-        return cls(ET.fromstring(s), "")
+    def from_string(cls, s, backend=None):
+        return cls(esi_xml.get_backend(backend).fromstring(s), "")
 
     @classmethod
-    def from_file(cls, filename):
-        tree = ET.parse(filename)
-        return cls(tree.getroot(), filename)
-        
+    def from_file(cls, filename, streaming=True, backend=None):
+        ''' backend names the esi_xml backend, None for the default '''
+        xml = esi_xml.get_backend(backend)
+        if not streaming:
+            with phase('parse_xml'):
+                root = xml.parse(filename)
+            return cls(root, filename)
+        # build incrementally with iterparse, dropping elements once handled
+        # so peak memory doesn't scale with the size of the XML tree
+        self = cls.__new__(cls)
+        self.root = None
+        self.datatypes = None
+        self._begin(filename)
+        with phase('parse_xml') as p:
+            # the Modules are cut out and only indexed, see ModuleCatalog
+            source = self._index_modules(filename, backend)
+            if xml.parent_links:
+                self._iterparse_linked(xml.iterparse(source, ('end',), ObjectDictionary._streamed_tags))
+            else:
+                self._iterparse(xml.iterparse(source, ('start', 'end')))
+            p.add_items(len(self._parsed_objects))
+        self._finish()
+        return self
+
+    def _index_modules(self, filename, backend):
+        ''' what to parse for the dictionary of filename: the file, or if it
+        has Modules, its bytes without them, the modules going into the
+        catalog. The file is mapped, so files without modules aren't read
+        here. filename may be a binary file object too. '''
+        if hasattr(filename, 'read'):
+            data = filename.read()
+            if data.find(b'<Module') < 0:
+                return io.BytesIO(data)
+            split = ModuleSplit(data)
+            if split.spans:
+                with phase('index_modules') as p:
+                    self.modules = ModuleCatalog.from_split(self, None, split, data, backend=backend)
+                    p.add_items(len(split.spans))
+                data = split.remainder(data)
+            return io.BytesIO(data)
+        with open(filename, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if 0 == stat.st_size:
+                return filename
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data.find(b'<Module') < 0:
+                    return filename
+                split = ModuleSplit(data)
+                if not split.spans:
+                    return filename
+                with phase('index_modules') as p:
+                    self.modules = ModuleCatalog.from_split(self, filename, split, data, stat, backend)
+                    p.add_items(len(split.spans))
+                return io.BytesIO(split.remainder(data))
+
+    def _iterparse(self, events):
+        path = [] # tags of the currently open elements
+        open_elements = []
+        capture_depth = 0 # nonzero while inside an element parsed as a whole
+        for event, elem in events:
+            if 'start' == event:
+                if 0 == capture_depth and path:
+                    if ObjectDictionary._is_captured(elem.tag, path[-1]):
+                        capture_depth = len(path) + 1
+                    elif 'Device' == elem.tag and 'Devices' == path[-1]:
+                        self._add_device()
+                path.append(elem.tag)
+                open_elements.append(elem)
+                continue
+            path.pop()
+            open_elements.pop()
+            if capture_depth and len(path) >= capture_depth:
+                continue # inside a captured element, keep its children
+            tag = elem.tag
+            parent_tag = path[-1] if path else None
+            if capture_depth:
+                capture_depth = 0
+                if 'DataType' == tag:
+                    self._add_datatype(elem)
+                elif 'Object' == tag:
+                    self._add_object(elem)
+                else:
+                    self._add_device_child(elem)
+            elif 'Name' == tag:
+                if 'Vendor' == parent_tag and 2 == len(path):
+                    if self.vendor is None:
+                        self.vendor = elem.text
+                elif 'Device' == parent_tag and 'Devices' == path[-2]:
+                    self._add_device_name(elem.text)
+            elif 'Id' == tag and 'Vendor' == parent_tag and 2 == len(path):
+                if self.vendor_id is None:
+                    self.vendor_id = elem.text
+            if open_elements:
+                if 'DataType' != tag:
+                    elem.clear() # DataTypes are kept until resolved
+                open_elements[-1].remove(elem)
+
+    def _iterparse_linked(self, events):
+        ''' _iterparse for parsers that keep parent links while parsing, so
+        only the ends of the _streamed_tags elements have to be seen '''
+        device = None # element of the device being read
+        for event, elem in events:
+            parent = elem.getparent()
+            if parent is None:
+                continue
+            tag = elem.tag
+            parent_tag = parent.tag
+            if 'Device' == parent_tag and parent is not device and ObjectDictionary._is_listed_device(parent):
+                device = parent
+                self._add_device()
+            if ObjectDictionary._is_captured(tag, parent_tag):
+                if 'DataType' == tag:
+                    self._add_datatype(elem)
+                elif 'Object' == tag:
+                    self._add_object(elem)
+                    elem.clear()
+                else:
+                    self._add_device_child(elem)
+                    elem.clear()
+                parent.remove(elem)
+            elif 'Device' == tag:
+                if elem is not device and ObjectDictionary._is_listed_device(elem):
+                    self._add_device() # one without any children of interest
+                elem.clear()
+                parent.remove(elem)
+            elif 'Name' == tag and 'Device' == parent_tag:
+                if ObjectDictionary._is_listed_device(parent):
+                    self._add_device_name(elem.text)
+            elif 'Vendor' == parent_tag and parent.getparent() is not None and parent.getparent().getparent() is None:
+                if 'Name' == tag and self.vendor is None:
+                    self.vendor = elem.text
+                elif 'Id' == tag and self.vendor_id is None:
+                    self.vendor_id = elem.text
+
+    @staticmethod
+    def _is_listed_device(elem):
+        parent = elem.getparent()
+        return parent is not None and 'Devices' == parent.tag
+
     def __init__(self, root, filename):
         self.root = root
-        self.filename = filename
+        self._begin(filename)
+        with phase('parse_elements') as p:
+            self._parse_root(root)
+            p.add_items(len(self._parsed_objects))
+        self._finish()
+
+    def _parse_root(self, root):
         self.vendor = root.find('Vendor/Name').text;
-        self.devices = []
-        for device in root.findall('.//Devices/Device/Name'):
-            self.devices.append(device.text)
-        self._tag_list = list() # list of an object's field names 
-        # for testing if we have this one yet
-        self._tag_set = set()
+        self.vendor_id = root.find('Vendor/Id').text
+        xml = esi_xml.backend_of(root)
+        for device in xml.findall(root, 'devices'):
+            self._add_device()
+            for node in device:
+                if 'Name' == node.tag:
+                    self._add_device_name(node.text)
+                elif node.tag in ObjectDictionary._device_children:
+                    self._add_device_child(node)
+        # the dictionaries of Modules are their own, see ModuleCatalog
+        parts = list(ObjectDictionary._dictionary_parts(root))
+        self.datatypes = [datatype for part in parts for datatype in xml.findall(part, 'datatypes')]
+        for datatype in self.datatypes:
+            self._add_datatype(datatype)
+        for part in parts:
+            for object in xml.findall(part, 'objects'):
+                self._add_object(object)
+        self.modules = ModuleCatalog.from_elements(self, root.findall('Descriptions/Modules/Module'))
+
+    @staticmethod
+    def _dictionary_parts(root):
+        ''' the elements holding the device dictionary: the children of
+        root and of its Descriptions, but for Modules '''
+        for child in root:
+            if 'Descriptions' == child.tag:
+                for part in child:
+                    if 'Modules' != part.tag:
+                        yield part
+            else:
+                yield child
+
+    @classmethod
+    def _module_pool(cls, owner, enumtypes=None, subitemtypes=None):
+        ''' an empty dictionary whose DataType tables fall back to owner's,
+        for the modules of owner to add theirs to, with the types given
+        parsed already '''
+        self = cls.__new__(cls)
+        self.root = None
+        self.datatypes = None
+        self._begin(owner.filename)
+        self._tag_phase = 1
+        self.enumtypes_dict = DataTypeTable(self._parse_enum, enumtypes, owner.enumtypes_dict)
+        self.subitemtypes_dict = DataTypeTable(self._parse_subitemtype, subitemtypes, owner.subitemtypes_dict)
+        return self
+
+    def _share_types(self, pool):
+        self.subitemtypes_dict = pool.subitemtypes_dict
+        self.enumtypes_dict = pool.enumtypes_dict
+        self._layouts = pool._layouts
+
+    @classmethod
+    def _from_module(cls, owner, pool, element):
+        ''' the dictionary and description of a Module element of the file
+        of owner, with the DataTypes of pool, see _module_pool '''
+        self = cls.__new__(cls)
+        self.root = None
+        self.datatypes = None
+        self._begin(owner.filename)
+        self.vendor = owner.vendor
+        self.vendor_id = owner.vendor_id
+        self._share_types(pool)
+        description = ObjectDictionary.describe_device(element)
+        self.devices = [description['Name']]
+        self.device_descriptions = [description]
+        xml = esi_xml.backend_of(element)
+        for datatype in xml.findall(element, 'datatypes'):
+            name = datatype.find('Name').text
+            if name not in self.subitemtypes_dict and name not in self.enumtypes_dict:
+                self._add_datatype(datatype)
+        for object in xml.findall(element, 'objects'):
+            self._add_object(object)
+        self._finish()
+        # the fields of SubItems of types parsed before were collected
+        # by the dictionary holding them
+        fieldnames = set(self.object_fieldnames)
+        for object in self.objects_dict.values():
+            for field in object:
+                if field not in fieldnames:
+                    self.object_fieldnames.append(field)
+                    fieldnames.add(field)
+        return self
+
+    def _module_state(self):
+        return (self.device_descriptions[0], self.object_fieldnames, self.objects_dict)
+
+    @classmethod
+    def _from_module_state(cls, owner, pool, state):
+        self = cls._from_state((owner.vendor, owner.vendor_id, [state[0]['Name']], [state[0]],
+            state[1], state[2], {}, {}, None), owner.filename)
+        self._share_types(pool)
+        return self
+
+    def _to_state(self):
+        ''' plain data snapshot of the parsed model, see esi_cache '''
+        return (self.vendor, self.vendor_id, self.devices,
+                self.device_descriptions, self.object_fieldnames,
+                self.objects_dict, dict(self.enumtypes_dict), dict(self.subitemtypes_dict),
+                self.modules._to_state())
+
+    @classmethod
+    def _from_state(cls, state, filename):
+        self = cls.__new__(cls)
+        self.root = None
+        self.datatypes = None
+        self.filename = filename
+        (self.vendor, self.vendor_id, self.devices,
+         self.device_descriptions, self.object_fieldnames,
+         self.objects_dict, enumtypes, subitemtypes, modules) = state
+        self._tag_list = self.object_fieldnames
+        self._begin_tags()
+        self._tag_phase = 1 # for the DataTypes of modules parsed later
+        self.enumtypes_dict = DataTypeTable(self._parse_enum, enumtypes)
+        self.subitemtypes_dict = DataTypeTable(self._parse_subitemtype, subitemtypes)
+        self._object_index = None
+        self._layouts = dict()
+        self.modules = ModuleCatalog(self) if modules is None else ModuleCatalog._from_state(self, modules)
+        return self
+
+    @property
+    def object_index(self):
+        ''' ObjectIndex over objects_dict, built on first use. Call
+        reindex() after changing objects_dict. '''
+        if self._object_index is None:
+            self._object_index = ObjectIndex(self.objects_dict.values())
+        return self._object_index
+
+    def reindex(self):
+        self._object_index = None
+
+    def _begin(self, filename):
+        self.filename = filename
+        self.vendor = None
+        self.vendor_id = None
+        self.devices = [] # names, in every language given
+        # what the code generators need from each Device: its first Name,
+        # Type with ProductCode/RevisionNo, Sm, Fmmu, RxPdo and TxPdo
+        self.device_descriptions = []
+        self.modules = ModuleCatalog(self)
+        self._begin_tags()
+        self._object_index = None
         # add the tags we want up front
         self._add_tag('Index')
         self._add_tag('SubIdx')
@@ -41,48 +736,304 @@ class ObjectDictionary:
         self._add_tag('ModbusRegister')
         self._add_tag('PdoMapping')
         self._add_tag('Comment')
-        # custom objects can refer to datatypes for internal structure
-        self.subitemtypes_dict = dict()
-        self.enumtypes_dict = dict()
-        self.datatypes = root.findall('.//DataTypes/DataType')
-        for datatype in self.datatypes:
-            datatype_name = datatype.find('Name').text
-            if ObjectDictionary._is_builtin_datatype(datatype_name):
-                pass # ignore these
-            elif datatype.find('EnumInfo'):
-                self.enumtypes_dict[datatype_name] = self._parse_enum(datatype_name, datatype)
-            elif datatype.find('SubItem'):
-                self.subitemtypes_dict[datatype_name] = self._parse_subitem(datatype)
-            elif datatype.find('ArrayInfo'):
-                self.subitemtypes_dict[datatype_name] = self._parse_array(datatype)
-            else:
-                print(f'Unknown datatype {datatype_name}')
-        self.objects_dict = dict()
-        objects = root.findall('.//Objects/Object')
-        for object in objects:
-            d = self._parse_object(object)
-            dt = d['Type'] # datatype
-            if ObjectDictionary._m.match(dt):
-                # custom type, insert its subitems from DataType table
-                for subitem in self.subitemtypes_dict[dt]['SubItems'].values():
-                    # assume all uses have a common Index
-                    newsubitem = copy.deepcopy(subitem)
-                    newsubitem['Index'] = d['Index']
-                    newsubitem['Name'] = d['Name'] + '/' + newsubitem['Name']
-                    self.objects_dict[ObjectDictionary._make_object_key(newsubitem)] = newsubitem
-            else:
-                self.objects_dict[ObjectDictionary._make_object_key(d)] = d
-            # expand objects with custom types
-            self.object_fieldnames = self._tag_list
+        # custom objects can refer to datatypes for internal structure,
+        # these are parsed when first used
+        self.subitemtypes_dict = DataTypeTable(self._parse_subitemtype)
+        self.enumtypes_dict = DataTypeTable(self._parse_enum)
+        self._layouts = dict()
+        # objects are expanded once all datatypes are known
+        self._parsed_objects = []
+
+    def _begin_tags(self):
+        # field names are collected per phase (initial, DataTypes, Objects)
+        # so streaming, where the phases interleave, yields the same order
+        self._tag_phases = ([], [], [])
+        self._tag_sets = (set(), set(), set())
+        self._tag_phase = 0
+        # DataTypes are parsed as objects use them, their field names are
+        # put in the order the DataTypes are defined in
+        self._datatype_positions = dict()
+        self._datatype_tags = dict() # DataType name -> its field names
+        self._tag_owner = None # the DataType being parsed
+
+    def _add_datatype(self, datatype):
+        self._tag_phase = 1
+        datatype_name = datatype.find('Name').text
+        self._datatype_positions.setdefault(datatype_name, len(self._datatype_positions))
+        if ObjectDictionary._is_builtin_datatype(datatype_name):
+            pass # ignore these
+        elif esi_xml.has_children(datatype.find('EnumInfo')):
+            self.enumtypes_dict.add(datatype_name, datatype)
+        elif esi_xml.has_children(datatype.find('SubItem')) or esi_xml.has_children(datatype.find('ArrayInfo')):
+            self.subitemtypes_dict.add(datatype_name, datatype)
+        else:
+            print(f'Unknown datatype {datatype_name}')
+
+    def _add_object(self, object):
+        self._tag_phase = 2
+        self._parsed_objects.append(self._parse_object(object))
+
+    def _finish(self):
+        self._tag_phase = 1 # resolving DataTypes from here on
+        with phase('parse_datatypes') as p:
+            # only the types objects use, nested ones are resolved with them
+            for d in self._parsed_objects:
+                dt = d['Type']
+                if dt in self.subitemtypes_dict and not self.subitemtypes_dict.is_resolved(dt):
+                    self.subitemtypes_dict[dt]
+                    p.add_items(1)
+        with phase('expand_objects') as p:
+            self.objects_dict = dict()
+            for d in self._parsed_objects:
+                dt = d['Type'] # datatype
+                if self._is_struct_type(dt):
+                    # custom type, insert its subitems from DataType table
+                    for subitem in self.subitemtypes_dict[dt]['SubItems'].values():
+                        # assume all uses have a common Index
+                        newsubitem = subitem.derive(d['Index'], d['Name'] + '/' + subitem['Name'])
+                        self.objects_dict[ObjectDictionary._make_object_key(newsubitem)] = newsubitem
+                else:
+                    self.objects_dict[ObjectDictionary._make_object_key(d)] = d
+            p.add_items(len(self.objects_dict))
+        del self._parsed_objects
+        self._tag_list = list() # list of an object's field names
+        tag_set = set()
+        datatype_tags = [self._datatype_tags[name] for name in
+            sorted(self._datatype_tags, key=lambda name: self._datatype_positions.get(name, -1))]
+        for tags in [self._tag_phases[0], self._tag_phases[1]] + datatype_tags + [self._tag_phases[2]]:
+            for tag in tags:
+                if tag not in tag_set:
+                    self._tag_list.append(tag)
+                    tag_set.add(tag)
+        self.object_fieldnames = self._tag_list
+
+    def _is_struct_type(self, name):
+        return name in self.subitemtypes_dict and 'SubItems' in self.subitemtypes_dict[name]
+
+    def _is_array_type(self, name):
+        return name in self.subitemtypes_dict and 'ArrayInfo' in self.subitemtypes_dict[name]
+
+    def datatype_layout(self, name):
+        ''' list of (path, type, bit offset, bit size) for the leaf members
+        of a struct or array DataType. Nested structs and arrays of structs
+        are expanded, offsets are relative to the start of the type. '''
+        layout = self._layouts.get(name)
+        if layout is None:
+            layout = []
+            self._append_layout(layout, name, '', 0)
+            self._layouts[name] = layout
+        return layout
+
+    def _append_layout(self, layout, type_name, path, base_offset):
+        datatype = self.subitemtypes_dict[type_name]
+        if 'SubItems' in datatype:
+            # arrays inside structs were already expanded into elements
+            for subitem in datatype['SubItems'].values():
+                member_path = path + '/' + subitem['Name'] if path else subitem['Name']
+                offset = base_offset + int(subitem.get('BitOffs') or 0)
+                self._append_member(layout, subitem['Type'], member_path, offset, int(subitem.get('BitSize') or 0))
+        else:
+            element_size = self._array_element_bitsize(datatype, 0)
+            lbound = int(datatype['ArrayInfo']['LBound'])
+            for i in range(int(datatype['ArrayInfo']['Elements'])):
+                self._append_member(layout, datatype['BaseType'], f'{path}[{lbound + i}]',
+                    base_offset + i * element_size, element_size)
+
+    def _append_member(self, layout, type_name, path, offset, bitsize):
+        if type_name in self.subitemtypes_dict:
+            self._append_layout(layout, type_name, path, offset)
+        else:
+            layout.append((path, type_name, offset, bitsize))
+
+    @staticmethod
+    def _array_element_bitsize(array, total_bitsize):
+        elements = int(array['ArrayInfo']['Elements'])
+        if array.get('BitSize'):
+            total_bitsize = int(array['BitSize'])
+        return total_bitsize // elements if elements else 0
+
+    @staticmethod
+    def _is_captured(tag, parent_tag):
+        return ('DataType' == tag and 'DataTypes' == parent_tag) or \
+            ('Object' == tag and 'Objects' == parent_tag) or \
+            ('Device' == parent_tag and tag in ObjectDictionary._device_children)
+
+    _device_children = frozenset(['Type', 'Sm', 'Fmmu', 'RxPdo', 'TxPdo', 'Slots'])
+
+    # elements whose end _iterparse_linked needs to see
+    _streamed_tags = ('DataType', 'Object', 'Device', 'Name', 'Id') + tuple(sorted(_device_children))
+
+    def _add_device(self):
+        self._device = ObjectDictionary._new_device()
+        self.device_descriptions.append(self._device)
+
+    @staticmethod
+    def _new_device():
+        return {'Name': None, 'Sm': [], 'Fmmu': [], 'RxPdo': [], 'TxPdo': [], 'Slots': [], 'SlotParameters': {}}
+
+    def _add_device_name(self, name):
+        self.devices.append(name)
+        if self._device['Name'] is None:
+            self._device['Name'] = name
+
+    @staticmethod
+    def describe_device(element):
+        ''' the device_descriptions entry for a Device element on its own '''
+        device = ObjectDictionary._new_device()
+        for node in element:
+            if 'Name' == node.tag:
+                if device['Name'] is None:
+                    device['Name'] = node.text
+            elif node.tag in ObjectDictionary._device_children:
+                ObjectDictionary._describe_device_child(device, node)
+        return device
+
+    def _add_device_child(self, node):
+        ObjectDictionary._describe_device_child(self._device, node)
+
+    @staticmethod
+    def _describe_device_child(device, node):
+        if 'Type' == node.tag:
+            device['Type'] = node.text
+            device['ProductCode'] = node.get('ProductCode')
+            device['RevisionNo'] = node.get('RevisionNo')
+            if node.get('ModuleIdent') is not None:
+                device['ModuleIdent'] = node.get('ModuleIdent')
+        elif 'Slots' == node.tag:
+            ObjectDictionary._describe_slots(device, node)
+        elif 'Sm' == node.tag:
+            sm = dict(node.attrib)
+            sm['Text'] = node.text
+            device['Sm'].append(sm)
+        elif 'Fmmu' == node.tag:
+            device['Fmmu'].append(node.text)
+        else:
+            device[node.tag].append(ObjectDictionary._parse_pdo(node))
+
+    @staticmethod
+    def _describe_slots(device, slots):
+        ''' each Slot to device['Slots']: its attributes, Name, the
+        ModuleIdents and ModuleClasses it takes and its DefaultModuleIdent.
+        The attributes and other children of Slots, like
+        SlotIndexIncrement, go to device['SlotParameters']. '''
+        parameters = dict(slots.attrib)
+        for node in slots:
+            if 'Slot' != node.tag:
+                parameters[node.tag] = node.text
+                continue
+            slot = dict(node.attrib)
+            slot.update({'Name': None, 'ModuleIdents': [], 'ModuleClasses': [], 'DefaultModuleIdent': None})
+            for child in node:
+                if 'ModuleIdent' == child.tag:
+                    slot['ModuleIdents'].append(child.text)
+                    if _is_true(child.get('Default')):
+                        slot['DefaultModuleIdent'] = child.text
+                elif 'ModuleClass' == child.tag:
+                    slot['ModuleClasses'].append(child.text)
+                elif 'Name' != child.tag or slot['Name'] is None:
+                    slot[child.tag] = child.text
+            device['Slots'].append(slot)
+        device['SlotParameters'] = parameters
+
+    @staticmethod
+    def _parse_pdo(pdo):
+        ''' attributes plus the first Index and Name, and a list of Entries.
+        An Index that depends on the slot of a module gets IndexDependOnSlot. '''
+        d = dict(pdo.attrib)
+        entries = []
+        for node in pdo:
+            if 'Entry' == node.tag:
+                entry = dict()
+                for field in node:
+                    if field.tag not in entry:
+                        entry[field.tag] = field.text
+                        if 'Index' == field.tag and _is_true(field.get('DependOnSlot')):
+                            entry['IndexDependOnSlot'] = '1'
+                entries.append(entry)
+            elif node.tag not in d:
+                d[node.tag] = node.text
+                if 'Index' == node.tag and _is_true(node.get('DependOnSlot')):
+                    d['IndexDependOnSlot'] = '1'
+        d['Entries'] = entries
+        return d
+
+    @staticmethod
+    def slot_instances(device):
+        ''' (name, Slot) of each slot of device, a Slot with MaxInstances
+        standing for that many slots in a row '''
+        instances = []
+        for slot in device['Slots']:
+            count = parse_hexdec(slot.get('MaxInstances') or '1')
+            for i in range(count):
+                name = slot['Name'] or f'Slot {len(instances) + 1}'
+                instances.append((name if 1 == count else f'{name} {i + 1}', slot))
+        return instances
+
+    def configure(self, device, idents):
+        ''' the description of device, a device_descriptions entry with
+        Slots, holding the module with idents[n] in its slot n, 0 or None
+        for an empty slot. The PDOs of the modules follow the device's,
+        named after their slot. An Index that depends on the slot moves by
+        the slot's number, from 0, times the SlotPdoIncrement for a PDO or
+        the SlotIndexIncrement for an entry. Only these modules are parsed. '''
+        instances = ObjectDictionary.slot_instances(device)
+        if len(idents) > len(instances):
+            raise ValueError(f'{device["Name"]} has {len(instances)} slots, {len(idents)} modules given')
+        configured = dict(device)
+        configured['RxPdo'] = list(device['RxPdo'])
+        configured['TxPdo'] = list(device['TxPdo'])
+        parameters = device['SlotParameters']
+        for position, ((slot_name, slot), ident) in enumerate(zip(instances, idents)):
+            if not ident:
+                continue
+            if ident not in self.modules:
+                raise ValueError(f'no module #x{ident:08X} in {self.filename}')
+            accepted = [parse_hexdec(text) for text in slot['ModuleIdents']]
+            if (accepted or slot['ModuleClasses']) and ident not in accepted \
+                    and self.modules.describe(ident)[2] not in slot['ModuleClasses']:
+                raise ValueError(f'module #x{ident:08X} does not fit {slot_name} of {device["Name"]}')
+            module = self.modules[ident].device_descriptions[0]
+            pdo_increment = position * parse_hexdec(slot.get('SlotPdoIncrement') or parameters.get('SlotPdoIncrement') or '0')
+            index_increment = position * parse_hexdec(slot.get('SlotIndexIncrement') or parameters.get('SlotIndexIncrement') or '0')
+            for tag in ('RxPdo', 'TxPdo'):
+                for pdo in module[tag]:
+                    configured[tag].append(ObjectDictionary._slot_pdo(pdo, slot_name, pdo_increment, index_increment))
+        return configured
+
+    @staticmethod
+    def _slot_pdo(pdo, slot_name, pdo_increment, index_increment):
+        pdo = dict(pdo)
+        pdo['Name'] = f'{slot_name} {pdo.get("Name")}'
+        if 'IndexDependOnSlot' in pdo:
+            pdo['Index'] = _hex_index(parse_hexdec(pdo['Index']) + pdo_increment)
+        entries = []
+        for entry in pdo['Entries']:
+            if 'IndexDependOnSlot' in entry:
+                entry = dict(entry, Index=_hex_index(parse_hexdec(entry['Index']) + index_increment))
+            entries.append(entry)
+        pdo['Entries'] = entries
+        return pdo
+
+    def station_descriptions(self, idents):
+        ''' device_descriptions with each device that has Slots configured
+        with idents, see configure() '''
+        return [self.configure(device, idents) if device['Slots'] else device
+            for device in self.device_descriptions]
 
     def _add_tag(self, newTag):
-        if newTag not in self._tag_set:
-            self._tag_list.append(newTag)
-            self._tag_set.add(newTag)
+        if 1 == self._tag_phase and self._tag_owner is not None:
+            tags = self._datatype_tags.setdefault(self._tag_owner, [])
+            if newTag not in tags:
+                tags.append(newTag)
+            return
+        tag_set = self._tag_sets[self._tag_phase]
+        if newTag not in tag_set:
+            self._tag_phases[self._tag_phase].append(newTag)
+            tag_set.add(newTag)
             #print("add_tag(" + newTag + ")")
 
     def _parse_object(self, object):
-        d = dict()
+        d = ObjectRecord()
         # init dummy keys for object table
         d['Index'] = ''
         d['SubIdx'] = ''
@@ -122,6 +1073,16 @@ class ObjectDictionary:
                 d[node.tag] = node.text
         return d
     
+    def _parse_subitemtype(self, datatype_name, datatype):
+        owner = self._tag_owner
+        self._tag_owner = datatype_name
+        try:
+            if esi_xml.has_children(datatype.find('SubItem')):
+                return self._parse_subitem(datatype)
+            return self._parse_array(datatype)
+        finally:
+            self._tag_owner = owner
+
     def _parse_subitem(self, datatype):
         d = dict()
         subitems = dict()
@@ -139,6 +1100,16 @@ class ObjectDictionary:
                     subidx = f"{subidx_number}"
                     subitem['SubIdx'] = subidx
                     last_subidx = subidx_number
+                subitem_type = subitem.get('Type')
+                if subitem_type in self.subitemtypes_dict:
+                    # resolves nested types too, raising on cycles
+                    nested = self.subitemtypes_dict[subitem_type]
+                    if 'ArrayInfo' in nested:
+                        # each array element has its own subindex
+                        for element in self._expand_array(subitem, nested):
+                            subitems[element['SubIdx']] = element
+                            last_subidx = int(element['SubIdx'])
+                        continue
                 subitems[subidx] = subitem
             else:
                 d[node.tag] = node.text
@@ -146,9 +1117,30 @@ class ObjectDictionary:
             d['SubItems'] = subitems
         return d;
 
+    def _expand_array(self, subitem, array):
+        ''' an array typed SubItem becomes one SubItem per element '''
+        element_size = ObjectDictionary._array_element_bitsize(array, int(subitem.get('BitSize') or 0))
+        offset = int(subitem.get('BitOffs') or 0)
+        first_subidx = int(subitem['SubIdx'])
+        lbound = int(array['ArrayInfo']['LBound'])
+        elements = []
+        for i in range(int(array['ArrayInfo']['Elements'])):
+            element = subitem.derive(subitem['Index'], f"{subitem['Name']} {lbound + i}")
+            element['SubIdx'] = f'{first_subidx + i}'
+            element['Type'] = array['BaseType']
+            element['BitSize'] = f'{element_size}'
+            element['BitOffs'] = f'{offset + i * element_size}'
+            elements.append(element)
+        return elements
+
     def _parse_array(self, datatype):
         d = dict()
         d['BaseType'] = datatype.find('BaseType').text
+        bitsize = datatype.find('BitSize')
+        if bitsize is not None:
+            d['BitSize'] = bitsize.text
+        if d['BaseType'] in self.subitemtypes_dict:
+            self.subitemtypes_dict[d['BaseType']] # array of struct, resolve it too
         dArrayInfo = dict()
         array_info = datatype.find('ArrayInfo')
         dArrayInfo['LBound'] = array_info.find('LBound').text
@@ -165,7 +1157,7 @@ class ObjectDictionary:
             info = dict()
             info['Text'] = enumInfo.find('Text').text
             comment = enumInfo.find('Comment')
-            if comment:
+            if comment is not None:
                 info['Comment'] = comment.text
             value = enumInfo.find('Enum').text
             info['Value'] = value
@@ -199,9 +1191,6 @@ class ObjectDictionary:
             return True;
         return False;
 
-    # custom types should be DT followed by 4 hex digits
-    _m = re.compile('^DT[0-9A-F]{4}$')
-
     @staticmethod
     def _make_object_key(object):
         ''' key looks like #x1234:56 with index in hex and subindex in decimal '''
@@ -0,0 +1,168 @@
+# incremental regeneration: a manifest of what each output was generated
+# from, so unchanged outputs are neither regenerated nor rewritten
+
+__version__ = '0.1.0'
+
+import hashlib
+import json
+import os
+import pickle
+import esi_file
+from esi_profile import phase
+
+# bump when the manifest's layout changes
+MANIFEST_FORMAT = 1
+
+def add_manifest_argument(parser):
+    parser.add_argument('--manifest', metavar='FILE',
+        help='incremental mode: record what each output was generated from in this JSON file, '
+            'skip outputs whose input, tool version and options are unchanged, and never rewrite an output with identical content')
+
+def sha256_of_file(filename):
+    ''' hex digest of the file's contents, None if there is no such file '''
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def write_if_changed(write, filename):
+    ''' write(temporary filename) writes the new content, which replaces
+    filename only if it differs, so an identical output keeps its mtime.
+    Returns (whether filename was written, hex digest of its content). '''
+    temporary = f'{filename}.{os.getpid()}.tmp'
+    try:
+        write(temporary)
+        new_hash = sha256_of_file(temporary)
+        if new_hash == sha256_of_file(filename):
+            return False, new_hash
+        os.replace(temporary, filename)
+        return True, new_hash
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+class Output:
+    ''' one generated file. write(obj_dict, filename) generates it; with
+    needs_dictionary False it is called with None for obj_dict and reads
+    the input itself. options are what else the content depends on.
+    result is what write returned, if it was called. '''
+    __slots__ = ('filename', 'tool', 'version', 'options', 'write', 'needs_dictionary', 'result')
+
+    def __init__(self, filename, tool, version, options, write, needs_dictionary=True):
+        self.filename = filename
+        self.tool = tool
+        self.version = version
+        self.options = options
+        self.write = write
+        self.needs_dictionary = needs_dictionary
+        self.result = None
+
+    def source(self, input_filename, input_hash):
+        ''' what the manifest records this output was generated from '''
+        return {'input': os.path.abspath(input_filename), 'input_sha256': input_hash,
+            'tool': self.tool, 'version': self.version, 'parser_version': esi_file.__version__,
+            'options': self.options}
+
+class Manifest:
+    ''' JSON file mapping each output's absolute path to the source() it
+    was generated from plus the hash of its content, output_sha256. With
+    filename None the entries are only kept in memory. '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        if filename is None:
+            return
+        try:
+            with open(filename, encoding='UTF-8') as f:
+                data = json.load(f)
+            if MANIFEST_FORMAT == data.get('format'):
+                self.entries = data['outputs']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, AttributeError):
+            pass # unreadable, start over
+
+    def is_current(self, filename, source):
+        ''' whether filename was generated from source and not changed since '''
+        entry = self.entries.get(os.path.abspath(filename))
+        if entry is None:
+            return False
+        recorded = dict(entry)
+        output_hash = recorded.pop('output_sha256', None)
+        return recorded == source and output_hash == sha256_of_file(filename)
+
+    def record(self, filename, source, output_hash):
+        self.entries[os.path.abspath(filename)] = dict(source, output_sha256=output_hash)
+
+    def save(self):
+        temporary = f'{self.filename}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='UTF-8') as f:
+            json.dump({'format': MANIFEST_FORMAT, 'outputs': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.filename)
+
+def regenerate(manifest, input_filename, outputs, load):
+    ''' bring outputs, a list of Output, up to date with input_filename.
+    load(input_filename) is called at most once, and only if an output
+    needing the dictionary is out of date. Returns (Output, status) per
+    output, status being 'skipped' (current per the manifest),
+    'unchanged' (regenerated to identical content) or 'written'. '''
+    with phase('check_manifest'):
+        input_hash = sha256_of_file(input_filename)
+        if input_hash is None:
+            raise FileNotFoundError(f'no ESI file {input_filename}')
+        sources = [output.source(input_filename, input_hash) for output in outputs]
+        stale = [not manifest.is_current(output.filename, source) for output, source in zip(outputs, sources)]
+    obj_dict = None
+    if any(output.needs_dictionary and is_stale for output, is_stale in zip(outputs, stale)):
+        obj_dict = load(input_filename)
+    results = []
+    for output, source, is_stale in zip(outputs, sources, stale):
+        if not is_stale:
+            results.append((output, 'skipped'))
+            continue
+        def write(filename):
+            output.result = output.write(obj_dict, filename)
+        written, output_hash = write_if_changed(write, output.filename)
+        manifest.record(output.filename, source, output_hash)
+        results.append((output, 'written' if written else 'unchanged'))
+    return results
+
+def update(manifest_filename, input_filename, outputs, load):
+    ''' regenerate() with the manifest in manifest_filename '''
+    manifest = Manifest(manifest_filename)
+    results = regenerate(manifest, input_filename, outputs, load)
+    manifest.save()
+    return results
+
+class FragmentStore:
+    ''' per-device results kept between runs, see
+    esi_dynamic_slave.write_dynamic_slave_parallel, pickled to one file
+    per ESI file. Results from another version are dropped. '''
+
+    def __init__(self, filename, version):
+        self.filename = filename
+        self.version = version
+        self.fragments = {}
+        try:
+            with open(filename, 'rb') as f:
+                stored_version, fragments = pickle.load(f)
+            if stored_version == version:
+                self.fragments = fragments
+        except FileNotFoundError:
+            pass
+        except Exception:
+            pass # corrupt or from an incompatible version, start over
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        temporary = f'{self.filename}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump((self.version, self.fragments), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.filename)
+
+def fragment_store_path(manifest_filename, input_filename):
+    ''' where the device fragments of input_filename are kept, next to the manifest '''
+    key = hashlib.sha256(os.path.abspath(input_filename).encode('UTF-8')).hexdigest()
+    return os.path.join(manifest_filename + '.fragments', key[:32] + '.pickle')
@@ -0,0 +1,203 @@
+# index of an ESI library in SQLite: for each device (vendor id, product
+# code, revision) the file describing it and the byte span of its Device
+# element, so finding and reading one device parses only that device
+
+__version__ = '0.1.0'
+
+import hashlib
+import os
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from esi_file import ObjectDictionary, parse_hexdec
+from esi_profile import phase
+from esi_split import DeviceSplit, describe_span, read_spans
+from esi_xml import get_backend
+
+# PRAGMA user_version of the database, bump when the schema changes
+INDEX_FORMAT = 1
+
+_schema = '''
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    vendor_id INTEGER,
+    vendor_name TEXT,
+    fragment_start BLOB NOT NULL,
+    fragment_end BLOB NOT NULL
+);
+CREATE TABLE devices (
+    vendor_id INTEGER,
+    product_code INTEGER,
+    revision INTEGER,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    start_offset INTEGER NOT NULL,
+    end_offset INTEGER NOT NULL,
+    name TEXT,
+    type TEXT
+);
+CREATE INDEX devices_by_id ON devices (vendor_id, product_code, revision);
+CREATE INDEX devices_by_path ON devices (path);
+'''
+
+def parse_id(text):
+    ''' a vendor id, product code or revision written as in ESI files
+    (#x1234), in C (0x1234) or in decimal, None for None or empty '''
+    if text is None or '' == text:
+        return None
+    if text.startswith('#x'):
+        return parse_hexdec(text)
+    return int(text, 0)
+
+def scan_file(path, known_sha256=None, backend=None):
+    ''' (file row, device rows) for the index, the device rows None if
+    the content hashes to known_sha256, only the file's stat changed '''
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+    file_row = {'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha256}
+    if sha256 == known_sha256:
+        return file_row, None
+    split = DeviceSplit(data)
+    xml = get_backend(backend)
+    root = xml.fromstring(split.remainder(data))
+    file_row['vendor_id'] = parse_id(root.findtext('Vendor/Id'))
+    file_row['vendor_name'] = root.findtext('Vendor/Name')
+    file_row['fragment_start'] = split.prolog + split.root_start
+    file_row['fragment_end'] = split.root_end
+    devices = []
+    for position, (start, end) in enumerate(split.spans):
+        type, attributes, name = describe_span(xml, split.fragment(data[start:end]))
+        devices.append({'vendor_id': file_row['vendor_id'], 'product_code': parse_id(attributes.get('ProductCode')),
+            'revision': parse_id(attributes.get('RevisionNo')),
+            'path': path, 'position': position, 'start_offset': start, 'end_offset': end,
+            'name': name, 'type': type})
+    return file_row, devices
+
+def _scan_job(path, known_sha256, backend):
+    ''' scan_file in a worker process, never raises '''
+    try:
+        return scan_file(path, known_sha256, backend), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+class LibraryIndex:
+    ''' the index in the SQLite database filename, created if needed.
+    Paths are kept absolute. '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        if INDEX_FORMAT != self.connection.execute('PRAGMA user_version').fetchone()[0]:
+            # new, or from another version: start over
+            with self.connection:
+                for table in ('devices', 'files'):
+                    self.connection.execute(f'DROP TABLE IF EXISTS {table}')
+                self.connection.executescript(_schema)
+                self.connection.execute(f'PRAGMA user_version = {INDEX_FORMAT}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def update(self, filenames, jobs=None, backend=None, prune=True):
+        ''' bring the index up to date with filenames. A file whose mtime
+        and size are as recorded isn't read, one whose content hashes as
+        recorded isn't parsed. With prune, files not in filenames are
+        dropped from the index. Returns a Counter of what happened to
+        the files, 'scanned', 'touched' (only the stat changed),
+        'unchanged', 'removed' and 'failed', and a list of (path, error). '''
+        statuses = Counter()
+        errors = []
+        paths = list(dict.fromkeys(os.path.abspath(filename) for filename in filenames))
+        with phase('index_check'):
+            recorded = {row['path']: row for row in self.connection.execute('SELECT path, mtime_ns, size, sha256 FROM files')}
+            stale = []
+            for path in paths:
+                row = recorded.get(path)
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    errors.append((path, str(e)))
+                    statuses['failed'] += 1
+                    continue
+                if row is not None and row['mtime_ns'] == stat.st_mtime_ns and row['size'] == stat.st_size:
+                    statuses['unchanged'] += 1
+                else:
+                    stale.append((path, row['sha256'] if row is not None else None))
+        with phase('index_scan') as p:
+            if 1 == jobs or len(stale) < 2:
+                results = [_scan_job(path, sha256, backend) for path, sha256 in stale]
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    results = list(executor.map(_scan_job, *zip(*stale), [backend] * len(stale),
+                        chunksize=max(1, len(stale) // (4 * (jobs or os.cpu_count())))))
+            p.add_items(len(stale))
+        with self.connection:
+            for (path, sha256), (result, error) in zip(stale, results):
+                if error is not None:
+                    errors.append((path, error))
+                    statuses['failed'] += 1
+                    continue
+                file_row, devices = result
+                if devices is None:
+                    self.connection.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?',
+                        (file_row['mtime_ns'], file_row['size'], path))
+                    statuses['touched'] += 1
+                    continue
+                self._remove(path)
+                self.connection.execute('INSERT INTO files VALUES (:path, :mtime_ns, :size, :sha256, '
+                    ':vendor_id, :vendor_name, :fragment_start, :fragment_end)', file_row)
+                self.connection.executemany('INSERT INTO devices VALUES (:vendor_id, :product_code, :revision, '
+                    ':path, :position, :start_offset, :end_offset, :name, :type)', devices)
+                statuses['scanned'] += 1
+            if prune:
+                for path in set(recorded) - set(paths):
+                    self._remove(path)
+                    statuses['removed'] += 1
+        return statuses, errors
+
+    def _remove(self, path):
+        self.connection.execute('DELETE FROM devices WHERE path = ?', (path,))
+        self.connection.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def find(self, vendor_id, product_code, revision=None):
+        ''' the devices with these ids, as dicts of the devices table's
+        columns, the highest revision first if revision is None '''
+        if revision is None:
+            rows = self.connection.execute('SELECT * FROM devices WHERE vendor_id = ? AND product_code = ? '
+                'ORDER BY revision DESC, path, position', (vendor_id, product_code))
+        else:
+            rows = self.connection.execute('SELECT * FROM devices WHERE vendor_id = ? AND product_code = ? '
+                'AND revision = ? ORDER BY path, position', (vendor_id, product_code, revision))
+        return [dict(row) for row in rows]
+
+    def device_xml(self, device):
+        ''' a standalone document holding just the Device element of
+        device, a result of find(), read from its file '''
+        file_row = self.connection.execute('SELECT mtime_ns, size, fragment_start, fragment_end FROM files WHERE path = ?',
+            (device['path'],)).fetchone()
+        if file_row is None:
+            raise ValueError(f'{device["path"]} is not in the index')
+        stat = os.stat(device['path'])
+        if stat.st_mtime_ns != file_row['mtime_ns'] or stat.st_size != file_row['size']:
+            raise ValueError(f'{device["path"]} changed since it was indexed, update the index')
+        data, = read_spans(device['path'], [(device['start_offset'], device['end_offset'])])
+        return file_row['fragment_start'] + data + file_row['fragment_end']
+
+    def load_device(self, device, backend=None):
+        ''' the device_descriptions entry of device, a result of find(),
+        parsing only its Device element '''
+        root = get_backend(backend).fromstring(self.device_xml(device))
+        return ObjectDictionary.describe_device(root[0])
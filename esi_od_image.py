@@ -0,0 +1,241 @@
+# write the object directory from an EtherCAT ESI file as a binary image
+# of fixed size records, and read such images in place through mmap, so
+# tools can load a dictionary at run time without parsing XML
+
+__version__ = '0.1.0'
+
+import mmap
+import struct
+import sys
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from esi_file import parse_hexdec
+from esi_profile import phase
+from esi_strings import StringPool
+
+# bump when the layout of the image changes
+IMAGE_FORMAT = 1
+
+MAGIC = b'ESIODIMG'
+
+# little endian throughout. The header is followed by the keys of the
+# records, (index << 8) | subindex as uint32 in ascending order, then the
+# records in the same order, then the string table. Sections start on
+# 8 byte boundaries. Strings are given as byte offsets into the string
+# table, UTF-8 and NUL terminated, offset 0 being the empty string.
+HEADER = struct.Struct('<8sHHIIIIIIIII')
+_header_fields = ('magic', 'format', 'record_size', 'count', 'keys_offset', 'records_offset',
+    'strings_offset', 'strings_size', 'source', 'vendor', 'devices', 'reserved')
+
+# index, subindex, access flags, type code, reserved, bit size, bit offset,
+# then the strings name, type name, comment, default value
+RECORD = struct.Struct('<HBBHHIIIIII')
+
+KEY_SIZE = 4
+
+# access flags
+ACCESS_READ = 0x01
+ACCESS_WRITE = 0x02
+ACCESS_RXPDO = 0x04 # mappable into an RxPDO
+ACCESS_TXPDO = 0x08 # mappable into a TxPDO
+
+# bit offset of an object that isn't a member of a struct or array
+NO_BIT_OFFSET = 0xFFFFFFFF
+
+# type codes are the positions in the Type enum of EsiObjDirToCPPHeader
+TYPE_CODES = ('UNKNOWN', 'STRING', 'ARRAY', 'STRUCT', 'BOOL', 'SINT', 'INT', 'DINT', 'LINT',
+    'USINT', 'BYTE', 'UINT', 'WORD', 'UDINT', 'DWORD', 'ULINT', 'LWORD', 'REAL', 'LREAL')
+_type_codes = {name: code for code, name in enumerate(TYPE_CODES)}
+
+ImageObject = namedtuple('ImageObject', 'index subindex access type_code bit_size bit_offset name type comment default')
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def access_flags(object):
+    access = object.get('Access') or ''
+    pdo_mapping = (object.get('PdoMapping') or '').upper()
+    flags = 0
+    if 'r' in access:
+        flags = flags | ACCESS_READ
+    if 'w' in access:
+        flags = flags | ACCESS_WRITE
+    if 'R' in pdo_mapping:
+        flags = flags | ACCESS_RXPDO
+    if 'T' in pdo_mapping:
+        flags = flags | ACCESS_TXPDO
+    return flags
+
+def type_code(obj_dict, name):
+    ''' the code of the Type enum for DataType name, an enum DataType
+    being coded as its base type '''
+    code = _type_codes.get(name)
+    if code is not None:
+        return code
+    if name.startswith('STRING('):
+        return _type_codes['STRING']
+    if name.startswith('ARRAY'):
+        return _type_codes['ARRAY']
+    if name in obj_dict.enumtypes_dict:
+        return _type_codes.get(obj_dict.enumtypes_dict[name]['BaseType'], 0)
+    if name in obj_dict.subitemtypes_dict:
+        return _type_codes['ARRAY' if 'ArrayInfo' in obj_dict.subitemtypes_dict[name] else 'STRUCT']
+    return 0
+
+def _number(text, default):
+    if text is None or '' == text:
+        return default
+    return parse_hexdec(text)
+
+def write_od_image(obj_dict, f):
+    ''' the image of obj_dict to the binary file f '''
+    with phase('emit_image') as p:
+        strings = StringPool()
+        source = strings.add(obj_dict.filename or '')
+        vendor = strings.add(obj_dict.vendor or '')
+        devices = strings.add('\n'.join(obj_dict.devices))
+        keys = []
+        records = []
+        for key, object in obj_dict.object_index.items():
+            keys.append(key)
+            records.append(RECORD.pack(key >> 8, key & 0xFF, access_flags(object),
+                type_code(obj_dict, object.get('Type') or ''), 0,
+                _number(object.get('BitSize'), 0), _number(object.get('BitOffs'), NO_BIT_OFFSET),
+                strings.add(object.get('Name') or ''), strings.add(object.get('Type') or ''),
+                strings.add(object.get('Comment') or ''), strings.add(object.get('DefaultValue') or '')))
+        keys_offset = _align(HEADER.size)
+        records_offset = _align(keys_offset + KEY_SIZE * len(keys))
+        strings_offset = _align(records_offset + RECORD.size * len(records))
+        f.write(HEADER.pack(MAGIC, IMAGE_FORMAT, RECORD.size, len(records), keys_offset, records_offset,
+            strings_offset, strings.size, source, vendor, devices, 0))
+        f.write(bytes(keys_offset - HEADER.size))
+        f.write(struct.pack(f'<{len(keys)}I', *keys))
+        f.write(bytes(records_offset - keys_offset - KEY_SIZE * len(keys)))
+        f.write(b''.join(records))
+        f.write(bytes(strings_offset - records_offset - RECORD.size * len(records)))
+        f.write(strings.encode())
+        p.add_items(len(records))
+
+def write_od_image_file(obj_dict, filename):
+    with open(filename, 'wb') as f:
+        write_od_image(obj_dict, f)
+
+class _Keys:
+    ''' the key section read with struct, where a cast memoryview would
+    read it in the wrong byte order '''
+    __slots__ = ('view', 'count')
+
+    def __init__(self, view, count):
+        self.view = view
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from('<I', self.view, KEY_SIZE * i)[0]
+
+class ObjectImage:
+    ''' an image written by write_od_image, mapped into memory. Lookups
+    bisect the key section and unpack only the records they return;
+    nothing is read into Python objects up front. '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        if len(self._view) < HEADER.size:
+            raise ValueError(f'{self.filename} is not an object dictionary image')
+        header = dict(zip(_header_fields, HEADER.unpack_from(self._view)))
+        if MAGIC != header['magic']:
+            raise ValueError(f'{self.filename} is not an object dictionary image')
+        if IMAGE_FORMAT != header['format'] or RECORD.size != header['record_size']:
+            raise ValueError(f'{self.filename} is an image of format {header["format"]}, expected {IMAGE_FORMAT}')
+        if header['strings_offset'] + header['strings_size'] > len(self._view):
+            raise ValueError(f'{self.filename} is truncated')
+        self.count = header['count']
+        self._key_bytes = self._view[header['keys_offset']:header['keys_offset'] + KEY_SIZE * self.count]
+        if 'little' == sys.byteorder:
+            self._keys = self._key_bytes.cast('I')
+        else:
+            self._keys = _Keys(self._key_bytes, self.count)
+        self._records = self._view[header['records_offset']:header['records_offset'] + RECORD.size * self.count]
+        self._strings_offset = header['strings_offset']
+        self._strings = self._view[header['strings_offset']:header['strings_offset'] + header['strings_size']]
+        self.source = self.string(header['source'])
+        self.vendor = self.string(header['vendor'])
+        devices = self.string(header['devices'])
+        self.devices = devices.split('\n') if devices else []
+
+    def close(self):
+        # views must be released before the map can be closed
+        for name in ('_keys', '_key_bytes', '_records', '_strings'):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.count
+
+    def string(self, offset):
+        ''' the string at offset in the string table '''
+        start = self._strings_offset + offset
+        return self._map[start:self._map.find(b'\0', start)].decode('UTF-8')
+
+    def record(self, position):
+        ''' the raw fields of the record at position, strings as offsets '''
+        return RECORD.unpack_from(self._records, RECORD.size * position)
+
+    def object(self, position):
+        fields = self.record(position)
+        return ImageObject(*fields[:4], *fields[5:7], *(self.string(offset) for offset in fields[7:]))
+
+    def find(self, index, subindex=0):
+        ''' the ImageObject at index:subindex, None if there is none '''
+        key = (index << 8) | subindex
+        position = bisect_left(self._keys, key)
+        if position < self.count and self._keys[position] == key:
+            return self.object(position)
+        return None
+
+    def range(self, first, last):
+        ''' the ImageObjects with first <= index <= last '''
+        begin = bisect_left(self._keys, first << 8)
+        end = bisect_right(self._keys, (last << 8) | 0xFF)
+        return [self.object(position) for position in range(begin, end)]
+
+    def subindices(self, index):
+        return self.range(index, index)
+
+    def search(self, text):
+        ''' the ImageObjects whose name contains text, ignoring ASCII case,
+        found by scanning the string table and then the name fields '''
+        if not text:
+            return [self.object(position) for position in range(self.count)]
+        strings = bytes(self._strings).lower()
+        needle = text.encode('UTF-8').lower()
+        offsets = set()
+        position = strings.find(needle)
+        while position >= 0:
+            offsets.add(strings.rfind(b'\0', 0, position) + 1)
+            # on from the end of the string matched
+            position = strings.find(needle, strings.index(b'\0', position) + 1)
+        return [self.object(position) for position, fields in enumerate(RECORD.iter_unpack(self._records))
+            if fields[7] in offsets]
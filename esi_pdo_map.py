@@ -0,0 +1,186 @@
+# From ESI file, compute where each PDO entry of each device lies in the
+# process image and generate structured text tables of the bit offsets,
+# so a master can read IO data without parsing anything at run time.
+
+__version__ = '0.2.1'
+
+import re
+from esi_emit import Emitter, Template
+from esi_file import parse_hexdec
+from esi_profile import phase
+
+# bits of the elementary data types PDO entries map
+data_type_bits = {
+    'BOOL' : 1,
+    'BIT' : 1,
+    'SINT' : 8,
+    'USINT' : 8,
+    'BYTE' : 8,
+    'INT' : 16,
+    'UINT' : 16,
+    'WORD' : 16,
+    'INT24' : 24,
+    'UINT24' : 24,
+    'DINT' : 32,
+    'UDINT' : 32,
+    'DWORD' : 32,
+    'REAL' : 32,
+    'INT40' : 40,
+    'UINT40' : 40,
+    'INT48' : 48,
+    'UINT48' : 48,
+    'INT56' : 56,
+    'UINT56' : 56,
+    'LINT' : 64,
+    'ULINT' : 64,
+    'LWORD' : 64,
+    'LREAL' : 64,
+}
+
+_array_type = re.compile(r'ARRAY\s*\[\s*(-?\d+)\s*\.\.\s*(-?\d+)\s*\]\s*OF\s+(.+)')
+_string_type = re.compile(r'STRING\s*\(\s*(\d+)\s*\)')
+_bit_type = re.compile(r'BIT(\d+)')
+
+# usiSm of a PDO not assigned to a sync manager by default
+UNASSIGNED_SM = 255
+
+header = Template('''// Automatically generated by ESIUtils
+// from {filename}
+// for vendor {vendor}
+// for device(s) {devices}
+VAR_GLOBAL CONSTANT
+\tMAX_PDOS : INT := {count};
+\taPdos : ARRAY[1..MAX_PDOS] OF STRUCT_PDO_LAYOUT := [
+''')
+
+pdo_decl = Template('\t\t(udiProductCode := {productCode}, udiRevisionNo := {revisionNo}, wIndex := {index}, usiSm := {sm}, '
+    'udiBitOffset := {bitOffset}, udiBitLength := {bitLength}, iFirst := {first}, iCount := {count}){comma}\t// {device} {name}\n')
+
+entries_header = Template('''\t];
+\tMAX_PDO_ENTRIES : INT := {count};
+\taPdoEntries : ARRAY[1..MAX_PDO_ENTRIES] OF STRUCT_PDO_ENTRY := [
+''')
+
+entry_decl = Template('\t\t(wIndex := {index}, bySubIndex := {subindex}, udiBitOffset := {bitOffset}, uiBitLength := {bitLength}){comma}\t// {name}\n')
+
+footer = '''\t];
+END_VAR
+'''
+
+def data_type_size(dataType):
+    ''' bits of dataType, e.g. 16 for UINT or 32 for ARRAY [0..3] OF BYTE,
+    None if it isn't known '''
+    dataType = dataType.strip()
+    bits = data_type_bits.get(dataType)
+    if bits is not None:
+        return bits
+    match = _array_type.fullmatch(dataType)
+    if match:
+        element_bits = data_type_size(match.group(3))
+        if element_bits is None:
+            return None
+        return (int(match.group(2)) - int(match.group(1)) + 1) * element_bits
+    match = _string_type.fullmatch(dataType)
+    if match:
+        return 8 * int(match.group(1))
+    match = _bit_type.fullmatch(dataType)
+    if match:
+        return int(match.group(1))
+    return None
+
+def is_padding(entry):
+    ''' a gap in the PDO rather than a mapped object: index 0 '''
+    return 0 == parse_hexdec(entry.get('Index') or '0')
+
+def entry_bits(entry):
+    ''' bits a PDO entry takes: its BitLen, which is what the slave maps,
+    else the size of its DataType. None if neither is known. '''
+    bit_len = entry.get('BitLen')
+    if bit_len:
+        return parse_hexdec(bit_len)
+    return data_type_size(entry.get('DataType') or '')
+
+def pdo_sm(pdo):
+    ''' the sync manager a PDO is assigned to by default, None if none '''
+    sm = pdo.get('Sm')
+    if sm is None or '' == sm:
+        return None
+    return parse_hexdec(sm)
+
+class PdoLayout:
+    ''' where a PDO lies in the process image of its sync manager.
+    entries are (entry, bit offset, bit length) of the mapped entries,
+    padding is only accounted for in the offsets. A PDO that isn't
+    assigned has sm None and offsets from its own start. '''
+    __slots__ = ('pdo', 'sm', 'bit_offset', 'bit_length', 'entries')
+
+    def __init__(self, pdo, sm, bit_offset):
+        self.pdo = pdo
+        self.sm = sm
+        self.bit_offset = bit_offset
+        self.entries = []
+        offset = bit_offset
+        for entry in pdo['Entries']:
+            bits = entry_bits(entry)
+            if bits is None:
+                raise ValueError(f'PDO {pdo.get("Name")} entry {entry.get("Name")} has no BitLen and unknown data type {entry.get("DataType")}')
+            if not is_padding(entry):
+                self.entries.append((entry, offset, bits))
+            offset = offset + bits
+        self.bit_length = offset - bit_offset
+
+def device_layout(device):
+    ''' PdoLayout of each RxPdo then TxPdo of a device description, the
+    PDOs assigned to a sync manager following each other in its image '''
+    sm_bits = {}
+    layouts = []
+    for pdo in device['RxPdo'] + device['TxPdo']:
+        sm = pdo_sm(pdo)
+        layout = PdoLayout(pdo, sm, sm_bits.get(sm, 0) if sm is not None else 0)
+        if sm is not None:
+            sm_bits[sm] = layout.bit_offset + layout.bit_length
+        layouts.append(layout)
+    return layouts
+
+def process_image_bits(device, sm):
+    ''' bits of the PDOs assigned to sync manager sm by default '''
+    return sum(layout.bit_length for layout in device_layout(device) if layout.sm == sm)
+
+def to_st_number(text):
+    return text.replace('#x', '16#')
+
+def write_pdo_map(obj_dict, f, modules=None):
+    ''' with modules, a list of module idents, modular devices are mapped
+    as holding these modules in their slots '''
+    devices = obj_dict.device_descriptions if modules is None else obj_dict.station_descriptions(modules)
+    with phase('emit_pdo_map') as p, Emitter(f) as out:
+        pdos = []
+        entries = []
+        for device in devices:
+            for layout in device_layout(device):
+                pdos.append((device, layout, len(entries) + 1))
+                entries.extend(layout.entries)
+        out.emit(header, filename=obj_dict.filename, vendor=obj_dict.vendor,
+            devices=obj_dict.devices, count=len(pdos))
+        for i, (device, layout, first) in enumerate(pdos, 1):
+            out.emit(pdo_decl,
+                productCode=to_st_number(device.get('ProductCode') or '0'),
+                revisionNo=to_st_number(device.get('RevisionNo') or '0'),
+                index=to_st_number(layout.pdo['Index']),
+                sm=UNASSIGNED_SM if layout.sm is None else layout.sm,
+                bitOffset=layout.bit_offset, bitLength=layout.bit_length,
+                first=first, count=len(layout.entries),
+                comma='' if i == len(pdos) else ',',
+                device=device['Name'], name=layout.pdo['Name'])
+        out.emit(entries_header, count=len(entries))
+        for i, (entry, bit_offset, bit_length) in enumerate(entries, 1):
+            out.emit(entry_decl, index=to_st_number(entry['Index']),
+                subindex=parse_hexdec(entry.get('SubIndex') or '0'),
+                bitOffset=bit_offset, bitLength=bit_length,
+                comma='' if i == len(entries) else ',', name=entry.get('Name'))
+        out.write(footer)
+        p.add_items(len(pdos))
+
+def write_pdo_map_file(obj_dict, filename, modules=None):
+    with open(filename, 'w', encoding='utf-8') as f:
+        write_pdo_map(obj_dict, f, modules)
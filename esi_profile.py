@@ -0,0 +1,175 @@
+# per-phase timing, allocation and item count instrumentation
+
+__version__ = '0.1.0'
+
+import json
+import sys
+import time
+import tracemalloc
+
+# callables taking a PhaseRecord, see add_hook
+_hooks = []
+
+class PhaseRecord:
+    ''' what one phase cost. allocated_bytes is the peak traced memory
+    above what was in use when the phase started, None unless tracemalloc
+    is tracing. depth is the number of enclosing phases, started is the
+    time.perf_counter() at which it began. '''
+    __slots__ = ('name', 'seconds', 'allocated_bytes', 'items', 'depth', 'started')
+
+    def __init__(self, name, seconds, allocated_bytes, items, depth, started):
+        self.name = name
+        self.seconds = seconds
+        self.allocated_bytes = allocated_bytes
+        self.items = items
+        self.depth = depth
+        self.started = started
+
+    def as_dict(self):
+        return {'name': self.name, 'seconds': self.seconds,
+            'allocated_bytes': self.allocated_bytes, 'items': self.items, 'depth': self.depth}
+
+class _NullPhase:
+    ''' stands in for a phase when nobody is listening '''
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def add_items(self, n):
+        pass
+
+_null_phase = _NullPhase()
+
+# open phases, innermost last, so nested peaks can be passed outwards
+_open_phases = []
+
+class _Phase:
+    __slots__ = ('name', 'items', '_start', '_base_memory', '_peak')
+
+    def __init__(self, name):
+        self.name = name
+        self.items = None
+
+    def add_items(self, n):
+        self.items = (self.items or 0) + n
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if _open_phases:
+                _open_phases[-1]._note_peak(peak)
+            tracemalloc.reset_peak()
+            self._base_memory = current
+            self._peak = current
+        else:
+            self._base_memory = None
+        _open_phases.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def _note_peak(self, peak):
+        if peak > self._peak:
+            self._peak = peak
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        _open_phases.pop()
+        allocated = None
+        if self._base_memory is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self._note_peak(peak)
+            allocated = self._peak - self._base_memory
+            if _open_phases:
+                _open_phases[-1]._note_peak(self._peak)
+        record = PhaseRecord(self.name, seconds, allocated, self.items, len(_open_phases), self._start)
+        for hook in list(_hooks):
+            hook(record)
+        return False
+
+def phase(name):
+    ''' context manager around one phase of work, e.g.
+        with phase('parse_xml') as p:
+            ...
+            p.add_items(len(objects))
+    Costs one list check when no hooks are installed. '''
+    if not _hooks:
+        return _null_phase
+    return _Phase(name)
+
+def add_hook(hook):
+    ''' hook is called with a PhaseRecord as each phase ends '''
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+class Profiler:
+    ''' collects the phases run while it is active
+        with Profiler() as profiler:
+            ...
+        profiler.write(sys.stderr)
+    '''
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._started_tracing = False
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_hook(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def phases(self):
+        ''' records in the order the phases started, hooks see them as they end '''
+        return sorted(self.records, key=lambda record: record.started)
+
+    def as_json(self):
+        return json.dumps({'phases': [record.as_dict() for record in self.phases()]}, indent=1)
+
+    def as_text(self):
+        lines = [f'{"phase":28} {"seconds":>9} {"allocated KiB":>14} {"items":>9}']
+        for record in self.phases():
+            name = '  ' * record.depth + record.name
+            allocated = '' if record.allocated_bytes is None else record.allocated_bytes // 1024
+            items = '' if record.items is None else record.items
+            lines.append(f'{name:28} {record.seconds:9.4f} {allocated:>14} {items:>9}')
+        return '\n'.join(lines)
+
+    def write(self, f, format='text'):
+        print(self.as_json() if 'json' == format else self.as_text(), file=f)
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', nargs='?', const='text', choices=['text', 'json'],
+        help='report time, allocations and item counts per phase on stderr')
+
+class profile_from_args:
+    ''' context manager that profiles the enclosed work if --profile was given '''
+
+    def __init__(self, args):
+        self.format = args.profile
+        self.profiler = Profiler() if self.format else None
+
+    def __enter__(self):
+        if self.profiler:
+            self.profiler.__enter__()
+        return self.profiler
+
+    def __exit__(self, *exc):
+        if self.profiler:
+            self.profiler.__exit__(*exc)
+            self.profiler.write(sys.stderr, self.format)
+        return False
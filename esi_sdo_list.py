@@ -0,0 +1,89 @@
+# From ESI file, generate structured text code with a list of valid
+# SDO object addresses.
+
+__version__ = '0.2.0'
+
+from esi_emit import Emitter, Template
+from esi_file import parse_hexdec
+from esi_profile import phase
+
+header = Template('''// Automatically generated by EsiToValidSdoList.py
+// from {filename}
+// for vendor {vendor}
+// for device(s) {devices}
+VAR_GLOBAL CONSTANT
+\tMAX_VALID_SDOS : INT := {count};
+\taValidSDOs : ARRAY[1..MAX_VALID_SDOS] OF STRUCT_SDO_TARGET := [
+''')
+
+sdo_decl = Template('\t\t(wIndex := {index}, bySubIndex := {subindex}){comma}\t// {name}\n')
+
+footer = '''\t];
+END_VAR
+'''
+
+# with sorted_index, the entries of each index in aValidSDOs
+index_table_header = Template('''\t];
+\tMAX_SDO_INDICES : INT := {count};
+\taSDOIndices : ARRAY[1..MAX_SDO_INDICES] OF STRUCT_SDO_INDEX := [
+''')
+
+index_decl = Template('\t\t(wIndex := {index}, iFirst := {first}, iCount := {count}){comma}\n')
+
+def object_index_to_st_hex(index):
+    return index.replace('#x', '16#')
+
+def object_subindex_to_st_decimal(subindex):
+    if '' == subindex:
+        return '0'
+    else:
+        return subindex
+
+def object_to_sdo_decl(object, f, comma):
+    f.write(sdo_decl.render(
+        index=object_index_to_st_hex(object['Index']),
+        subindex=object_subindex_to_st_decimal(object['SubIdx']),
+        comma=comma,
+        name=object['Name']))
+
+def index_table(objects):
+    ''' (Index, first position, count) of each index's run of entries
+    in objects, a list sorted by index; positions count from 1 as the
+    ST array does '''
+    table = []
+    last_index = None
+    for position, object in enumerate(objects, 1):
+        index = parse_hexdec(object['Index'])
+        if index != last_index:
+            table.append([object['Index'], position, 0])
+            last_index = index
+        table[-1][2] = table[-1][2] + 1
+    return table
+
+def write_sdo_list(obj_dict, f, sorted_index=False):
+    ''' aValidSDOs in dictionary order, or with sorted_index in
+    wIndex, bySubIndex order followed by aSDOIndices, the position
+    and number of the entries of each index '''
+    with phase('emit_sdo_list') as p, Emitter(f) as out:
+        if sorted_index:
+            objects = list(obj_dict.object_index)
+        else:
+            objects = list(obj_dict.objects_dict.values())
+        # Generate CODESYS Structured Text Configuration Fragment
+        out.emit(header, filename=obj_dict.filename, vendor=obj_dict.vendor,
+            devices=obj_dict.devices, count=len(objects))
+        for i, value in enumerate(objects, 1):
+            comma = '' if i == len(objects) else ','
+            object_to_sdo_decl(value, out, comma)
+        if sorted_index:
+            table = index_table(objects)
+            out.emit(index_table_header, count=len(table))
+            for i, (index, first, count) in enumerate(table, 1):
+                comma = '' if i == len(table) else ','
+                out.emit(index_decl, index=object_index_to_st_hex(index), first=first, count=count, comma=comma)
+        out.write(footer)
+        p.add_items(len(objects))
+
+def write_sdo_list_file(obj_dict, filename, sorted_index=False):
+    with open(filename, 'w', encoding='utf-8') as f:
+        write_sdo_list(obj_dict, f, sorted_index)
@@ -0,0 +1,300 @@
+# long running query service: keeps the ObjectDictionary of every ESI
+# file below a directory in memory, answers JSON-RPC queries about them
+# over a Unix socket or a localhost port, and reloads files as they change
+
+__version__ = '0.1.0'
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from esi_cache import load_object_dictionary
+from esi_file import ObjectDictionary
+from esi_library import parse_id
+
+DEFAULT_POLL_SECONDS = 2.0
+DEFAULT_SEARCH_LIMIT = 100
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+class QueryError(Exception):
+    ''' a query the server can't answer, reported to the client '''
+    def __init__(self, message, code=INVALID_PARAMS):
+        super().__init__(message)
+        self.code = code
+
+def list_esi_files(directory):
+    ''' {path relative to directory: (mtime_ns, size)} of the .xml files
+    below directory '''
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for name in filenames:
+            if name.lower().endswith('.xml'):
+                filename = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue # removed while walking
+                found[os.path.relpath(filename, directory).replace(os.sep, '/')] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+def _load_state(filename, cache_dir):
+    ''' parse filename in a worker process, returning the plain data
+    snapshot the cache keeps too, as parsed elements don't pickle '''
+    return load_object_dictionary(filename, cache_dir)._to_state()
+
+def record_to_json(object):
+    return dict(object)
+
+def _index_param(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise QueryError(f'missing parameter {name}')
+    if isinstance(value, int):
+        return value
+    try:
+        return parse_id(str(value))
+    except ValueError:
+        raise QueryError(f'{name} must be a number, not {value!r}')
+
+class QueryServer:
+    ''' the dictionaries of the ESI files below directory, parsed in up
+    to jobs worker processes and swapped in whole once parsed, so
+    queries are never held up by a reload. The directory is polled for
+    changes every poll_seconds. '''
+
+    def __init__(self, directory, cache_dir=None, jobs=None, poll_seconds=DEFAULT_POLL_SECONDS):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.poll_seconds = poll_seconds
+        self.dictionaries = {} # relative path -> ObjectDictionary
+        self.stats = {} # relative path -> (mtime_ns, size) it was loaded at
+        self.errors = {} # relative path -> why it couldn't be loaded
+        self.reloads = 0
+        self.methods = {
+            'files': self.files,
+            'lookup': self.lookup,
+            'subindices': self.subindices,
+            'range': self.range,
+            'where': self.where,
+            'search': self.search,
+        }
+        self._executor = None
+
+    async def reload(self):
+        ''' load the files that are new or changed since the last call and
+        drop the removed ones. Returns the relative paths reloaded. '''
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(None, list_esi_files, self.directory)
+        for path in set(self.stats) - set(found):
+            self.dictionaries.pop(path, None)
+            self.errors.pop(path, None)
+            del self.stats[path]
+        changed = [path for path, stat in found.items() if self.stats.get(path) != stat]
+        if not changed:
+            return []
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+        async def load(path):
+            # each file is swapped in as soon as it is parsed
+            try:
+                state = await loop.run_in_executor(self._executor, _load_state, os.path.join(self.directory, path), self.cache_dir)
+            except Exception as e:
+                self.dictionaries.pop(path, None)
+                self.errors[path] = f'{type(e).__name__}: {e}'
+            else:
+                obj_dict = ObjectDictionary._from_state(state, os.path.join(self.directory, path))
+                obj_dict.object_index # built here rather than by the first query
+                self.dictionaries[path] = obj_dict
+                self.errors.pop(path, None)
+            self.stats[path] = found[path]
+        await asyncio.gather(*(load(path) for path in changed))
+        self.reloads = self.reloads + 1
+        return changed
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                changed = await self.reload()
+            except Exception as e:
+                print(f'reload failed: {e}', file=sys.stderr)
+                continue
+            if changed:
+                print(f'reloaded {", ".join(sorted(changed))}', file=sys.stderr)
+
+    def _dictionary(self, params):
+        ''' the dictionary of the file parameter, a path relative to the
+        directory or a file name unique in it '''
+        name = params.get('file')
+        if name is None:
+            raise QueryError('missing parameter file')
+        obj_dict = self.dictionaries.get(name)
+        if obj_dict is not None:
+            return name, obj_dict
+        matches = [path for path in self.dictionaries if os.path.basename(path) == name]
+        if 1 == len(matches):
+            return matches[0], self.dictionaries[matches[0]]
+        if matches:
+            raise QueryError(f'file {name} is ambiguous: {", ".join(sorted(matches))}')
+        if name in self.errors:
+            raise QueryError(f'file {name} failed to load: {self.errors[name]}', SERVER_ERROR)
+        raise QueryError(f'no file {name}')
+
+    def files(self, params):
+        ''' the loaded files with their vendor, devices and object count,
+        and the ones that failed to load '''
+        return {
+            'files': [{'file': path, 'vendor': obj_dict.vendor, 'devices': obj_dict.devices,
+                'objects': len(obj_dict.objects_dict)} for path, obj_dict in sorted(self.dictionaries.items())],
+            'errors': self.errors,
+        }
+
+    def lookup(self, params):
+        ''' the object at index and subindex (default 0), None if none '''
+        path, obj_dict = self._dictionary(params)
+        object = obj_dict.object_index.get(_index_param(params, 'index'), _index_param(params, 'subindex', 0))
+        return None if object is None else record_to_json(object)
+
+    def subindices(self, params):
+        path, obj_dict = self._dictionary(params)
+        return [record_to_json(object) for object in obj_dict.object_index.subindices(_index_param(params, 'index'))]
+
+    def range(self, params):
+        ''' the objects with first <= index <= last '''
+        path, obj_dict = self._dictionary(params)
+        return [record_to_json(object) for object in
+            obj_dict.object_index.range(_index_param(params, 'first'), _index_param(params, 'last'))]
+
+    def where(self, params):
+        ''' the objects whose field equals value '''
+        path, obj_dict = self._dictionary(params)
+        if 'field' not in params:
+            raise QueryError('missing parameter field')
+        objects = obj_dict.object_index.where(params['field'], params.get('value'),
+            _index_param(params, 'first', 0), _index_param(params, 'last', 0xFFFF))
+        return [record_to_json(object) for object in objects]
+
+    def search(self, params):
+        ''' objects whose field (default Name) contains text, ignoring
+        case, in the file given or in all files, at most limit of them '''
+        text = params.get('text')
+        if not isinstance(text, str):
+            raise QueryError('missing parameter text')
+        field = params.get('field', 'Name')
+        limit = params.get('limit', DEFAULT_SEARCH_LIMIT)
+        if 'file' in params:
+            dictionaries = [self._dictionary(params)]
+        else:
+            dictionaries = sorted(self.dictionaries.items())
+        text = text.casefold()
+        found = []
+        for path, obj_dict in dictionaries:
+            for object in obj_dict.object_index:
+                value = object.get(field)
+                if value is not None and text in value.casefold():
+                    found.append(dict(record_to_json(object), file=path))
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def answer(self, line):
+        ''' the JSON-RPC response to one request line, None for a notification '''
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': PARSE_ERROR, 'message': str(e)}}
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': 'expected an object with a method'}}
+        id = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params') or {}
+        try:
+            if method is None:
+                raise QueryError(f'no method {request["method"]}', METHOD_NOT_FOUND)
+            if not isinstance(params, dict):
+                raise QueryError('params must be an object')
+            response = {'jsonrpc': '2.0', 'id': id, 'result': method(params)}
+        except QueryError as e:
+            response = {'jsonrpc': '2.0', 'id': id, 'error': {'code': e.code, 'message': str(e)}}
+        except Exception as e:
+            response = {'jsonrpc': '2.0', 'id': id, 'error': {'code': SERVER_ERROR, 'message': f'{type(e).__name__}: {e}'}}
+        return None if 'id' not in request else response
+
+    async def handle(self, reader, writer):
+        ''' one connection: a request per line, answered in order '''
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = self.answer(line)
+                if response is not None:
+                    writer.write(json.dumps(response).encode('UTF-8') + b'\n')
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=None, port=None, started=None):
+        ''' load the files, then answer queries on the Unix socket
+        socket_path or on localhost:port until SIGINT or SIGTERM. started,
+        if given, is called once queries are being answered. '''
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except NotImplementedError:
+                pass # Windows, where ^C raises KeyboardInterrupt instead
+        await self.reload()
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path) # left over from an earlier run
+            server = await asyncio.start_unix_server(self.handle, socket_path, limit=1 << 20)
+        else:
+            server = await asyncio.start_server(self.handle, '127.0.0.1', port, limit=1 << 20)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                if started is not None:
+                    started()
+                await stop.wait()
+        finally:
+            watcher.cancel()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+
+def query(method, params=None, socket_path=None, port=None, timeout=30):
+    ''' send one request to a running server and return the result,
+    raising QueryError with the server's message if it failed '''
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = socket_path
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ('127.0.0.1', port)
+    with connection:
+        connection.settimeout(timeout)
+        connection.connect(address)
+        request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+        connection.sendall(json.dumps(request).encode('UTF-8') + b'\n')
+        with connection.makefile('rb') as f:
+            response = json.loads(f.readline())
+    if 'error' in response:
+        raise QueryError(response['error']['message'], response['error']['code'])
+    return response['result']
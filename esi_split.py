@@ -0,0 +1,129 @@
+# split an ESI file into the byte spans of its Descriptions/Devices/Device
+# or Descriptions/Modules/Module elements, so devices and modules can be
+# parsed on their own, e.g. in parallel or only when needed
+
+__version__ = '0.2.0'
+
+import re
+
+def _markup(element):
+    ''' markup that can hide tags, and the start and end tags of element
+    and of its container, element plus s. Attribute values are matched
+    whole since they may contain '>'. '''
+    return re.compile(
+        rb'<!--.*?-->'
+        rb'|<!\[CDATA\[.*?\]\]>'
+        rb'|<\?.*?\?>'
+        rb'|<(?P<end>/)?(?P<tag>' + element + rb's?)'
+        rb'(?=[\s/>])(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*\s*(?P<empty>/)?>',
+        re.DOTALL)
+
+_device_markup = _markup(b'Device')
+_module_markup = _markup(b'Module')
+
+# bytes of a span fed to the parser at a time while looking for its
+# Type and Name, which come first
+_HEAD_CHUNK = 4096
+
+# the first element start tag, after the prolog
+_root = re.compile(
+    rb'(?:<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>|\s)*'
+    rb'<(?P<tag>[^\s/>]+)(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*\s*>',
+    re.DOTALL)
+
+class DeviceSplit:
+    ''' where the devices are in data, an ESI file's bytes.
+    spans: (start, end) byte offsets of each Device element, in file order
+    prolog: everything before the root element, e.g. the XML declaration
+    root_start, root_end: the root element's start and end tags
+    '''
+    _markup = _device_markup
+    _container = b'Devices'
+
+    def __init__(self, data):
+        root = _root.match(data)
+        if root is None:
+            raise ValueError('no root element found')
+        self.prolog = data[:root.start('tag') - 1]
+        self.root_start = root.group(0)[len(self.prolog):]
+        self.root_end = b'</' + root.group('tag') + b'>'
+        self.spans = []
+        in_devices = 0
+        device_start = None
+        for match in self._markup.finditer(data, root.end()):
+            tag = match.group('tag')
+            if tag is None:
+                continue # comment, CDATA or processing instruction
+            if self._container == tag:
+                if match.group('end'):
+                    in_devices = in_devices - 1
+                elif not match.group('empty'):
+                    in_devices = in_devices + 1
+            elif in_devices:
+                if match.group('end'):
+                    if device_start is not None:
+                        self.spans.append((device_start, match.end()))
+                        device_start = None
+                elif match.group('empty'):
+                    if device_start is None:
+                        self.spans.append((match.start(), match.end()))
+                elif device_start is None:
+                    device_start = match.start()
+
+    def fragment(self, data):
+        ''' a standalone document around data, the bytes of one or more
+        spans, keeping the root element so its namespaces still apply '''
+        return self.prolog + self.root_start + data + self.root_end
+
+    def remainder(self, data):
+        ''' data with the devices cut out, for the vendor and other
+        information shared by all devices '''
+        parts = []
+        last = 0
+        for start, end in self.spans:
+            parts.append(data[last:start])
+            last = end
+        parts.append(data[last:])
+        return b''.join(parts)
+
+class ModuleSplit(DeviceSplit):
+    ''' where the modules of a modular device description are in data,
+    spans being those of the Module elements '''
+    _markup = _module_markup
+    _container = b'Modules'
+
+def _events(xml, fragment):
+    ''' parse events of fragment, parsed a chunk at a time as they are taken '''
+    parser = xml.pull_parser(('start', 'end'))
+    for offset in range(0, len(fragment), _HEAD_CHUNK):
+        parser.feed(fragment[offset:offset + _HEAD_CHUNK])
+        yield from parser.read_events()
+
+def describe_span(xml, fragment):
+    ''' (Type text, Type attributes, Name) of the Device or Module element
+    in fragment, a standalone document of its span, parsing only as far
+    as its Type and Name '''
+    type = attributes = name = None
+    depth = 0
+    for event, element in _events(xml, fragment):
+        if 'start' == event:
+            depth = depth + 1
+            continue
+        depth = depth - 1
+        if 2 != depth:
+            continue # not a child of the span's element
+        if 'Type' == element.tag and type is None:
+            type = element.text
+            attributes = dict(element.attrib)
+        elif 'Name' == element.tag and name is None:
+            name = element.text
+        if type is not None and name is not None:
+            break
+    return type, attributes or {}, name
+
+def read_spans(filename, spans):
+    ''' the bytes of each (start, end) span of the file, in turn '''
+    with open(filename, 'rb') as f:
+        for start, end in spans:
+            f.seek(start)
+            yield f.read(end - start)
@@ -0,0 +1,26 @@
+# string tables of generated output: the distinct strings of a file laid
+# out one after the other, so records refer to a string by its offset
+
+__version__ = '0.1.0'
+
+class StringPool:
+    ''' distinct strings laid out one after the other, each NUL
+    terminated, by their byte offset. Offset 0 is the empty string. '''
+    __slots__ = ('offsets', 'size')
+
+    def __init__(self):
+        self.offsets = {'': 0}
+        self.size = 1
+
+    def add(self, s):
+        ''' offset of s, which is added if it isn't in the pool yet '''
+        offset = self.offsets.get(s)
+        if offset is None:
+            offset = self.size
+            self.offsets[s] = offset
+            self.size = self.size + len(s.encode('UTF-8')) + 1
+        return offset
+
+    def encode(self):
+        ''' the pool as size bytes of UTF-8 '''
+        return b''.join(s.encode('UTF-8') + b'\0' for s in self.offsets)
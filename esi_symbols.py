@@ -0,0 +1,133 @@
+# identifiers for the names of an ESI file in generated code: names are
+# sanitized once per target language, and each scope of the generated
+# code gets a symbol table handing out identifiers unique in it
+
+__version__ = '0.1.0'
+
+import re
+import sys
+from functools import lru_cache
+
+# IEC 61131-3 keywords and the CODESYS ones an identifier could spell,
+# upper case as ST compares identifiers without case
+ST_KEYWORDS = frozenset('''
+    ABS ACTION AND ANY ARRAY AT BOOL BY BYTE CASE CONFIGURATION CONSTANT
+    DATE DATE_AND_TIME DINT DO DT DWORD ELSE ELSIF END_ACTION END_CASE
+    END_CONFIGURATION END_FOR END_FUNCTION END_FUNCTION_BLOCK END_IF
+    END_INTERFACE END_METHOD END_PROGRAM END_PROPERTY END_REPEAT
+    END_RESOURCE END_STEP END_STRUCT END_TRANSITION END_TYPE END_UNION
+    END_VAR END_WHILE EXIT EXTENDS FALSE FOR FROM FUNCTION FUNCTION_BLOCK
+    IF IMPLEMENTS INITIAL_STEP INT INTERFACE INTERNAL LDATE LDT LINT
+    LREAL LTIME LTOD LWORD METHOD MOD NOT OF ON OR POINTER PRIVATE
+    PROGRAM PROPERTY PROTECTED PUBLIC READ_ONLY READ_WRITE REAL REFERENCE
+    REPEAT RESOURCE RETAIN RETURN SINT STEP STRING STRUCT SUPER TASK THEN
+    THIS TIME TO TOD TRANSITION TRUE TYPE UDINT UINT ULINT UNION UNTIL
+    USINT VAR VAR_ACCESS VAR_CONFIG VAR_EXTERNAL VAR_GLOBAL VAR_INPUT
+    VAR_IN_OUT VAR_INST VAR_OUTPUT VAR_STAT VAR_TEMP WHILE WITH WORD
+    WSTRING XOR
+'''.split())
+
+CPP_KEYWORDS = frozenset('''
+    alignas alignof and and_eq asm auto bitand bitor bool break case catch
+    char char8_t char16_t char32_t class compl concept const consteval
+    constexpr constinit const_cast continue co_await co_return co_yield
+    decltype default delete do double dynamic_cast else enum explicit
+    export extern false float for friend goto if inline int long mutable
+    namespace new noexcept not not_eq nullptr operator or or_eq private
+    protected public register reinterpret_cast requires return short
+    signed sizeof static static_assert static_cast struct switch template
+    this thread_local throw true try typedef typeid typename union
+    unsigned using virtual void volatile wchar_t while xor xor_eq
+    NULL
+'''.split())
+
+@lru_cache(maxsize=None)
+def st_identifier(name):
+    ''' name as an ST identifier: spaces and dashes become underscores,
+    other characters are dropped '''
+    return re.sub(r'[^A-Za-z0-9_]+', '', re.sub(r'[ -]', '_', name))
+
+@lru_cache(maxsize=None)
+def st_member(name, prefix=''):
+    ''' name as an ST struct member with the hungarian prefix of its
+    type: spaces are dropped, dashes become underscores, other
+    characters are dropped '''
+    return prefix + st_identifier(name.replace(' ', ''))
+
+@lru_cache(maxsize=None)
+def cpp_identifier(name):
+    ''' name as a C++ identifier: spaces and other characters that can't
+    be in one become underscores, and a name that doesn't start with a
+    letter or an underscore, like 1st, is prefixed with X_ '''
+    symbol = re.sub(r'[^A-Za-z0-9_]', '_', name)
+    if not symbol or not (symbol[0].isalpha() or '_' == symbol[0]):
+        symbol = 'X_' + symbol
+    return symbol
+
+def _st_fold(symbol):
+    return symbol.upper()
+
+def _same(symbol):
+    return symbol
+
+class SymbolTable:
+    ''' the identifiers of one scope of generated code. symbol(name, key)
+    returns name sanitized, or, if that is taken by another key or is
+    reserved, the sanitized name with the lowest free suffix _2, _3 and
+    so on. The same key always gets the same symbol, so the result only
+    depends on the order of the keys, which is the order of the file.
+    Symbols are interned, and the suffix search for a sanitized name
+    goes on where it stopped the last time, so a dictionary is named in
+    one linear pass. fold maps symbols to what the language compares,
+    upper case for ST. '''
+
+    def __init__(self, sanitize, reserved=(), fold=_same):
+        self._sanitize = sanitize
+        self._fold = fold
+        self._symbols = {} # key -> symbol
+        self._taken = set(fold(symbol) for symbol in reserved)
+        self._suffixes = {} # folded sanitized name -> last suffix tried
+        self.collisions = 0
+
+    @classmethod
+    def st(cls, reserved=()):
+        return cls(st_identifier, ST_KEYWORDS.union(reserved), _st_fold)
+
+    @classmethod
+    def cpp(cls, reserved=()):
+        return cls(cpp_identifier, CPP_KEYWORDS.union(reserved))
+
+    def __contains__(self, key):
+        return key in self._symbols
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def reserve(self, symbol):
+        ''' keep symbol, declared by other means, from being handed out '''
+        self._taken.add(self._fold(symbol))
+
+    def symbol(self, name, key=None, sanitized=None):
+        ''' the symbol of key, by default name, named after name. sanitized,
+        if given, is name sanitized already. '''
+        if key is None:
+            key = name
+        symbol = self._symbols.get(key)
+        if symbol is not None:
+            return symbol
+        symbol = self._sanitize(name) if sanitized is None else sanitized
+        folded = self._fold(symbol)
+        if folded in self._taken:
+            self.collisions = self.collisions + 1
+            base = symbol
+            suffix = self._suffixes.get(folded, 1)
+            while True:
+                suffix = suffix + 1
+                symbol = f'{base}_{suffix}'
+                if self._fold(symbol) not in self._taken:
+                    break
+            self._suffixes[folded] = suffix
+        symbol = sys.intern(symbol)
+        self._taken.add(self._fold(symbol))
+        self._symbols[key] = symbol
+        return symbol
@@ -0,0 +1,252 @@
+# generate synthetic ESI files of any size, for benchmarks. The output
+# only depends on the parameters and the seed.
+
+__version__ = '0.2.0'
+
+import argparse
+import random
+
+builtin_types = [
+    # (type, bit size)
+    ('BOOL', 1),
+    ('SINT', 8),
+    ('USINT', 8),
+    ('INT', 16),
+    ('UINT', 16),
+    ('DINT', 32),
+    ('UDINT', 32),
+    ('REAL', 32),
+    ('LINT', 64),
+    ('LREAL', 64),
+]
+
+words = ['Position', 'Velocity', 'Torque', 'Current', 'Voltage', 'Limit',
+    'Offset', 'Gain', 'Filter', 'Mode', 'Status', 'Control', 'Error',
+    'Warning', 'Actual', 'Target', 'Max', 'Min', 'Time', 'Counter']
+
+def _name(rng):
+    return ' '.join(rng.choice(words) for i in range(rng.randint(2, 4)))
+
+def _datatype_xml(name, bitsize, subitems):
+    ''' subitems are (subidx, name, type, bit size, bit offset, access) '''
+    out = [f'\t\t\t\t\t\t<DataType><Name>{name}</Name><BitSize>{bitsize}</BitSize>\n']
+    for subidx, subname, subtype, subbits, offset, access in subitems:
+        subidx_xml = '' if subidx is None else f'<SubIdx>{subidx}</SubIdx>'
+        out.append(f'\t\t\t\t\t\t\t<SubItem>{subidx_xml}<Name>{subname}</Name><Type>{subtype}</Type>'
+            f'<BitSize>{subbits}</BitSize><BitOffs>{offset}</BitOffs><Flags><Access>{access}</Access></Flags></SubItem>\n')
+    out.append('\t\t\t\t\t\t</DataType>\n')
+    return ''.join(out)
+
+def _object_xml(index, name, type, bitsize, access, pdo_mapping=None, default=None, comment=None):
+    info = f'<Info><DefaultValue>{default}</DefaultValue></Info>' if default is not None else ''
+    mapping = f'<PdoMapping>{pdo_mapping}</PdoMapping>' if pdo_mapping else ''
+    comment = f'<Comment>{comment}</Comment>' if comment else ''
+    return (f'\t\t\t\t\t\t<Object><Index>#x{index:04X}</Index><Name>{name}</Name><Type>{type}</Type>'
+        f'<BitSize>{bitsize}</BitSize>{info}<Flags><Access>{access}</Access>{mapping}</Flags>{comment}</Object>\n')
+
+def _pdo_xml(tag, index, name, sm, entries, depend_on_slot=False):
+    ''' with depend_on_slot, the PDO of a module, whose indices move with its slot '''
+    depend = ' DependOnSlot="1"' if depend_on_slot else ''
+    out = [f'\t\t\t\t<{tag} Fixed="1" Mandatory="1" Sm="{sm}">\n',
+        f'\t\t\t\t\t<Index{depend}>#x{index:04X}</Index>\n',
+        f'\t\t\t\t\t<Name>{name}</Name>\n']
+    for entry_index, entry_name, entry_type, entry_bits in entries:
+        out.append(f'\t\t\t\t\t<Entry><Index{depend}>#x{entry_index:04X}</Index><SubIndex>0</SubIndex>'
+            f'<BitLen>{entry_bits}</BitLen><Name>{entry_name}</Name><DataType>{entry_type}</DataType></Entry>\n')
+    out.append(f'\t\t\t\t</{tag}>\n')
+    return ''.join(out)
+
+def generate_device(rng, device_number, objects, datatypes, enums, enum_size, pdo_entries, slots=0):
+    product_code = 0x1000 + device_number
+    out = ['\t\t\t<Device Physics="YY">\n',
+        f'\t\t\t\t<Type ProductCode="#x{product_code:08X}" RevisionNo="#x00010000">SYN{device_number}</Type>\n',
+        f'\t\t\t\t<Name>Synthetic Device {device_number}</Name>\n',
+        '\t\t\t\t<Profile>\n\t\t\t\t\t<ProfileNo>402</ProfileNo>\n\t\t\t\t\t<Dictionary>\n\t\t\t\t\t\t<DataTypes>\n']
+
+    # builtin types are listed in real files and skipped by the parser
+    for type, bits in builtin_types:
+        out.append(f'\t\t\t\t\t\t<DataType><Name>{type}</Name><BitSize>{bits}</BitSize></DataType>\n')
+    out.append('\t\t\t\t\t\t<DataType><Name>STRING(16)</Name><BitSize>128</BitSize></DataType>\n')
+
+    enum_names = []
+    for e in range(enums):
+        name = f'DT0800EN{e:02X}'
+        enum_names.append(name)
+        out.append(f'\t\t\t\t\t\t<DataType><Name>{name}</Name><BaseType>USINT</BaseType><BitSize>8</BitSize>\n')
+        for value in range(enum_size):
+            out.append(f'\t\t\t\t\t\t\t<EnumInfo><Text>{_name(rng)}</Text><Enum>{value}</Enum></EnumInfo>\n')
+        out.append('\t\t\t\t\t\t</DataType>\n')
+
+    identity = [(0, 'SubIndex 000', 'USINT', 8, 0, 'ro')]
+    for subidx, name in enumerate(['Vendor ID', 'Product code', 'Revision', 'Serial number'], 1):
+        identity.append((subidx, name, 'UDINT', 32, subidx * 32 - 16, 'ro'))
+    out.append(_datatype_xml('DT1018', 144, identity))
+
+    # PDO mapping records and their assignment arrays
+    mapping = [(0, 'SubIndex 000', 'USINT', 8, 0, 'rw')]
+    for subidx in range(1, pdo_entries + 1):
+        mapping.append((subidx, f'SubIndex {subidx:03}', 'UDINT', 32, subidx * 32 - 16, 'rw'))
+    mapping_bits = 16 + 32 * pdo_entries
+    out.append(_datatype_xml('DT1600', mapping_bits, mapping))
+    out.append(_datatype_xml('DT1A00', mapping_bits, mapping))
+    out.append('\t\t\t\t\t\t<DataType><Name>DT1C12ARR</Name><BaseType>UINT</BaseType><BitSize>16</BitSize>'
+        '<ArrayInfo><LBound>1</LBound><Elements>1</Elements></ArrayInfo></DataType>\n')
+    assign = [(0, 'SubIndex 000', 'USINT', 8, 0, 'ro'), (None, 'Elements', 'DT1C12ARR', 16, 16, 'ro')]
+    out.append(_datatype_xml('DT1C12', 32, assign))
+
+    # application records
+    struct_names = []
+    for t in range(datatypes):
+        name = f'DT{0x4000 + t:04X}'
+        members = rng.randint(2, 8)
+        subitems = [(0, 'SubIndex 000', 'USINT', 8, 0, 'ro')]
+        offset = 16
+        for subidx in range(1, members + 1):
+            type, bits = rng.choice(builtin_types[1:])
+            subitems.append((subidx, _name(rng), type, bits, offset, rng.choice(['ro', 'rw'])))
+            offset = offset + bits
+        struct_names.append((name, offset))
+        out.append(_datatype_xml(name, offset, subitems))
+    out.append('\t\t\t\t\t\t</DataTypes>\n\t\t\t\t\t\t<Objects>\n')
+
+    out.append(_object_xml(0x1000, 'Device type', 'UDINT', 32, 'ro', default='#x00020192'))
+    out.append(_object_xml(0x1008, 'Device name', 'STRING(16)', 128, 'ro', default=f'SYN{device_number}'))
+    out.append(_object_xml(0x1018, 'Identity', 'DT1018', 144, 'ro'))
+    out.append(_object_xml(0x1600, 'RxPDO map', 'DT1600', mapping_bits, 'rw'))
+    out.append(_object_xml(0x1A00, 'TxPDO map', 'DT1A00', mapping_bits, 'rw'))
+    out.append(_object_xml(0x1C12, 'RxPDO assign', 'DT1C12', 32, 'ro'))
+    out.append(_object_xml(0x1C13, 'TxPDO assign', 'DT1C12', 32, 'ro'))
+
+    rx_entries = []
+    tx_entries = []
+    for i in range(objects):
+        index = 0x2000 + i
+        name = f'{_name(rng)} {i}'
+        kind = rng.random()
+        if struct_names and kind < 0.2:
+            struct_name, struct_bits = rng.choice(struct_names)
+            out.append(_object_xml(index, name, struct_name, struct_bits, 'ro', comment=_name(rng)))
+            continue
+        if enum_names and kind < 0.3:
+            out.append(_object_xml(index, name, rng.choice(enum_names), 8, 'rw', default='0'))
+            continue
+        type, bits = rng.choice(builtin_types)
+        pdo_mapping = None
+        if len(rx_entries) < pdo_entries and kind < 0.6:
+            pdo_mapping = 'R'
+            rx_entries.append((index, name, type, bits))
+        elif len(tx_entries) < pdo_entries and kind < 0.9:
+            pdo_mapping = 'T'
+            tx_entries.append((index, name, type, bits))
+        out.append(_object_xml(index, name, type, bits, 'rw' if 'R' == pdo_mapping else 'ro',
+            pdo_mapping=pdo_mapping, default='0', comment=_name(rng) if kind > 0.8 else None))
+    out.append('\t\t\t\t\t\t</Objects>\n\t\t\t\t\t</Dictionary>\n\t\t\t\t</Profile>\n')
+
+    rx_bytes = (sum(entry[3] for entry in rx_entries) + 7) // 8
+    tx_bytes = (sum(entry[3] for entry in tx_entries) + 7) // 8
+    out.append('\t\t\t\t<Fmmu>Outputs</Fmmu>\n\t\t\t\t<Fmmu>Inputs</Fmmu>\n\t\t\t\t<Fmmu>MBoxState</Fmmu>\n')
+    out.append('\t\t\t\t<Sm DefaultSize="128" StartAddress="#x1000" ControlByte="#x26" Enable="1">MBoxOut</Sm>\n')
+    out.append('\t\t\t\t<Sm DefaultSize="128" StartAddress="#x1080" ControlByte="#x22" Enable="1">MBoxIn</Sm>\n')
+    out.append(f'\t\t\t\t<Sm DefaultSize="{rx_bytes}" StartAddress="#x1100" ControlByte="#x64" Enable="1">Outputs</Sm>\n')
+    out.append(f'\t\t\t\t<Sm DefaultSize="{tx_bytes}" StartAddress="#x1180" ControlByte="#x20" Enable="1">Inputs</Sm>\n')
+    out.append(_pdo_xml('RxPdo', 0x1600, 'RxPDO 1', 2, rx_entries))
+    out.append(_pdo_xml('TxPdo', 0x1A00, 'TxPDO 1', 3, tx_entries))
+    if slots:
+        out.append('\t\t\t\t<Slots SlotPdoIncrement="1" SlotIndexIncrement="#x10">\n'
+            f'\t\t\t\t\t<Slot MinInstances="0" MaxInstances="{slots}"><Name>Slot</Name><ModuleClass>SYN</ModuleClass></Slot>\n'
+            '\t\t\t\t</Slots>\n')
+    out.append('\t\t\t</Device>\n')
+    return ''.join(out)
+
+def generate_module(rng, module_number, pdo_entries):
+    ''' a module of class SYN with a few objects from #x6000 and #x7000 in
+    PDOs depending on its slot. Every module defines the DataType
+    DT6000ST the same way, as modules of one family do. '''
+    ident = 0x5000 + module_number
+    out = ['\t\t\t<Module>\n',
+        f'\t\t\t\t<Type ModuleIdent="#x{ident:08X}" ModuleClass="SYN">SYNM{module_number}</Type>\n',
+        f'\t\t\t\t<Name>Synthetic Module {module_number}</Name>\n',
+        '\t\t\t\t<Profile>\n\t\t\t\t\t<Dictionary>\n\t\t\t\t\t\t<DataTypes>\n']
+    status = [(0, 'SubIndex 000', 'USINT', 8, 0, 'ro'), (1, 'Underrange', 'BOOL', 1, 16, 'ro'),
+        (2, 'Overrange', 'BOOL', 1, 17, 'ro'), (3, 'Error', 'BOOL', 1, 18, 'ro')]
+    out.append(_datatype_xml('DT6000ST', 24, status))
+    out.append('\t\t\t\t\t\t</DataTypes>\n\t\t\t\t\t\t<Objects>\n')
+    out.append(_object_xml(0x6000, 'Channel status', 'DT6000ST', 24, 'ro'))
+    rx_entries = []
+    tx_entries = []
+    for i in range(pdo_entries):
+        type, bits = rng.choice(builtin_types[1:])
+        name = f'{_name(rng)} {i}'
+        out.append(_object_xml(0x6001 + i, name, type, bits, 'ro', pdo_mapping='T', default='0'))
+        tx_entries.append((0x6001 + i, name, type, bits))
+        name = f'{_name(rng)} {i}'
+        out.append(_object_xml(0x7000 + i, name, type, bits, 'rw', pdo_mapping='R', default='0'))
+        rx_entries.append((0x7000 + i, name, type, bits))
+    out.append('\t\t\t\t\t\t</Objects>\n\t\t\t\t\t</Dictionary>\n\t\t\t\t</Profile>\n')
+    out.append(_pdo_xml('RxPdo', 0x1601, f'Module {module_number} outputs', 2, rx_entries, depend_on_slot=True))
+    out.append(_pdo_xml('TxPdo', 0x1A01, f'Module {module_number} inputs', 3, tx_entries, depend_on_slot=True))
+    out.append('\t\t\t</Module>\n')
+    return ''.join(out)
+
+def generate_esi(devices=1, objects=100, datatypes=10, enums=4, enum_size=8, pdo_entries=8, seed=0, revisions=1,
+        modules=0, slots=8):
+    ''' returns the text of an ESI file. Every device gets its own
+    dictionary with the given numbers of application objects, custom
+    struct DataTypes, enums of enum_size values, and up to pdo_entries
+    entries in each of its RxPdo and TxPdo. Each device is listed in
+    revisions revisions, which differ only in their RevisionNo. With
+    modules, the devices are couplers with that many slots, and the file
+    describes that many modules, each with up to pdo_entries entries in
+    its PDOs. '''
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<EtherCATInfo Version="1.6">\n',
+        '\t<Vendor>\n\t\t<Id>#x00000ABC</Id>\n\t\t<Name>Synthetic Vendor</Name>\n\t</Vendor>\n',
+        '\t<Descriptions>\n\t\t<Groups>\n\t\t\t<Group><Type>Synthetic</Type><Name>Synthetic</Name></Group>\n\t\t</Groups>\n',
+        '\t\t<Devices>\n']
+    for device_number in range(devices):
+        device = generate_device(rng, device_number, objects, datatypes, enums, enum_size, pdo_entries,
+            slots if modules else 0)
+        for revision in range(revisions):
+            out.append(device.replace('RevisionNo="#x00010000"', f'RevisionNo="#x{0x10000 + revision:08X}"', 1))
+    out.append('\t\t</Devices>\n')
+    if modules:
+        out.append('\t\t<Modules>\n')
+        for module_number in range(modules):
+            out.append(generate_module(rng, module_number, pdo_entries))
+        out.append('\t\t</Modules>\n')
+    out.append('\t</Descriptions>\n</EtherCATInfo>\n')
+    return ''.join(out)
+
+def add_generator_arguments(parser):
+    parser.add_argument('--devices', type=int, default=1, help='number of devices (default 1)')
+    parser.add_argument('--objects', type=int, default=100, help='application objects per device (default 100)')
+    parser.add_argument('--datatypes', type=int, default=10, help='custom struct DataTypes per device (default 10)')
+    parser.add_argument('--enums', type=int, default=4, help='enum DataTypes per device (default 4)')
+    parser.add_argument('--enum-size', type=int, default=8, help='values per enum (default 8)')
+    parser.add_argument('--pdo-entries', type=int, default=8, help='entries per PDO (default 8)')
+    parser.add_argument('--revisions', type=int, default=1, help='revisions of each device, sharing its dictionary and PDOs (default 1)')
+    parser.add_argument('--modules', type=int, default=0, help='modules in the file, making the devices modular (default 0)')
+    parser.add_argument('--slots', type=int, default=8, help='slots of each modular device (default 8)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+
+def generator_options(args):
+    return dict(devices=args.devices, objects=args.objects, datatypes=args.datatypes,
+        enums=args.enums, enum_size=args.enum_size, pdo_entries=args.pdo_entries, seed=args.seed,
+        revisions=args.revisions, modules=args.modules, slots=args.slots)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic EtherCAT ESI file')
+    parser.add_argument(
+        '-v', '--version',
+        action='version',
+        version='%(prog)s ' + __version__
+    )
+    add_generator_arguments(parser)
+    parser.add_argument('output_filename', help='path of ESI file to write')
+    args = parser.parse_args()
+    with open(args.output_filename, 'w', encoding='UTF-8') as f:
+        f.write(generate_esi(**generator_options(args)))
+
+if __name__ == '__main__':
+    main()
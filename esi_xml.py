@@ -0,0 +1,116 @@
+# XML backends for reading ESI files: lxml with precompiled XPath queries
+# when it is installed, xml.etree.ElementTree otherwise. Both hand out
+# elements with the ElementTree API and yield identical object dictionaries.
+
+__version__ = '0.1.0'
+
+import os
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+# the whole-document queries of the tree loader, by name
+QUERIES = {
+    'devices': './/Devices/Device',
+    'datatypes': './/DataTypes/DataType',
+    'objects': './/Objects/Object',
+}
+
+class EtreeBackend:
+    name = 'etree'
+    parent_links = False # elements don't know their parent
+
+    def fromstring(self, text):
+        return ET.fromstring(text)
+
+    def parse(self, source):
+        ''' root element of the file name or binary file object source '''
+        return ET.parse(source).getroot()
+
+    def iterparse(self, source, events):
+        return ET.iterparse(source, events=events)
+
+    def pull_parser(self, events):
+        ''' a parser fed with feed() whose events are taken with
+        read_events(), so parsing can stop as soon as enough was seen '''
+        return ET.XMLPullParser(events=events)
+
+    def findall(self, element, query):
+        return element.findall(QUERIES[query])
+
+class LxmlBackend:
+    ''' comments and processing instructions are dropped while parsing, as
+    ElementTree does, so iterating an element yields the same children '''
+    name = 'lxml'
+    parent_links = True # getparent() works, also while iterparsing
+
+    def __init__(self):
+        self._queries = {name: lxml_etree.XPath(path) for name, path in QUERIES.items()}
+
+    def _parser(self, encoding=None):
+        return lxml_etree.XMLParser(encoding=encoding, remove_comments=True, remove_pis=True, huge_tree=True)
+
+    def fromstring(self, text):
+        if isinstance(text, str):
+            # lxml refuses str with an encoding declaration, so parse the
+            # UTF-8 bytes and override whatever encoding is declared
+            return lxml_etree.fromstring(text.encode('UTF-8'), self._parser('UTF-8'))
+        return lxml_etree.fromstring(text, self._parser())
+
+    def parse(self, source):
+        return lxml_etree.parse(source, self._parser()).getroot()
+
+    def iterparse(self, source, events, tags=None):
+        ''' tags, if given, limits the events to elements with these tags,
+        filtered by the parser instead of in Python '''
+        return lxml_etree.iterparse(source, events=events, tag=tags, remove_comments=True, remove_pis=True, huge_tree=True)
+
+    def pull_parser(self, events):
+        return lxml_etree.XMLPullParser(events=events, remove_comments=True, remove_pis=True, huge_tree=True)
+
+    def findall(self, element, query):
+        return self._queries[query](element)
+
+_backend_classes = {
+    'etree': EtreeBackend,
+    'lxml': LxmlBackend,
+}
+
+_backends = {}
+
+def available_backends():
+    ''' names of the backends that can be used here, preferred first '''
+    names = ['etree']
+    if lxml_etree is not None:
+        names.insert(0, 'lxml')
+    return names
+
+def default_backend_name():
+    ''' $ESIUTILS_XML_BACKEND if set, else lxml if installed, else etree '''
+    return os.environ.get('ESIUTILS_XML_BACKEND') or available_backends()[0]
+
+def get_backend(name=None):
+    ''' the backend called name, or the default one for None '''
+    if name is None:
+        name = default_backend_name()
+    if name not in _backend_classes:
+        raise ValueError(f'unknown XML backend {name}, expected one of {", ".join(_backend_classes)}')
+    if name not in available_backends():
+        raise ValueError(f'XML backend {name} is not available, install lxml')
+    if name not in _backends:
+        _backends[name] = _backend_classes[name]()
+    return _backends[name]
+
+def backend_of(element):
+    ''' the backend whose parser produced element '''
+    if lxml_etree is not None and isinstance(element, lxml_etree._Element):
+        return get_backend('lxml')
+    return get_backend('etree')
+
+def has_children(element):
+    ''' what the truth value of an element found with find() used to mean,
+    without the warnings both parsers now give for testing it directly '''
+    return element is not None and len(element) > 0
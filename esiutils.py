@@ -0,0 +1,407 @@
+# single entry point for the ESI utilities: parse an ESI file once and
+# run any combination of the code generators over it
+
+__version__ = '0.1.0'
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+from esi_cache import add_cache_argument, load_object_dictionary
+from esi_diff import changeset, diff_dictionaries, has_changes
+from esi_library import LibraryIndex, parse_id
+from esi_incremental import FragmentStore, Manifest, Output, add_manifest_argument, fragment_store_path, regenerate
+from esi_server import DEFAULT_POLL_SECONDS, QueryError, QueryServer, query as send_query
+from esi_profile import add_profile_argument, profile_from_args
+import esi_csv
+import esi_cpp_header
+import esi_sdo_list
+import esi_dynamic_slave
+import esi_pdo_map
+import esi_enum_table
+import esi_od_image
+from esi_csv import write_csv_file
+from esi_cpp_header import write_cpp_header_file
+from esi_sdo_list import write_sdo_list_file
+from esi_dynamic_slave import write_dynamic_slave_file
+from esi_pdo_map import write_pdo_map_file
+from esi_enum_table import write_enum_table_file
+from esi_od_image import write_od_image_file
+
+# (option, argument help, batch file suffix, writer), in the order the
+# outputs are written
+emitters = [
+    ('csv', 'path of CSV file', '.csv', write_csv_file),
+    ('hpp', 'path of C++ header file', '.h', write_cpp_header_file),
+    ('sdo_list', 'path of ST GVL file with valid SDO addresses', '.gvl.st', write_sdo_list_file),
+    ('dynamic_slave', 'path of ST file for CODESYS dynamic configuration', '.st', write_dynamic_slave_file),
+    ('pdo_map', 'path of ST GVL file with the process image offsets of the PDOs', '.pdo.gvl.st', write_pdo_map_file),
+    ('enum_table', 'path of ST GVL file with the values and texts of the enum DataTypes', '.enum.gvl.st', write_enum_table_file),
+    ('image', 'path of binary object dictionary image', '.odimg', write_od_image_file),
+]
+
+emitter_writers = {name: writer for name, help, suffix, writer in emitters}
+
+# recorded in the manifest in incremental mode
+emitter_versions = {
+    'csv': esi_csv.__version__,
+    'hpp': esi_cpp_header.__version__,
+    'sdo_list': esi_sdo_list.__version__,
+    'dynamic_slave': esi_dynamic_slave.__version__,
+    'pdo_map': esi_pdo_map.__version__,
+    'enum_table': esi_enum_table.__version__,
+    'image': esi_od_image.__version__,
+}
+
+# options the standalone tools record for what esiutils writes
+emitter_options = {
+    'hpp': {'perfect_hash': False},
+    'sdo_list': {'sorted': False},
+}
+
+def incremental_outputs(input_filename, outputs, fragments=None, jobs=None):
+    ''' esi_incremental.Output list for (name, output filename) outputs.
+    fragments and jobs are passed on to the dynamic slave output. '''
+    result = []
+    for name, filename in outputs:
+        if 'dynamic_slave' == name:
+            result.append(esi_dynamic_slave.incremental_output(input_filename, filename, jobs=jobs, fragments=fragments))
+        else:
+            result.append(Output(filename, name, emitter_versions[name], emitter_options.get(name, {}), emitter_writers[name]))
+    return result
+
+def add_emitter_arguments(parser):
+    for name, help, suffix, writer in emitters:
+        parser.add_argument('--' + name.replace('_', '-'), metavar='FILE', help=help)
+
+def requested_emitters(args):
+    ''' list of (name, output filename) for the outputs named in args '''
+    return [(name, getattr(args, name))
+            for name, help, suffix, writer in emitters
+            if getattr(args, name)]
+
+def gen(args):
+    outputs = requested_emitters(args)
+    if not outputs:
+        sys.exit('esiutils gen: no outputs requested')
+    with profile_from_args(args):
+        if args.manifest:
+            manifest = Manifest(args.manifest)
+            regenerate(manifest, args.input_filename, incremental_outputs(args.input_filename, outputs),
+                lambda filename: load_object_dictionary(filename, args.cache_dir))
+            manifest.save()
+            return
+        obj_dict = load_object_dictionary(args.input_filename, args.cache_dir)
+        for name, filename in outputs:
+            emitter_writers[name](obj_dict, filename)
+
+def find_esi_files(patterns):
+    ''' list of (ESI file, output path stem relative to the output directory).
+    Directories are searched recursively for .xml files and keep their
+    layout below the output directory, files and globs go directly into it. '''
+    found = []
+    seen = set()
+    def add(filename, relative):
+        key = os.path.abspath(filename)
+        if key not in seen:
+            seen.add(key)
+            found.append((filename, os.path.splitext(relative)[0]))
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, dirnames, filenames in os.walk(pattern):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith('.xml'):
+                        filename = os.path.join(dirpath, name)
+                        add(filename, os.path.relpath(filename, pattern))
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches and os.path.exists(pattern):
+                matches = [pattern]
+            for filename in matches:
+                if os.path.isfile(filename):
+                    add(filename, os.path.basename(filename))
+    return found
+
+def batch_job(input_filename, outputs, cache_dir, manifest_filename=None, entries=None):
+    ''' parse and emit one ESI file in a worker process. Never raises, so
+    one bad file doesn't take the batch down with it. In incremental mode
+    entries are the manifest entries of the outputs, the updated ones are
+    returned for the parent to save. '''
+    start = time.perf_counter()
+    result = {'file': input_filename, 'objects': 0, 'error': None, 'entries': None, 'statuses': Counter()}
+    try:
+        for name, output_filename in outputs:
+            os.makedirs(os.path.dirname(output_filename) or '.', exist_ok=True)
+        if manifest_filename is None:
+            obj_dict = load_object_dictionary(input_filename, cache_dir)
+            result['objects'] = len(obj_dict.objects_dict)
+            for name, output_filename in outputs:
+                emitter_writers[name](obj_dict, output_filename)
+        else:
+            manifest = Manifest(None)
+            manifest.entries = entries
+            # devices are only parsed again for the dynamic slave output if
+            # their bytes changed, rendered here as the batch is parallel already
+            store = FragmentStore(fragment_store_path(manifest_filename, input_filename), esi_dynamic_slave.fragment_version)
+            def load(filename):
+                obj_dict = load_object_dictionary(filename, cache_dir)
+                result['objects'] = len(obj_dict.objects_dict)
+                return obj_dict
+            for output, status in regenerate(manifest, input_filename,
+                    incremental_outputs(input_filename, outputs, fragments=store.fragments, jobs=1), load):
+                result['statuses'][status] += 1
+            if any('dynamic_slave' == name for name, output_filename in outputs):
+                store.save()
+            result['entries'] = manifest.entries
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def batch(args):
+    names = [(name, suffix) for name, help, suffix, writer in emitters if getattr(args, name)]
+    if not names:
+        sys.exit('esiutils batch: no outputs requested')
+    jobs = []
+    for input_filename, stem in find_esi_files(args.inputs):
+        outputs = [(name, os.path.join(args.output_dir, stem + suffix)) for name, suffix in names]
+        jobs.append((input_filename, outputs))
+    if not jobs:
+        sys.exit('esiutils batch: no ESI files found')
+
+    manifest = Manifest(args.manifest) if args.manifest else None
+    def entries(outputs):
+        if manifest is None:
+            return None
+        paths = [os.path.abspath(output_filename) for name, output_filename in outputs]
+        return {path: manifest.entries[path] for path in paths if path in manifest.entries}
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(batch_job, input_filename, outputs, args.cache_dir, args.manifest, entries(outputs))
+                   for input_filename, outputs in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if manifest is not None and result['entries'] is not None:
+                manifest.entries.update(result['entries'])
+            if result['error']:
+                print(f'FAILED {result["file"]}', file=sys.stderr)
+                print(result['error'], file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    if manifest is not None:
+        manifest.save()
+
+    failed = [result for result in results if result['error']]
+    objects = sum(result['objects'] for result in results)
+    print(f'{len(results) - len(failed)} of {len(results)} files processed in {elapsed:.2f} s with {args.jobs or os.cpu_count()} workers')
+    if elapsed > 0:
+        print(f'{len(results) / elapsed:.1f} files/s, {objects / elapsed:.0f} objects/s')
+    if manifest is not None:
+        statuses = sum((result['statuses'] for result in results), Counter())
+        print(f'outputs: {statuses["written"]} written, {statuses["unchanged"]} unchanged, {statuses["skipped"]} skipped')
+    slowest = sorted(results, key=lambda result: result['seconds'], reverse=True)
+    if slowest and args.slowest > 0:
+        print('slowest files:')
+        for result in slowest[:args.slowest]:
+            print(f'  {result["seconds"]:8.3f} s {result["objects"]:8} objects  {result["file"]}')
+    if failed:
+        sys.exit(1)
+
+def diff_job(path, old_filename, new_filename, cache_dir, ignore):
+    ''' compare one pair of ESI files in a worker process, never raises '''
+    result = {'path': path, 'error': None, 'diff': None}
+    try:
+        changes = diff_dictionaries(load_object_dictionary(old_filename, cache_dir),
+            load_object_dictionary(new_filename, cache_dir), ignore)
+        result['diff'] = dict(path=path, **changes)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    return result
+
+def diff(args):
+    ''' exits with 0 without differences, 1 with and 2 on errors, as diff does '''
+    if os.path.isdir(args.old) and os.path.isdir(args.new):
+        # files are paired by their path below the directories
+        old_files = {os.path.relpath(filename, args.old): filename for filename, stem in find_esi_files([args.old])}
+        new_files = {os.path.relpath(filename, args.new): filename for filename, stem in find_esi_files([args.new])}
+        pairs = [(path, old_files[path], new_files[path]) for path in sorted(old_files) if path in new_files]
+        added_files = sorted(path for path in new_files if path not in old_files)
+        removed_files = sorted(path for path in old_files if path not in new_files)
+    elif os.path.isfile(args.old) and os.path.isfile(args.new):
+        pairs = [(os.path.basename(args.new), args.old, args.new)]
+        added_files = []
+        removed_files = []
+    else:
+        sys.exit('esiutils diff: expected two ESI files or two directories')
+
+    with profile_from_args(args):
+        if 1 == args.jobs or len(pairs) < 2:
+            results = [diff_job(*pair, args.cache_dir, args.ignore) for pair in pairs]
+        else:
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                futures = [executor.submit(diff_job, *pair, args.cache_dir, args.ignore) for pair in pairs]
+                results = [future.result() for future in futures]
+    failed = [result for result in results if result['error']]
+    for result in failed:
+        print(f'FAILED {result["path"]}', file=sys.stderr)
+        print(result['error'], file=sys.stderr)
+    diffs = [result['diff'] for result in results if result['diff'] is not None]
+    changed = [diff for diff in diffs if has_changes(diff)]
+    document = changeset(changed if not args.all else diffs, added_files, removed_files)
+    if args.output:
+        with open(args.output, 'w', encoding='UTF-8') as f:
+            json.dump(document, f, indent=1)
+            f.write('\n')
+    else:
+        json.dump(document, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    print(f'{len(diffs)} file pairs compared, {len(changed)} changed, {len(added_files)} files added, {len(removed_files)} removed; '
+        f'objects: {sum(len(diff["added"]) for diff in diffs)} added, {sum(len(diff["removed"]) for diff in diffs)} removed, '
+        f'{sum(len(diff["changed"]) for diff in diffs)} changed', file=sys.stderr)
+    if failed:
+        sys.exit(2)
+    if changed or added_files or removed_files:
+        sys.exit(1)
+
+def index(args):
+    filenames = [filename for filename, stem in find_esi_files(args.inputs)]
+    if not filenames:
+        sys.exit('esiutils index: no ESI files found')
+    start = time.perf_counter()
+    with profile_from_args(args), LibraryIndex(args.database) as library:
+        statuses, errors = library.update(filenames, args.jobs)
+    for path, error in errors:
+        print(f'FAILED {path}: {error}', file=sys.stderr)
+    print(f'{len(filenames)} files in {time.perf_counter() - start:.2f} s: {statuses["scanned"]} scanned, '
+        f'{statuses["touched"]} touched, {statuses["unchanged"]} unchanged, {statuses["removed"]} removed, {statuses["failed"]} failed')
+    if errors:
+        sys.exit(1)
+
+def lookup(args):
+    with LibraryIndex(args.database) as library:
+        devices = library.find(parse_id(args.vendor_id), parse_id(args.product_code), parse_id(args.revision))
+        if args.describe:
+            for device in devices:
+                device['description'] = library.load_device(device)
+    json.dump(devices, sys.stdout, indent=1)
+    sys.stdout.write('\n')
+    if not devices:
+        sys.exit(1)
+
+def serve(args):
+    if (args.socket is None) == (args.port is None):
+        sys.exit('esiutils serve: give either --socket or --port')
+    server = QueryServer(args.directory, args.cache_dir, args.jobs, args.poll)
+    where = args.socket if args.socket is not None else f'127.0.0.1:{args.port}'
+    def started():
+        print(f'serving {len(server.dictionaries)} ESI files on {where}', file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.socket, args.port, started))
+    except KeyboardInterrupt:
+        pass
+
+def query_param(text):
+    ''' name=value, the value as JSON if it parses, else as a string '''
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'expected name=value, not {text}')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+def query(args):
+    if (args.socket is None) == (args.port is None):
+        sys.exit('esiutils query: give either --socket or --port')
+    try:
+        result = send_query(args.method, dict(args.params), args.socket, args.port)
+    except QueryError as e:
+        sys.exit(f'esiutils query: {e}')
+    json.dump(result, sys.stdout, indent=1)
+    sys.stdout.write('\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate code and tables from EtherCAT ESI files')
+    parser.add_argument(
+        '-v', '--version',
+        action='version',
+        version='%(prog)s ' + __version__
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gen_parser = subparsers.add_parser('gen', help='parse one ESI file and write any of the outputs')
+    gen_parser.add_argument('input_filename', help='path of ESI file')
+    add_emitter_arguments(gen_parser)
+    add_cache_argument(gen_parser)
+    add_manifest_argument(gen_parser)
+    add_profile_argument(gen_parser)
+    gen_parser.set_defaults(func=gen)
+
+    batch_parser = subparsers.add_parser('batch', help='process many ESI files in parallel')
+    batch_parser.add_argument('inputs', nargs='+', help='ESI files, directories (searched recursively) or glob patterns')
+    batch_parser.add_argument('-o', '--output-dir', required=True, help='directory for the generated files')
+    for name, help, suffix, writer in emitters:
+        batch_parser.add_argument('--' + name.replace('_', '-'), action='store_true', help=f'write a {suffix} file per ESI file')
+    batch_parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    batch_parser.add_argument('--slowest', type=int, default=5, help='number of slowest files to list in the summary')
+    add_cache_argument(batch_parser)
+    add_manifest_argument(batch_parser)
+    batch_parser.set_defaults(func=batch)
+
+    diff_parser = subparsers.add_parser('diff', help='compare the object dictionaries of two ESI files or libraries')
+    diff_parser.add_argument('old', help='ESI file or directory of the old revision')
+    diff_parser.add_argument('new', help='ESI file or directory of the new revision')
+    diff_parser.add_argument('-o', '--output', metavar='FILE', help='write the JSON change set here instead of to stdout')
+    diff_parser.add_argument('--ignore', metavar='FIELD', action='append', default=[],
+        help='leave this field out of the comparison, e.g. Comment, can be repeated')
+    diff_parser.add_argument('--all', action='store_true', help='also list the file pairs without changes')
+    diff_parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes for directories (default: number of CPUs)')
+    add_cache_argument(diff_parser)
+    add_profile_argument(diff_parser)
+    diff_parser.set_defaults(func=diff)
+
+    index_parser = subparsers.add_parser('index', help='index the devices of an ESI library in an SQLite database')
+    index_parser.add_argument('database', help='path of the index database, created if needed')
+    index_parser.add_argument('inputs', nargs='+', help='ESI files, directories (searched recursively) or glob patterns')
+    index_parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    add_profile_argument(index_parser)
+    index_parser.set_defaults(func=index)
+
+    lookup_parser = subparsers.add_parser('lookup', help='find the ESI file and device for a vendor id, product code and revision')
+    lookup_parser.add_argument('database', help='path of the index database')
+    lookup_parser.add_argument('vendor_id', help='vendor id, like #x2, 0x2 or 2')
+    lookup_parser.add_argument('product_code', help='product code')
+    lookup_parser.add_argument('revision', nargs='?', help='revision number, default: all, highest first')
+    lookup_parser.add_argument('--describe', action='store_true', help='also parse the device and list its sync managers, FMMUs and PDOs')
+    lookup_parser.set_defaults(func=lookup)
+
+    serve_parser = subparsers.add_parser('serve', help='keep the ESI files of a directory parsed and answer queries about them')
+    serve_parser.add_argument('directory', help='directory searched recursively for .xml files')
+    serve_parser.add_argument('--socket', metavar='PATH', help='listen on this Unix socket')
+    serve_parser.add_argument('--port', type=int, help='listen on this port of 127.0.0.1')
+    serve_parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS, help='seconds between checks for changed files')
+    serve_parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes parsing files (default: number of CPUs)')
+    add_cache_argument(serve_parser)
+    serve_parser.set_defaults(func=serve)
+
+    query_parser = subparsers.add_parser('query', help='send one query to a running esiutils serve')
+    query_parser.add_argument('--socket', metavar='PATH', help='Unix socket of the server')
+    query_parser.add_argument('--port', type=int, help='port of the server on 127.0.0.1')
+    query_parser.add_argument('method', help='files, lookup, subindices, range, where or search')
+    query_parser.add_argument('params', nargs='*', type=query_param, help='name=value parameters, e.g. file=drive.xml index=0x6040')
+    query_parser.set_defaults(func=query)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
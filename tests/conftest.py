@@ -0,0 +1,52 @@
+# fixtures shared by the tests: synthetic ESI files written by esi_synth,
+# and the state of an ObjectDictionary for comparing loaders
+
+import os
+import sys
+
+import pytest
+
+# the tools are modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import esi_synth
+from esi_file import DataTypeTable, ObjectDictionary
+
+def write_esi(path, **options):
+    path.write_text(esi_synth.generate_esi(**options), encoding='UTF-8')
+    return str(path)
+
+@pytest.fixture(scope='session')
+def device_esi(tmp_path_factory):
+    ''' one device with struct, array and enum DataTypes '''
+    return write_esi(tmp_path_factory.mktemp('esi') / 'device.xml', objects=40, seed=1)
+
+@pytest.fixture(scope='session')
+def multi_device_esi(tmp_path_factory):
+    ''' three devices, whose dictionaries use the same addresses '''
+    return write_esi(tmp_path_factory.mktemp('esi') / 'devices.xml', devices=3, objects=40, seed=2)
+
+@pytest.fixture(scope='session')
+def modular_esi(tmp_path_factory):
+    ''' two couplers and the modules that go in their slots '''
+    return write_esi(tmp_path_factory.mktemp('esi') / 'modular.xml', devices=2, objects=20, modules=3, slots=2, seed=3)
+
+@pytest.fixture
+def empty_enum_dictionary(device_esi):
+    ''' the dictionary of device_esi with an enum DataType without values
+    after its enums '''
+    obj_dict = ObjectDictionary.from_file(device_esi)
+    enums = dict(obj_dict.enumtypes_dict)
+    enums['DT0800ENFF'] = {'Name': 'DT0800ENFF', 'BaseType': 'USINT', 'Values': {}}
+    obj_dict.enumtypes_dict = DataTypeTable(obj_dict._parse_enum, enums)
+    return obj_dict
+
+def dictionary_state(obj_dict):
+    ''' what the outputs are written from, as plain data '''
+    return (obj_dict.vendor, obj_dict.vendor_id, obj_dict.devices, obj_dict.object_fieldnames,
+        [(key, dict(object)) for key, object in obj_dict.objects_dict.items()],
+        sorted(obj_dict.enumtypes_dict), sorted(obj_dict.subitemtypes_dict))
+
+@pytest.fixture
+def state():
+    return dictionary_state
@@ -0,0 +1,52 @@
+import shutil
+
+import esi_file
+import esi_synth
+from esi_cache import ObjectDictionaryCache
+from esi_file import ObjectDictionary
+
+def test_hit(tmp_path, state, modular_esi):
+    cache = ObjectDictionaryCache(str(tmp_path / 'cache'))
+    parsed = cache.load(modular_esi)
+    cached = cache.load(modular_esi)
+    assert (1, 1) == (cache.misses, cache.hits)
+    assert state(cached) == state(parsed)
+    assert state(cached) == state(ObjectDictionary.from_file(modular_esi))
+    for ident in parsed.modules:
+        assert state(cached.modules[ident]) == state(parsed.modules[ident])
+
+def test_changed_file_misses(tmp_path, state, device_esi):
+    filename = tmp_path / 'device.xml'
+    shutil.copy(device_esi, filename)
+    cache = ObjectDictionaryCache(str(tmp_path / 'cache'))
+    cache.load(str(filename))
+    filename.write_text(esi_synth.generate_esi(objects=10, seed=4), encoding='UTF-8')
+    changed = cache.load(str(filename))
+    assert (2, 0) == (cache.misses, cache.hits)
+    assert state(changed) == state(ObjectDictionary.from_file(str(filename)))
+    assert 2 == len(cache.entries())
+
+def test_other_version_misses(tmp_path, monkeypatch, device_esi):
+    cache = ObjectDictionaryCache(str(tmp_path / 'cache'))
+    cache.load(device_esi)
+    monkeypatch.setattr(esi_file, '__version__', esi_file.__version__ + '.dev')
+    cache.load(device_esi)
+    assert (2, 0) == (cache.misses, cache.hits)
+    assert 1 == len(cache.entries())
+
+def test_unreadable_entry_misses(tmp_path, device_esi):
+    cache = ObjectDictionaryCache(str(tmp_path / 'cache'))
+    cache.load(device_esi)
+    for path in cache.entries():
+        with open(path, 'wb') as f:
+            f.write(b'truncated')
+    cache.load(device_esi)
+    assert (2, 0) == (cache.misses, cache.hits)
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ObjectDictionaryCache(str(tmp_path / 'cache'), max_entries=2)
+    for seed in range(3):
+        filename = tmp_path / f'device{seed}.xml'
+        filename.write_text(esi_synth.generate_esi(objects=5, seed=seed), encoding='UTF-8')
+        cache.load(str(filename))
+    assert 2 == len(cache.entries())
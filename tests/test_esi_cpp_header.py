@@ -0,0 +1,48 @@
+import shutil
+import subprocess
+
+import pytest
+
+from esi_cpp_header import write_cpp_header_file, write_cpp_split_files
+from esi_file import ObjectDictionary
+
+gxx = shutil.which('g++')
+
+pytestmark = pytest.mark.skipif(gxx is None, reason='g++ is not installed')
+
+def check_compiles(tmp_path, sources):
+    result = subprocess.run([gxx, '-std=c++17', '-fsyntax-only', '-I', str(tmp_path)] + sources,
+        capture_output=True, text=True)
+    assert 0 == result.returncode, result.stderr
+
+@pytest.mark.parametrize('perfect_hash', [False, True])
+def test_multi_device_header_compiles(tmp_path, multi_device_esi, perfect_hash):
+    h_filename = tmp_path / 'od.h'
+    write_cpp_header_file(ObjectDictionary.from_file(multi_device_esi), str(h_filename), perfect_hash)
+    main = tmp_path / 'main.cpp'
+    main.write_text('#include "od.h"\nint main() { return CANopen::objectAddresses.size() > 0 ? 0 : 1; }\n')
+    check_compiles(tmp_path, [str(main)])
+
+def test_multi_device_split_compiles(tmp_path, multi_device_esi):
+    h_filename = tmp_path / 'od.h'
+    cpp_filename = tmp_path / 'od.cpp'
+    write_cpp_split_files(ObjectDictionary.from_file(multi_device_esi), str(h_filename), str(cpp_filename))
+    check_compiles(tmp_path, [str(cpp_filename)])
+
+def test_shared_addresses_get_their_own_symbols(tmp_path, multi_device_esi):
+    h_filename = tmp_path / 'od.h'
+    obj_dict = ObjectDictionary.from_file(multi_device_esi)
+    write_cpp_header_file(obj_dict, str(h_filename))
+    declared = [line.split()[2] for line in h_filename.read_text().splitlines()
+        if line.strip().startswith('constexpr ObjectAddress ')]
+    assert len(declared) == len(set(declared))
+
+def test_empty_enum_compiles(tmp_path, empty_enum_dictionary):
+    h_filename = tmp_path / 'od.h'
+    write_cpp_header_file(empty_enum_dictionary, str(h_filename))
+    main = tmp_path / 'main.cpp'
+    main.write_text('#include "od.h"\n'
+        'static_assert(CANopen::DT0800ENFFValues.size() == 0, "no values");\n'
+        'static_assert(CANopen::DT0800ENFFToString(0) == nullptr, "no text");\n'
+        'int main() { return 0; }\n')
+    check_compiles(tmp_path, [str(main)])
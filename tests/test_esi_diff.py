@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from esi_diff import diff_dictionaries, has_changes
+from esi_file import ObjectDictionary
+
+ESIUTILS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'esiutils.py')
+
+ESI = '''<?xml version="1.0" encoding="UTF-8"?>
+<EtherCATInfo>
+ <Vendor><Id>#x00000ABC</Id><Name>Test Vendor</Name></Vendor>
+ <Descriptions><Groups/><Devices>
+  <Device>
+   <Type ProductCode="#x00000001" RevisionNo="#x00000001">T1</Type><Name>T1</Name>
+   <Profile><Dictionary><DataTypes/><Objects>{objects}</Objects></Dictionary></Profile>
+  </Device>
+ </Devices></Descriptions>
+</EtherCATInfo>
+'''
+
+def object_xml(index, name, default, comment=None):
+    comment = '' if comment is None else f'<Comment>{comment}</Comment>'
+    return (f'<Object><Index>#x{index:04X}</Index><Name>{name}</Name>{comment}<Type>UINT</Type><BitSize>16</BitSize>'
+        f'<Info><DefaultValue>{default}</DefaultValue></Info><Flags><Access>rw</Access></Flags></Object>')
+
+OLD = ESI.format(objects=object_xml(0x2000, 'Speed', '#x0001', 'fast') + object_xml(0x2001, 'Torque', '#x0000'))
+NEW = ESI.format(objects=object_xml(0x2000, 'Speed', '#x0002', 'faster') + object_xml(0x2002, 'Current', '#x0000'))
+
+def test_added_removed_changed():
+    diff = diff_dictionaries(ObjectDictionary.from_string(OLD), ObjectDictionary.from_string(NEW))
+    assert [{'index': 0x2002, 'subindex': 0, 'name': 'Current'}] == diff['added']
+    assert [{'index': 0x2001, 'subindex': 0, 'name': 'Torque'}] == diff['removed']
+    assert [{'index': 0x2000, 'subindex': 0, 'name': 'Speed',
+        'fields': {'Comment': ['fast', 'faster'], 'DefaultValue': ['#x0001', '#x0002']}}] == diff['changed']
+
+def test_ignored_fields():
+    diff = diff_dictionaries(ObjectDictionary.from_string(OLD), ObjectDictionary.from_string(NEW),
+        ignore=('Comment', 'DefaultValue'))
+    assert [] == diff['changed']
+
+def test_same_dictionary(device_esi):
+    obj_dict = ObjectDictionary.from_file(device_esi)
+    assert not has_changes(diff_dictionaries(obj_dict, ObjectDictionary.from_file(device_esi)))
+
+def esiutils_diff(*args):
+    return subprocess.run([sys.executable, ESIUTILS, 'diff'] + [str(arg) for arg in args], capture_output=True, text=True)
+
+@pytest.fixture
+def revisions(tmp_path):
+    ''' old and new library directories: a.xml changed, b.xml the same,
+    c.xml only in old and d.xml only in new '''
+    for side, a, others in (('old', OLD, ('b.xml', 'c.xml')), ('new', NEW, ('b.xml', 'd.xml'))):
+        directory = tmp_path / side
+        directory.mkdir()
+        (directory / 'a.xml').write_text(a, encoding='UTF-8')
+        for name in others:
+            (directory / name).write_text(OLD, encoding='UTF-8')
+    return tmp_path / 'old', tmp_path / 'new'
+
+def test_command_on_directories(tmp_path, revisions):
+    old, new = revisions
+    output = tmp_path / 'changes.json'
+    result = esiutils_diff('-j', 2, '-o', output, old, new)
+    assert 1 == result.returncode, result.stderr
+    changes = json.loads(output.read_text(encoding='UTF-8'))
+    assert ['d.xml'] == changes['added_files']
+    assert ['c.xml'] == changes['removed_files']
+    assert ['a.xml'] == [diff['path'] for diff in changes['files']]
+    assert 1 == len(changes['files'][0]['changed'])
+
+def test_command_without_changes(revisions):
+    old, new = revisions
+    result = esiutils_diff(old / 'b.xml', new / 'b.xml')
+    assert 0 == result.returncode, result.stderr
+    assert [] == json.loads(result.stdout)['files']
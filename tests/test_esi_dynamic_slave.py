@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import write_esi
+from esi_dynamic_slave import write_dynamic_slave_file, write_dynamic_slave_parallel_file
+from esi_file import ObjectDictionary
+
+@pytest.fixture(scope='module')
+def many_devices_esi(tmp_path_factory):
+    ''' enough devices for several chunks per worker '''
+    return write_esi(tmp_path_factory.mktemp('esi') / 'devices.xml', devices=12, objects=10, revisions=2, seed=5)
+
+def read(filename):
+    with open(filename, 'rb') as f:
+        return f.read()
+
+@pytest.mark.parametrize('dedup', [False, True])
+def test_parallel_matches_serial(tmp_path, many_devices_esi, dedup):
+    serial = tmp_path / 'serial.st'
+    write_dynamic_slave_file(ObjectDictionary.from_file(many_devices_esi), str(serial), dedup)
+    for jobs in (1, 2, 3):
+        parallel = tmp_path / f'parallel{jobs}.st'
+        write_dynamic_slave_parallel_file(many_devices_esi, str(parallel), jobs, dedup)
+        assert read(serial) == read(parallel), f'-j {jobs}'
+
+def test_fragments_match_serial(tmp_path, many_devices_esi):
+    serial = tmp_path / 'serial.st'
+    write_dynamic_slave_file(ObjectDictionary.from_file(many_devices_esi), str(serial))
+    fragments = {}
+    for run in range(2):
+        incremental = tmp_path / f'incremental{run}.st'
+        write_dynamic_slave_parallel_file(many_devices_esi, str(incremental), 2, fragments=fragments)
+        assert read(serial) == read(incremental)
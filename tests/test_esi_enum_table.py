@@ -0,0 +1,21 @@
+from esi_enum_table import write_enum_table_file
+from esi_file import ObjectDictionary
+
+def type_lines(filename):
+    with open(filename, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip().startswith('(sName := ')]
+
+def test_types(tmp_path, device_esi):
+    filename = tmp_path / 'enums.gvl.st'
+    obj_dict = ObjectDictionary.from_file(device_esi)
+    write_enum_table_file(obj_dict, str(filename))
+    lines = type_lines(filename)
+    assert len(obj_dict.enumtypes_dict) == len(lines)
+    assert all('xDense := TRUE' in line for line in lines)
+
+def test_empty_enum(tmp_path, empty_enum_dictionary):
+    filename = tmp_path / 'enums.gvl.st'
+    write_enum_table_file(empty_enum_dictionary, str(filename))
+    text = filename.read_text(encoding='utf-8')
+    assert "(sName := 'DT0800ENFF', diFirstValue := 0, iFirst := " in text
+    assert 'iCount := 0, xDense := FALSE)' in text
@@ -0,0 +1,22 @@
+import pytest
+
+from esi_file import ObjectDictionary
+
+@pytest.mark.parametrize('esi', ['device_esi', 'multi_device_esi', 'modular_esi'])
+def test_streaming_matches_tree(request, state, esi):
+    filename = request.getfixturevalue(esi)
+    streamed = ObjectDictionary.from_file(filename)
+    tree = ObjectDictionary.from_file(filename, streaming=False)
+    assert state(streamed) == state(tree)
+
+def test_streaming_matches_string(state, device_esi):
+    with open(device_esi, encoding='UTF-8') as f:
+        text = f.read()
+    assert state(ObjectDictionary.from_file(device_esi)) == state(ObjectDictionary.from_string(text))
+
+def test_streamed_modules_match_tree(state, modular_esi):
+    streamed = ObjectDictionary.from_file(modular_esi)
+    tree = ObjectDictionary.from_file(modular_esi, streaming=False)
+    assert sorted(streamed.modules) == sorted(tree.modules)
+    for ident in tree.modules:
+        assert state(streamed.modules[ident]) == state(tree.modules[ident])
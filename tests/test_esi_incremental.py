@@ -0,0 +1,51 @@
+import shutil
+
+import esi_synth
+from esi_file import ObjectDictionary
+from esi_incremental import update
+from esiutils import emitter_writers, incremental_outputs
+
+NAMES = ('csv', 'hpp', 'dynamic_slave')
+
+class Loader:
+    ''' load for update(), counting the parses '''
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, filename):
+        self.calls = self.calls + 1
+        return ObjectDictionary.from_file(filename)
+
+def run(tmp_path, input_filename, fragments=None):
+    outputs = [(name, str(tmp_path / f'out.{name}')) for name in NAMES]
+    load = Loader()
+    results = update(str(tmp_path / 'manifest.json'), input_filename,
+        incremental_outputs(input_filename, outputs, fragments), load)
+    return [status for output, status in results], load.calls
+
+def test_unchanged_outputs_are_skipped(tmp_path, device_esi):
+    assert (['written'] * 3, 1) == run(tmp_path, device_esi)
+    assert (['skipped'] * 3, 0) == run(tmp_path, device_esi)
+
+def test_outputs_match_full_generation(tmp_path, device_esi):
+    run(tmp_path, device_esi, fragments={})
+    obj_dict = ObjectDictionary.from_file(device_esi)
+    for name in NAMES:
+        expected = tmp_path / f'expected.{name}'
+        emitter_writers[name](obj_dict, str(expected))
+        assert expected.read_bytes() == (tmp_path / f'out.{name}').read_bytes(), name
+
+def test_edited_output_is_regenerated(tmp_path, device_esi):
+    run(tmp_path, device_esi)
+    (tmp_path / 'out.csv').write_text('edited')
+    assert (['written', 'skipped', 'skipped'], 1) == run(tmp_path, device_esi)
+
+def test_changed_input_is_regenerated(tmp_path, device_esi):
+    input_filename = tmp_path / 'device.xml'
+    shutil.copy(device_esi, input_filename)
+    run(tmp_path, str(input_filename))
+    # the same content written again doesn't count as a change
+    input_filename.write_bytes(input_filename.read_bytes())
+    assert (['skipped'] * 3, 0) == run(tmp_path, str(input_filename))
+    input_filename.write_text(esi_synth.generate_esi(objects=10, seed=6), encoding='UTF-8')
+    assert (['written'] * 3, 1) == run(tmp_path, str(input_filename))
@@ -0,0 +1,62 @@
+import pytest
+
+from esi_file import ObjectDictionary, parse_hexdec
+from esi_od_image import NO_BIT_OFFSET, ObjectImage, access_flags, write_od_image_file
+
+@pytest.fixture(scope='module')
+def image(tmp_path_factory, multi_device_esi):
+    obj_dict = ObjectDictionary.from_file(multi_device_esi)
+    filename = tmp_path_factory.mktemp('image') / 'od.odimg'
+    write_od_image_file(obj_dict, str(filename))
+    with ObjectImage(str(filename)) as image:
+        yield obj_dict, image
+
+def same_object(image_object, object):
+    bit_offset = object.get('BitOffs')
+    return (image_object.name == object['Name'] and image_object.type == object['Type']
+        and image_object.comment == (object.get('Comment') or '')
+        and image_object.default == (object.get('DefaultValue') or '')
+        and image_object.bit_size == parse_hexdec(object['BitSize'])
+        and image_object.bit_offset == (NO_BIT_OFFSET if not bit_offset else parse_hexdec(bit_offset))
+        and image_object.access == access_flags(object))
+
+def test_header(image):
+    obj_dict, image = image
+    assert len(obj_dict.objects_dict) == len(image)
+    assert (obj_dict.filename, obj_dict.vendor, obj_dict.devices) == (image.source, image.vendor, image.devices)
+
+def test_find(image):
+    obj_dict, image = image
+    # objects sharing an address are stored in dictionary order, find
+    # returns the first
+    first = {}
+    for key, object in obj_dict.object_index.items():
+        first.setdefault(key, object)
+    for key, object in first.items():
+        assert same_object(image.find(key >> 8, key & 0xFF), object), hex(key)
+    assert image.find(0x5FFF, 0xFF) is None
+
+def test_range(image):
+    obj_dict, image = image
+    expected = [object for key, object in obj_dict.object_index.items() if 0x1A00 <= key >> 8 <= 0x2003]
+    found = image.range(0x1A00, 0x2003)
+    assert expected
+    assert len(expected) == len(found)
+    assert all(same_object(image_object, object) for image_object, object in zip(found, expected))
+
+def test_search(image):
+    obj_dict, image = image
+    name = next(iter(obj_dict.objects_dict.values()))['Name']
+    text = name[1:-1].swapcase()
+    expected = [object for key, object in obj_dict.object_index.items() if text.lower() in object['Name'].lower()]
+    found = image.search(text)
+    assert expected
+    assert len(expected) == len(found)
+    assert all(same_object(image_object, object) for image_object, object in zip(found, expected))
+    assert len(image) == len(image.search(''))
+
+def test_not_an_image(tmp_path):
+    filename = tmp_path / 'od.odimg'
+    filename.write_bytes(b'<?xml version="1.0"?>' + bytes(100))
+    with pytest.raises(ValueError):
+        ObjectImage(str(filename))
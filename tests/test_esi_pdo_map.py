@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+from esi_file import ObjectDictionary
+from esi_pdo_map import device_layout, write_pdo_map_file
+
+TOOLS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(tool, *args):
+    result = subprocess.run([sys.executable, os.path.join(TOOLS, tool)] + [str(arg) for arg in args],
+        capture_output=True, text=True)
+    assert 0 == result.returncode, result.stderr
+
+def test_same_from_both_tools(tmp_path, multi_device_esi):
+    run('EsiToDynamicSlave.py', multi_device_esi, tmp_path / 'slave.st', '--pdo-map', tmp_path / 'dynamic.pdo.gvl.st')
+    run('esiutils.py', 'gen', multi_device_esi, '--pdo-map', tmp_path / 'gen.pdo.gvl.st')
+    text = (tmp_path / 'gen.pdo.gvl.st').read_text(encoding='utf-8')
+    assert text == (tmp_path / 'dynamic.pdo.gvl.st').read_text(encoding='utf-8')
+    assert text.startswith('// Automatically generated by ESIUtils\n')
+
+def test_pdos_follow_each_other(tmp_path, multi_device_esi):
+    obj_dict = ObjectDictionary.from_file(multi_device_esi)
+    for device in obj_dict.device_descriptions:
+        next_offsets = {}
+        for layout in device_layout(device):
+            if layout.sm is not None:
+                assert next_offsets.get(layout.sm, 0) == layout.bit_offset
+                next_offsets[layout.sm] = layout.bit_offset + layout.bit_length
+    filename = tmp_path / 'map.pdo.gvl.st'
+    write_pdo_map_file(obj_dict, str(filename))
+    pdos = sum(len(device_layout(device)) for device in obj_dict.device_descriptions)
+    assert f'MAX_PDOS : INT := {pdos};' in filename.read_text(encoding='utf-8')
@@ -0,0 +1,12 @@
+from esi_strings import StringPool
+
+def test_offsets():
+    strings = StringPool()
+    assert 0 == strings.add('')
+    offsets = {s: strings.add(s) for s in ('Vendor ID', 'Größe', 'Vendor')}
+    assert offsets['Vendor ID'] == strings.add('Vendor ID')
+    data = strings.encode()
+    assert strings.size == len(data)
+    assert b'\0' == data[:1]
+    for s, offset in offsets.items():
+        assert s == data[offset:data.index(b'\0', offset)].decode('UTF-8')
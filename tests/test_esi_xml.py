@@ -0,0 +1,25 @@
+import pytest
+
+import esi_xml
+from esi_file import ObjectDictionary
+
+needs_lxml = pytest.mark.skipif('lxml' not in esi_xml.available_backends(), reason='lxml is not installed')
+
+@needs_lxml
+@pytest.mark.parametrize('streaming', [True, False])
+@pytest.mark.parametrize('esi', ['device_esi', 'multi_device_esi', 'modular_esi'])
+def test_lxml_matches_etree(request, state, esi, streaming):
+    filename = request.getfixturevalue(esi)
+    etree = ObjectDictionary.from_file(filename, streaming, backend='etree')
+    lxml = ObjectDictionary.from_file(filename, streaming, backend='lxml')
+    assert state(lxml) == state(etree)
+    for ident in etree.modules:
+        assert state(lxml.modules[ident]) == state(etree.modules[ident])
+
+def test_backend_from_environment(monkeypatch):
+    monkeypatch.setenv('ESIUTILS_XML_BACKEND', 'etree')
+    assert 'etree' == esi_xml.get_backend().name
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        esi_xml.get_backend('expat')
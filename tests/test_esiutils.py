@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import esi_synth
+
+ESIUTILS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'esiutils.py')
+
+OUTPUTS = ['--csv', '--hpp', '--sdo-list', '--dynamic-slave', '--pdo-map', '--enum-table', '--image']
+
+@pytest.fixture(scope='module')
+def library(tmp_path_factory):
+    ''' a directory of ESI files, one of them modular '''
+    directory = tmp_path_factory.mktemp('library')
+    for number in range(4):
+        options = dict(devices=2, objects=20, seed=10 + number)
+        if 3 == number:
+            options.update(modules=2, slots=2)
+        (directory / f'vendor{number}.xml').write_text(esi_synth.generate_esi(**options), encoding='UTF-8')
+    return directory
+
+def esiutils(*args):
+    result = subprocess.run([sys.executable, ESIUTILS] + [str(arg) for arg in args], capture_output=True, text=True)
+    assert 0 == result.returncode, result.stderr
+    return result
+
+def contents(directory):
+    return {name: (directory / name).read_bytes() for name in sorted(os.listdir(directory))}
+
+def test_parallel_batch_matches_serial(tmp_path, library):
+    esiutils('batch', '-j', 1, '-o', tmp_path / 'serial', *OUTPUTS, library)
+    esiutils('batch', '-j', 3, '-o', tmp_path / 'parallel', *OUTPUTS, library)
+    serial = contents(tmp_path / 'serial')
+    assert 4 * len(OUTPUTS) == len(serial)
+    assert serial == contents(tmp_path / 'parallel')
+
+def test_batch_matches_gen(tmp_path, library):
+    esiutils('batch', '-j', 2, '-o', tmp_path / 'batch', '--csv', '--hpp', '--dynamic-slave', library)
+    esiutils('gen', library / 'vendor0.xml', '--csv', tmp_path / 'vendor0.csv',
+        '--hpp', tmp_path / 'vendor0.h', '--dynamic-slave', tmp_path / 'vendor0.st')
+    for name in ('vendor0.csv', 'vendor0.h', 'vendor0.st'):
+        assert (tmp_path / name).read_bytes() == (tmp_path / 'batch' / name).read_bytes(), name
+
+def test_incremental_batch_matches_serial(tmp_path, library):
+    esiutils('batch', '-j', 1, '-o', tmp_path / 'serial', *OUTPUTS, library)
+    manifest = tmp_path / 'manifest.json'
+    for run in range(2):
+        esiutils('batch', '-j', 3, '-o', tmp_path / 'incremental', '--manifest', manifest, *OUTPUTS, library)
+        assert contents(tmp_path / 'serial') == contents(tmp_path / 'incremental')